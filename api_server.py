@@ -8,13 +8,19 @@ import os
 import json
 import uuid
 import asyncio
+import hashlib
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
 from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, FileResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import uvicorn
 
@@ -22,10 +28,19 @@ import uvicorn
 from character_image_pipeline import (
     detect_faces_yolo, detect_body_parts, analyze_shot_composition,
     analyze_cowboy_shot_potential, check_image_quality, detect_person_count,
-    crop_to_target_ratio, comfyui_outpaint_image, archive_previous_images,
-    comprehensive_image_validation
+    archive_previous_images, analyze_images_batch, rank_images_by_metadata,
+    SpritePipeline, ANALYSIS_STAGES
 )
+from stage_pipeline import StageRejected
 from google_search_integration import search_and_download_images
+from cancellation import CancellationToken, JobCancelled
+from pipeline_metrics import (
+    record_rejection, render_metrics, QUEUE_DEPTH, CANDIDATES_SKIPPED, CONTENT_TYPE_LATEST
+)
+from pipeline_tracing import span
+from pipeline_profiling import JobProfiler, PROFILE_MODES, profile_mode_available
+from run_manifest import RunManifest
+from image_index import ImageIndex
 
 app = FastAPI(title="Character Image Pipeline API", version="1.0.0")
 
@@ -40,26 +55,58 @@ app.add_middleware(
 
 # Global storage for job status
 job_status = {}
+job_cancel_tokens = {}  # job_id -> CancellationToken for jobs still running
+idempotency_keys = {}  # Idempotency-Key header -> {"job_id", "fingerprint", "expires_at"}
+inflight_requests = {}  # request fingerprint -> job_id for jobs still running
+submission_lock = threading.Lock()
 UPLOAD_DIR = "uploaded_images"
 OUTPUT_DIR = "character_sprites"
 
+# Upload limits
+MAX_UPLOAD_SIZE = 25 * 1024 * 1024  # 25 MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# Magic byte signatures -> canonical file extension
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+]
+
+# Candidate selection: "all" validates every image, "early_stop" validates in
+# metadata-ranked order until max_candidates images score at least min_score
+SELECTION_MODES = ("all", "early_stop")
+EARLY_STOP_MIN_SCORE = 80
+CANDIDATE_WORKERS = 10  # ComfyUI outpaint requests in flight per job
+RUNNING_STATUSES = ("pending", "processing", "cancelling")  # worker not finished yet
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # seconds an Idempotency-Key stays bound to its job
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif", ".webp", ".avif")
+
 # Ensure directories exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 class JobStatus(BaseModel):
     job_id: str
-    status: str  # "pending", "processing", "completed", "error"
+    status: str  # "pending", "processing", "cancelling", "completed", "error", "cancelled"
     progress: int  # 0-100
     current_step: str
     message: str
     results: Optional[Dict] = None
     error: Optional[str] = None
+    profile: Optional[Dict] = None  # profiler artifact info, set when the job finishes
 
 class PipelineRequest(BaseModel):
     use_google_search: bool = False
     character_name: Optional[str] = None
     max_candidates: int = 5
+    profile: Optional[str] = None  # "cprofile", "pyinstrument" or "tracemalloc"
+    selection: str = "all"  # "all" or "early_stop"
+    min_score: int = EARLY_STOP_MIN_SCORE  # early_stop: validation score a candidate needs
+    search_images: Optional[int] = None  # Google images to download (default: max_candidates)
+    incremental: bool = False  # uploaded images: reuse results of files unchanged since the last incremental job
 
 @app.get("/")
 async def root():
@@ -69,33 +116,116 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms and pipeline counters"""
+    QUEUE_DEPTH.set(sum(1 for job in job_status.values() if job.status in RUNNING_STATUSES))
+    
+    payload = render_metrics()
+    if payload is None:
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    
+    return Response(content=payload, media_type=CONTENT_TYPE_LATEST)
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """Detect the real image format from its leading magic bytes"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    
+    # RIFF....WEBP and ISO-BMFF ....ftypavif need an offset check
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header[4:8] == b"ftyp" and header[8:12] in (b"avif", b"avis"):
+        return "avif"
+    
+    return None
+
+async def save_upload_stream(file: UploadFile) -> Dict:
+    """Stream an upload to disk in chunks, hashing and sniffing it on the way.
+    
+    The file is written to a temp file in UPLOAD_DIR and then moved to a
+    content-addressed name (``<sha256>.<ext>``). Identical uploads resolve
+    to the already stored file instead of creating a copy. Hashing and disk
+    writes run in the threadpool so large uploads don't block the event loop.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    image_format = None
+    
+    def write_chunk(buffer, chunk):
+        sha256.update(chunk)
+        buffer.write(chunk)
+    
+    def store(temp_path, file_path):
+        if os.path.exists(file_path):
+            os.remove(temp_path)
+            return True
+        os.replace(temp_path, file_path)
+        return False
+    
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload_", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                
+                if size == 0:
+                    image_format = sniff_image_format(chunk[:32])
+                    if image_format is None:
+                        raise HTTPException(status_code=415, detail="Unsupported or unrecognized image format")
+                
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large (max {MAX_UPLOAD_SIZE // (1024 * 1024)} MB)"
+                    )
+                
+                await run_in_threadpool(write_chunk, buffer, chunk)
+        
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        
+        file_id = sha256.hexdigest()
+        filename = f"{file_id}.{image_format}"
+        file_path = os.path.join(UPLOAD_DIR, filename)
+        
+        duplicate = await run_in_threadpool(store, temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    return {
+        "file_id": file_id,
+        "filename": filename,
+        "file_path": file_path,
+        "size": size,
+        "sha256": file_id,
+        "format": image_format,
+        "duplicate": duplicate
+    }
+
 @app.post("/upload")
 async def upload_image(file: UploadFile = File(...)):
     """Upload an image for processing"""
     try:
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-        filename = f"{file_id}.{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        return {
-            "file_id": file_id,
-            "filename": filename,
-            "file_path": file_path,
-            "size": len(content)
-        }
+        return await save_upload_stream(file)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 class AnalyzeRequest(BaseModel):
     file_path: str
 
+class BatchAnalyzeRequest(BaseModel):
+    file_paths: List[str] = []
+    batch_size: int = 8
+
 @app.post("/analyze")
 async def analyze_image(request: AnalyzeRequest):
     """Analyze a single image and return detailed information"""
@@ -139,250 +269,437 @@ async def analyze_image(request: AnalyzeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@app.post("/analyze/batch")
+async def analyze_images_batch_endpoint(request: Request):
+    """Analyze many images in one call, streaming results back as NDJSON
+    
+    Accepts either a JSON body ({"file_paths": [...], "batch_size": 8}) or a
+    multipart form with any number of "files" uploads and/or "file_paths"
+    fields. Each line of the response is the /analyze result for one image.
+    """
+    content_type = request.headers.get("content-type", "")
+    
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            file_paths = [str(path) for path in form.getlist("file_paths")]
+            for upload in form.getlist("files"):
+                saved = await save_upload_stream(upload)
+                file_paths.append(saved["file_path"])
+            batch_size = int(form.get("batch_size", 8))
+        else:
+            batch_request = BatchAnalyzeRequest(**(await request.json()))
+            file_paths = batch_request.file_paths
+            batch_size = batch_request.batch_size
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch request: {str(e)}")
+    
+    if not file_paths:
+        raise HTTPException(status_code=400, detail="No images provided")
+    
+    existing_paths = [path for path in file_paths if os.path.exists(path)]
+    missing_paths = [path for path in file_paths if not os.path.exists(path)]
+    
+    def generate_results():
+        for path in missing_paths:
+            yield json.dumps({"file_path": path, "error": "File not found"}) + "\n"
+        
+        try:
+            for result in analyze_images_batch(existing_paths, batch_size=max(1, batch_size)):
+                yield json.dumps(result, default=str) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Analysis failed: {str(e)}"}) + "\n"
+    
+    return StreamingResponse(generate_results(), media_type="application/x-ndjson")
+
+def list_upload_images() -> List[str]:
+    """Image files currently in UPLOAD_DIR (the inputs of folder runs)"""
+    if not os.path.exists(UPLOAD_DIR):
+        return []
+    return [
+        os.path.join(UPLOAD_DIR, file) for file in sorted(os.listdir(UPLOAD_DIR))
+        if file.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+def request_fingerprint(request: PipelineRequest) -> str:
+    """Hash of the fields that make two /process submissions identical
+    
+    Folder runs also hash the name, size and mtime of every uploaded image,
+    so a submission after the uploads changed is a different request.
+    """
+    inputs = None
+    if not request.use_google_search:
+        inputs = []
+        for img_path in list_upload_images():
+            stat = os.stat(img_path)
+            inputs.append([os.path.basename(img_path), stat.st_size, stat.st_mtime_ns])
+    payload = json.dumps({
+        "character_name": request.character_name,
+        "max_candidates": request.max_candidates,
+        "use_google_search": request.use_google_search,
+        "profile": request.profile,
+        "selection": request.selection,
+        "min_score": request.min_score,
+        "search_images": request.search_images,
+        "incremental": request.incremental,
+        "inputs": inputs
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def expire_idempotency_keys():
+    """Forget keys older than IDEMPOTENCY_KEY_TTL (call with submission_lock held)"""
+    now = time.time()
+    for key in [key for key, entry in idempotency_keys.items() if entry["expires_at"] <= now]:
+        del idempotency_keys[key]
+
+def bind_idempotency_key(idempotency_key: str, job_id: str, fingerprint: str):
+    idempotency_keys[idempotency_key] = {
+        "job_id": job_id,
+        "fingerprint": fingerprint,
+        "expires_at": time.time() + IDEMPOTENCY_KEY_TTL
+    }
+
+def runs_dir() -> str:
+    """Directory of the run manifests (checkpoints for POST /jobs/{job_id}/resume)
+    
+    Read at call time so a reassigned OUTPUT_DIR (e.g. by the load test) applies.
+    """
+    return os.path.join(OUTPUT_DIR, "runs")
+
+def release_job(job_id: str):
+    """Forget the cancel token and in-flight fingerprints of a finished job"""
+    job_cancel_tokens.pop(job_id, None)
+    with submission_lock:
+        # Not recomputed: the uploads (part of the fingerprint) may have changed meanwhile
+        for fingerprint in [fp for fp, inflight_job in inflight_requests.items() if inflight_job == job_id]:
+            del inflight_requests[fingerprint]
+
+def find_existing_job(fingerprint: str, idempotency_key: Optional[str]) -> Optional[str]:
+    """Return the job a duplicate submission should attach to, if any
+    
+    Raises 422 if idempotency_key was used for a different request.
+    Must be called with submission_lock held.
+    """
+    if idempotency_key:
+        entry = idempotency_keys.get(idempotency_key)
+        if entry is not None and entry["job_id"] in job_status:
+            if entry["fingerprint"] != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used for a different request"
+                )
+            return entry["job_id"]
+    
+    job_id = inflight_requests.get(fingerprint)
+    if job_id in job_status and job_status[job_id].status in RUNNING_STATUSES:
+        return job_id
+    
+    return None
+
 @app.post("/process")
-async def process_pipeline(request: PipelineRequest, background_tasks: BackgroundTasks):
-    """Start the full character image pipeline"""
-    job_id = str(uuid.uuid4())
-    
-    # Initialize job status
-    job_status[job_id] = JobStatus(
-        job_id=job_id,
-        status="pending",
-        progress=0,
-        current_step="Initializing",
-        message="Starting pipeline..."
-    )
+async def process_pipeline(request: PipelineRequest, background_tasks: BackgroundTasks,
+                           idempotency_key: Optional[str] = Header(None)):
+    """Start the full character image pipeline
+    
+    Retries with the same Idempotency-Key header (within
+    IDEMPOTENCY_KEY_TTL), and submissions identical to a job that is still
+    running, attach to the existing job instead of starting a new one;
+    reusing a key for a different request is rejected with 422. Setting "profile" runs the job under that profiler;
+    the artifact is served by GET /jobs/{job_id}/profile. With selection
+    "early_stop", validation stops once max_candidates images reach
+    min_score; the images it never looked at are listed in the results.
+    """
+    if request.selection not in SELECTION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown selection '{request.selection}' (choose from {', '.join(SELECTION_MODES)})"
+        )
+    if request.profile and not profile_mode_available(request.profile):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported profile mode '{request.profile}' (available: "
+                   f"{', '.join(mode for mode in PROFILE_MODES if profile_mode_available(mode))})"
+        )
+    
+    fingerprint = request_fingerprint(request)
+    with submission_lock:
+        expire_idempotency_keys()
+        existing_job_id = find_existing_job(fingerprint, idempotency_key)
+        if existing_job_id:
+            if idempotency_key:
+                bind_idempotency_key(idempotency_key, existing_job_id, fingerprint)
+            return {"job_id": existing_job_id, "status": "attached", "deduplicated": True}
+        
+        job_id = str(uuid.uuid4())
+        
+        # Initialize job status
+        job_status[job_id] = JobStatus(
+            job_id=job_id,
+            status="pending",
+            progress=0,
+            current_step="Initializing",
+            message="Starting pipeline..."
+        )
+        job_cancel_tokens[job_id] = CancellationToken()
+        inflight_requests[fingerprint] = job_id
+        if idempotency_key:
+            bind_idempotency_key(idempotency_key, job_id, fingerprint)
     
     # Start background processing
     background_tasks.add_task(run_pipeline_background, job_id, request)
     
-    return {"job_id": job_id, "status": "started"}
+    return {"job_id": job_id, "status": "started", "deduplicated": False}
+
+def run_pipeline_background(job_id: str, request: PipelineRequest, manifest: Optional[RunManifest] = None):
+    """Background task to run the full pipeline
+    
+    Runs in Starlette's threadpool (plain def) so the event loop keeps
+    serving /status and /jobs requests, including cancellation, meanwhile.
+    The whole run is traced as one job span and, if requested, profiled.
+    Progress is checkpointed in a run manifest; pass the manifest of an
+    interrupted run to resume it. The manifest is kept only while the job
+    can be resumed: it is removed once the job completes or is deleted.
+    """
+    status = job_status.get(job_id)
+    if status is None:
+        # Deleted before the worker started
+        release_job(job_id)
+        RunManifest.delete(job_id, runs_dir())
+        return
+    if manifest is None:
+        manifest = RunManifest.create(job_id, params=request.model_dump(), runs_dir=runs_dir())
+    profiler = JobProfiler(request.profile, os.path.join(OUTPUT_DIR, "profiles"), job_id) if request.profile else None
+    with span("pipeline_job", kind="job", job_id=job_id, character_name=request.character_name,
+              use_google_search=request.use_google_search, max_candidates=request.max_candidates) as job_span:
+        with profiler or nullcontext():
+            _run_pipeline_job(job_id, request, status, manifest, profiler)
+        job_span.set_attribute("job_status", status.status)
+        if status.status == "error":
+            job_span.set_status("ERROR", status.error)
+    
+    if profiler is not None:
+        status.profile = profiler.to_dict()
+    
+    # Failed and cancelled jobs keep their manifest for /jobs/{job_id}/resume
+    if status.status == "completed" or job_status.get(job_id) is not status:
+        RunManifest.delete(job_id, runs_dir())
 
-async def run_pipeline_background(job_id: str, request: PipelineRequest):
-    """Background task to run the full pipeline"""
-    import time
+def _run_pipeline_job(job_id: str, request: PipelineRequest, status: JobStatus, manifest: RunManifest, profiler=None):
     start_time = time.time()
+    cancel_token = job_cancel_tokens[job_id]
+    index = None
     
     try:
+        # Set before the check: a cancel arriving later turns it into "cancelling"
+        status.status = "processing"
+        cancel_token.raise_if_cancelled()
+        
         # Update status
-        job_status[job_id].status = "processing"
-        job_status[job_id].progress = 10
-        job_status[job_id].current_step = "Loading images"
-        job_status[job_id].message = "Scanning for images..."
+        status.progress = 10
+        status.current_step = "Loading images"
+        status.message = "Scanning for images..."
         
         # Step 1: Find images
-        image_extensions = (".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif", ".webp", ".avif")
         downloaded_images = []
         
+        if manifest.inputs is not None:
+            # Resumed job: reuse the images found by the interrupted attempt
+            downloaded_images = [img_path for img_path in manifest.inputs if os.path.exists(img_path)]
+            status.message = f"Resuming with {len(downloaded_images)} images from the interrupted run"
         # Check if Google search is requested
-        if request.use_google_search and request.character_name:
-            job_status[job_id].progress = 5
-            job_status[job_id].current_step = "Google Search"
-            job_status[job_id].message = f"Archiving previous images and searching for: {request.character_name}"
+        elif request.use_google_search and request.character_name:
+            status.progress = 5
+            status.current_step = "Google Search"
+            status.message = f"Archiving previous images and searching for: {request.character_name}"
             
             # Archive previous images first when using Google search
             archive_path, archived_count = archive_previous_images(request.character_name)
             if archived_count > 0:
-                job_status[job_id].message = f"Archived {archived_count} previous images, searching for: {request.character_name}"
+                status.message = f"Archived {archived_count} previous images, searching for: {request.character_name}"
             
             try:
-                # Use Google search to download exactly max_candidates images
+                # Use Google search to download max_candidates images, or a larger pool to select from
                 search_results = search_and_download_images(
                     request.character_name, 
-                    num_images=request.max_candidates, 
+                    num_images=request.search_images or request.max_candidates, 
                     download_dir=UPLOAD_DIR
                 )
                 if search_results:
                     downloaded_images.extend(search_results)
-                    job_status[job_id].message = f"Downloaded {len(search_results)} fresh images from Google"
+                    status.message = f"Downloaded {len(search_results)} fresh images from Google"
                 else:
-                    job_status[job_id].message = "No images found via Google search"
+                    status.message = "No images found via Google search"
             except Exception as e:
-                job_status[job_id].message = f"Google search failed: {str(e)}"
+                status.message = f"Google search failed: {str(e)}"
         else:
             # Check uploaded images only when NOT using Google search
-            if os.path.exists(UPLOAD_DIR):
-                for file in os.listdir(UPLOAD_DIR):
-                    if file.lower().endswith(image_extensions):
-                        filepath = os.path.join(UPLOAD_DIR, file)
-                        downloaded_images.append(filepath)
+            downloaded_images = list_upload_images()
+        
+        cancel_token.raise_if_cancelled()
         
         if not downloaded_images:
-            job_status[job_id].status = "error"
-            job_status[job_id].error = "No images found for processing. Please upload images or check Google search settings."
+            status.status = "error"
+            status.error = "No images found for processing. Please upload images or check Google search settings."
+            manifest.set_status("failed")
             return
         
-        job_status[job_id].progress = 20
-        job_status[job_id].current_step = "Analyzing images"
+        if manifest.inputs is None:
+            manifest.set_inputs(downloaded_images)
+        
+        if request.incremental and not request.use_google_search:
+            # Uploaded files unchanged since the last incremental job keep their results
+            index = ImageIndex.for_directory(UPLOAD_DIR)
+            index.prune(downloaded_images)
+        
+        engine = SpritePipeline(
+            max_sprites=request.max_candidates,
+            stage_workers={"outpaint": CANDIDATE_WORKERS},
+            manifest=manifest,
+            index=index,
+            output_dir=OUTPUT_DIR,
+            cancel_token=cancel_token,
+            profiler=profiler
+        )
+        
+        status.progress = 20
+        status.current_step = "Analyzing images"
         elapsed_time = time.time() - start_time
-        job_status[job_id].message = f"Found {len(downloaded_images)} images, analyzing... (⏱️ {elapsed_time:.1f}s elapsed)"
+        status.message = f"Found {len(downloaded_images)} images, analyzing... (⏱️ {elapsed_time:.1f}s elapsed)"
         
-        # Step 2: Comprehensive image analysis and validation
+        # Step 2: Image analysis and validation (the engine's analysis stages)
+        early_stop = request.selection == "early_stop"
+        if early_stop:
+            # Most promising images first, judged from their headers alone
+            downloaded_images = rank_images_by_metadata(downloaded_images)
         valid_candidates = []
+        selected_count = 0
+        skipped_images = []
         for i, img_path in enumerate(downloaded_images):
-            job_status[job_id].message = f"Analyzing image {i+1}/{len(downloaded_images)}: {os.path.basename(img_path)}"
-            job_status[job_id].progress = 20 + (i * 30 // len(downloaded_images))
-            
-            # Comprehensive validation
-            validation = comprehensive_image_validation(img_path)
+            cancel_token.raise_if_cancelled()
+            if early_stop and selected_count >= request.max_candidates:
+                skipped_images = downloaded_images[i:]
+                CANDIDATES_SKIPPED.inc(len(skipped_images))
+                print(f"⏭️ Early stop: {selected_count} candidates scored >= {request.min_score}, "
+                      f"skipping {len(skipped_images)} remaining images")
+                break
+            status.message = f"Analyzing image {i+1}/{len(downloaded_images)}: {os.path.basename(img_path)}"
+            status.progress = 20 + (i * 30 // len(downloaded_images))
             
-            if not validation['is_valid']:
-                print(f"❌ Skipped {os.path.basename(img_path)}: {', '.join(validation['issues'])}")
+            # Checkpoints of an interrupted attempt or an earlier incremental job
+            candidate = engine.restore({'index': i, 'key': img_path, 'path': img_path})
+            if candidate is None:
                 continue
             
-            # Smart cowboy shot analysis
-            faces = validation['face_details']
-            cowboy_analysis = analyze_cowboy_shot_potential(img_path, faces)
-            
-            valid_candidates.append({
-                'path': img_path,
-                'faces': faces,
-                'cowboy_analysis': cowboy_analysis,
-                'positioning_score': validation['score'],
-                'validation': validation
-            })
+            with span("validate_candidate", kind="candidate", image=os.path.basename(img_path)) as candidate_span:
+                try:
+                    candidate = engine.process(candidate, stages=ANALYSIS_STAGES)
+                except StageRejected as e:
+                    candidate_span.set_attributes({"is_valid": False, "issues": str(e)})
+                    print(f"❌ Skipped {os.path.basename(img_path)}: {e}")
+                    record_rejection([str(e)])
+                    continue
+                validation = candidate['validation']
+                candidate_span.set_attributes({
+                    "is_valid": True,
+                    "score": validation['score'],
+                    "face_count": validation['face_count']
+                })
             
+            valid_candidates.append(candidate)
             print(f"✅ Valid candidate: {os.path.basename(img_path)} (score: {validation['score']}/100)")
+            if validation['score'] >= request.min_score:
+                selected_count += 1
         
-        job_status[job_id].progress = 50
-        job_status[job_id].current_step = "Processing candidates"
+        status.progress = 50
+        status.current_step = "Processing candidates"
         elapsed_time = time.time() - start_time
-        job_status[job_id].message = f"Found {len(valid_candidates)} valid candidates, processing... (⏱️ {elapsed_time:.1f}s elapsed)"
+        skipped_note = f", skipped {len(skipped_images)} after early stop" if skipped_images else ""
+        status.message = f"Found {len(valid_candidates)} valid candidates{skipped_note}, processing... (⏱️ {elapsed_time:.1f}s elapsed)"
         
-        # Step 3: Process ALL candidates in parallel (true parallel processing)
-        processed_sprites = []
+        # Step 3: Stream the selected candidates through outpainting, cropping and final validation
+        if early_stop:
+            # Candidates that reached min_score go first, best validation score first
+            valid_candidates.sort(key=lambda candidate: -candidate['validation']['score'])
         candidates_to_process = valid_candidates[:request.max_candidates]
+        selection_report = {
+            "mode": request.selection,
+            "min_score": request.min_score if early_stop else None,
+            "evaluated": len(downloaded_images) - len(skipped_images),
+            "valid": len(valid_candidates),
+            "processed": [os.path.basename(candidate['path']) for candidate in candidates_to_process],
+            "not_processed": [os.path.basename(candidate['path']) for candidate in valid_candidates[request.max_candidates:]],
+            "skipped": [os.path.basename(img_path) for img_path in skipped_images]
+        }
         
-        job_status[job_id].progress = 50
-        job_status[job_id].current_step = "Parallel Processing"
-        elapsed_time = time.time() - start_time
-        job_status[job_id].message = f"Processing {len(candidates_to_process)} candidates in parallel... (⏱️ {elapsed_time:.1f}s elapsed)"
-        
-        import concurrent.futures
-        import threading
+        # Sprites are numbered in selection order
+        for number, candidate in enumerate(candidates_to_process, 1):
+            if candidate.get('sprite_number', number) != number:
+                # Selected in another order than the interrupted attempt: redo everything after analysis
+                candidate['skip_stages'] = [stage for stage in candidate['skip_stages'] if stage in ANALYSIS_STAGES]
+            candidate['sprite_number'] = number
         
-        def process_single_candidate(candidate_data):
-            i, candidate = candidate_data
-            input_path = candidate['path']
-            output_filename = f"sprite_{i+1:02d}.jpg"
-            output_path = os.path.join(OUTPUT_DIR, output_filename)
-            
-            try:
-                # Smart outpainting
-                cowboy_analysis = candidate['cowboy_analysis']
-                if cowboy_analysis['needs_outpainting']:
-                    padding = cowboy_analysis['padding']
-                    prompt = cowboy_analysis['prompt']
-                    
-                    outpainted_path = comfyui_outpaint_image(
-                        input_path,
-                        left_padding=padding['left'],
-                        right_padding=padding['right'],
-                        top_padding=padding['top'],
-                        bottom_padding=padding['bottom'],
-                        text_prompt=prompt
-                    )
-                    
-                    if outpainted_path and os.path.exists(outpainted_path):
-                        processed_input = outpainted_path
-                    else:
-                        processed_input = input_path
-                else:
-                    processed_input = input_path
-                
-                # Crop to target ratio
-                success, crop_msg = crop_to_target_ratio(processed_input, output_path)
-                
-                if success:
-                    return {
-                        'input': input_path,
-                        'output': output_path,
-                        'score': candidate['positioning_score'],
-                        'cowboy_analysis': cowboy_analysis,
-                        'candidate_id': i+1,
-                        'original_analysis': candidate.get('cowboy_analysis', {}),
-                        'validation': candidate.get('validation', {})
-                    }
-                else:
-                    return None
-                    
-            except Exception as e:
-                print(f"Error processing candidate {i+1}: {e}")
-                return None
+        status.progress = 50
+        status.current_step = "Parallel Processing"
+        elapsed_time = time.time() - start_time
+        status.message = f"Processing {len(candidates_to_process)} candidates in parallel... (⏱️ {elapsed_time:.1f}s elapsed)"
         
-        # Process ALL candidates in parallel with ThreadPoolExecutor
         parallel_start_time = time.time()
-        max_workers = min(10, len(candidates_to_process))  # Limit to 10 concurrent workers
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks at once
-            future_to_candidate = {
-                executor.submit(process_single_candidate, (i, candidate)): (i, candidate) 
-                for i, candidate in enumerate(candidates_to_process)
-            }
+        final_sprites = []
+        completed_count = 0
+        for candidate in engine.run(candidates_to_process):
+            completed_count += 1
+            if candidate['status'] == 'completed':
+                final_sprites.append(candidate['sprite'])
+            else:
+                print(f"❌ {os.path.basename(candidate['path'])} dropped at {candidate['rejected_stage']}: "
+                      f"{candidate['reason']}")
             
-            # Collect results as they complete
-            completed_count = 0
-            for future in concurrent.futures.as_completed(future_to_candidate):
-                completed_count += 1
-                result = future.result()
-                if result:
-                    processed_sprites.append(result)
-                
-                # Update progress in real-time
-                progress_pct = 50 + (completed_count * 40 // len(candidates_to_process))
-                elapsed_time = time.time() - start_time
-                job_status[job_id].progress = progress_pct
-                job_status[job_id].message = f"Completed {completed_count}/{len(candidates_to_process)} candidates (⏱️ {elapsed_time:.1f}s elapsed)"
+            # Update progress in real-time
+            progress_pct = 50 + (completed_count * 45 // len(candidates_to_process))
+            elapsed_time = time.time() - start_time
+            status.progress = progress_pct
+            status.message = f"Completed {completed_count}/{len(candidates_to_process)} candidates (⏱️ {elapsed_time:.1f}s elapsed)"
+        final_sprites.sort(key=lambda sprite: sprite['path'])
         
         parallel_elapsed = time.time() - parallel_start_time
         total_elapsed = time.time() - start_time
-        job_status[job_id].message = f"Parallel processing completed: {len(processed_sprites)} successful out of {len(candidates_to_process)} candidates (⏱️ parallel: {parallel_elapsed:.1f}s, total: {total_elapsed:.1f}s)"
+        status.message = f"Parallel processing completed: {len(final_sprites)} successful out of {len(candidates_to_process)} candidates (⏱️ parallel: {parallel_elapsed:.1f}s, total: {total_elapsed:.1f}s)"
         
-        # Step 4: Final validation
-        job_status[job_id].progress = 90
-        job_status[job_id].current_step = "Final validation"
-        job_status[job_id].message = "Validating final sprites..."
-        
-        final_sprites = []
-        for sprite in processed_sprites:
-            output_path = sprite['output']
-            img = cv2.imread(output_path)
-            if img is not None:
-                height, width = img.shape[:2]
-                if width == 1024 and height == 1536:
-                    faces = detect_faces_yolo(output_path)
-                    if faces:
-                        final_cowboy_analysis = analyze_cowboy_shot_potential(output_path, faces)
-                        final_score = 80 if not final_cowboy_analysis['needs_outpainting'] else 60
-                        
-                        final_sprites.append({
-                            'path': output_path,
-                            'input': sprite.get('input', ''),
-                            'score': final_score,
-                            'cowboy_analysis': final_cowboy_analysis,
-                            'original_analysis': sprite.get('cowboy_analysis', {}),
-                            'validation': sprite.get('validation', {})
-                        })
+        cancel_token.raise_if_cancelled()
         
         # Complete
         total_elapsed = time.time() - start_time
-        job_status[job_id].status = "completed"
-        job_status[job_id].progress = 100
-        job_status[job_id].current_step = "Completed"
-        job_status[job_id].message = f"Pipeline completed! Generated {len(final_sprites)} character sprites. (⏱️ Total time: {total_elapsed:.1f}s)"
-        job_status[job_id].results = {
+        status.status = "completed"
+        status.progress = 100
+        status.current_step = "Completed"
+        status.message = f"Pipeline completed! Generated {len(final_sprites)} character sprites. (⏱️ Total time: {total_elapsed:.1f}s)"
+        status.results = {
             "total_sprites": len(final_sprites),
             "sprites": final_sprites,
             "output_directory": OUTPUT_DIR,
             "total_time": total_elapsed,
-            "average_time_per_sprite": total_elapsed / max(len(final_sprites), 1)
+            "average_time_per_sprite": total_elapsed / max(len(final_sprites), 1),
+            "selection": selection_report
         }
+        manifest.set_status("completed")
         
+    except JobCancelled:
+        total_elapsed = time.time() - start_time
+        status.status = "cancelled"
+        status.current_step = "Cancelled"
+        status.message = f"Pipeline cancelled after {total_elapsed:.1f}s"
+        manifest.set_status("cancelled")
     except Exception as e:
-        job_status[job_id].status = "error"
-        job_status[job_id].error = str(e)
-        job_status[job_id].message = f"Pipeline failed: {str(e)}"
+        status.status = "error"
+        status.error = str(e)
+        status.message = f"Pipeline failed: {str(e)}"
+        manifest.set_status("failed")
+    finally:
+        if index is not None:
+            index.save()
+        release_job(job_id)
 
 @app.get("/status/{job_id}")
 async def get_job_status(job_id: str):
@@ -392,20 +709,97 @@ async def get_job_status(job_id: str):
     
     return job_status[job_id].model_dump()
 
+@app.get("/jobs/{job_id}/profile")
+async def get_job_profile(job_id: str):
+    """Download the profiler artifact of a job submitted with "profile" set"""
+    if job_id not in job_status:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    profile = job_status[job_id].profile
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile for this job (not requested or job still running)")
+    if not profile["artifact"] or not os.path.exists(profile["artifact"]):
+        raise HTTPException(status_code=404, detail=profile["error"] or "Profile artifact missing")
+    
+    return FileResponse(profile["artifact"], filename=os.path.basename(profile["artifact"]))
+
 @app.get("/jobs")
 async def list_jobs():
     """List all jobs"""
     return {"jobs": list(job_status.keys())}
 
-@app.delete("/jobs/{job_id}")
-async def delete_job(job_id: str):
-    """Delete a job"""
-    if job_id not in job_status:
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancel a running job, keeping its status entry
+    
+    Plain def: the cancel callbacks make blocking ComfyUI requests, so this
+    runs in the threadpool rather than on the event loop. The job reports
+    "cancelling" until its worker has stopped and set the final status.
+    """
+    status = job_status.get(job_id)  # one lookup: a concurrent DELETE may remove it
+    if status is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    del job_status[job_id]
-    return {"message": "Job deleted"}
+    token = job_cancel_tokens.get(job_id)
+    if token is None:
+        return {"message": f"Job already {status.status}"}
+    
+    status.status = "cancelling"
+    status.message = "Cancellation requested"
+    token.cancel()
+    return {"message": "Job cancelling"}
+
+@app.post("/jobs/{job_id}/resume")
+async def resume_job(job_id: str, background_tasks: BackgroundTasks):
+    """Resume an interrupted, failed or cancelled job from its run manifest
+    
+    Also works after a server restart: stages the earlier attempt finished
+    (with unchanged output files) are skipped, so only unfinished
+    candidates are validated, outpainted and cropped again.
+    """
+    try:
+        manifest = RunManifest.load(job_id, runs_dir())
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="No run manifest for this job")
+    
+    request = PipelineRequest(**manifest.params)
+    with submission_lock:
+        if job_id in job_cancel_tokens:
+            raise HTTPException(status_code=409, detail="Job is still running")
+        
+        job_status[job_id] = JobStatus(
+            job_id=job_id,
+            status="pending",
+            progress=0,
+            current_step="Initializing",
+            message="Resuming pipeline..."
+        )
+        job_cancel_tokens[job_id] = CancellationToken()
+        inflight_requests[request_fingerprint(request)] = job_id
+    
+    background_tasks.add_task(run_pipeline_background, job_id, request, manifest)
+    
+    return {"job_id": job_id, "status": "resumed", "completed_stages": manifest.completed_stages()}
+
+@app.delete("/jobs/{job_id}")
+def delete_job(job_id: str):
+    """Delete a job, cancelling it first if it is still running
+    
+    Plain def for the same reason as cancel_job. The job's run manifest
+    is removed too (by its worker, if it is still running).
+    """
+    with submission_lock:
+        if job_status.pop(job_id, None) is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        for key in [key for key, entry in idempotency_keys.items() if entry["job_id"] == job_id]:
+            del idempotency_keys[key]
+    
+    token = job_cancel_tokens.get(job_id)
+    if token is not None:
+        token.cancel()
+    else:
+        RunManifest.delete(job_id, runs_dir())
+    return {"message": "Job cancelled and deleted" if token is not None else "Job deleted"}
 
 if __name__ == "__main__":
-    import cv2
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Synthetic Image Corpus for Pipeline Benchmarks
+Renders a deterministic set of test images at several resolutions and
+subject layouts. Subjects are cut from seed photos (examples/ and
+archive/ by default) so YOLO has real people to detect; without seed
+photos simple drawn figures are used, which only exercise the timing of
+the no-detection paths.
+
+Usage:
+    python3 benchmarks/corpus.py --output benchmarks/.corpus --copies 2
+"""
+
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_SEED_DIRS = [os.path.join(ROOT_DIR, "examples"), os.path.join(ROOT_DIR, "archive")]
+
+# name -> (width, height)
+RESOLUTIONS = {
+    "small": (480, 640),
+    "target": (1024, 1536),
+    "hd_landscape": (1920, 1080),
+    "large": (3000, 4000),
+}
+
+# name -> list of (center_x, top_y, height) as fractions of the canvas
+LAYOUTS = {
+    "empty": [],
+    "single_center": [(0.5, 0.15, 0.8)],
+    "single_top": [(0.5, 0.02, 0.45)],     # head near the top, needs outpainting below
+    "single_small": [(0.5, 0.4, 0.25)],
+    "pair": [(0.3, 0.15, 0.7), (0.7, 0.15, 0.7)],
+    "group": [(0.15, 0.2, 0.5), (0.38, 0.2, 0.5), (0.62, 0.2, 0.5), (0.85, 0.2, 0.5)],
+}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def load_seed_images(seed_dirs=None, max_seeds=8):
+    """Seed photos (BGR) found under seed_dirs; images under 200px are skipped"""
+    seeds = []
+    for seed_dir in seed_dirs or DEFAULT_SEED_DIRS:
+        for root, _, files in os.walk(seed_dir):
+            for name in sorted(files):
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                img = cv2.imread(os.path.join(root, name))
+                if img is None or min(img.shape[:2]) < 200:
+                    continue
+                # Center portrait crop so neighbouring subjects overlap less
+                height, width = img.shape[:2]
+                crop_width = min(width, int(height * 0.75))
+                left = (width - crop_width) // 2
+                seeds.append(img[:, left:left + crop_width])
+    return seeds[:max_seeds]
+
+
+def render_background(width, height, rng):
+    """Smooth gradient plus texture so blur and brightness checks pass"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = rng.uniform(60, 180, size=3)
+    gradient = (x / width * 40 + y / height * 30)[..., None]
+    noise = rng.normal(0, 12, size=(height, width, 1))
+    return np.clip(base + gradient + noise, 0, 255).astype(np.uint8)
+
+
+def draw_figure(canvas, center_x, top, height, rng):
+    """Simple head-and-body figure used when no seed photos exist"""
+    color = tuple(int(c) for c in rng.uniform(30, 220, size=3))
+    head = max(height // 7, 4)
+    cv2.circle(canvas, (center_x, top + head), head, color, -1)
+    cv2.rectangle(canvas, (center_x - head, top + 2 * head), (center_x + head, top + height), color, -1)
+
+
+def paste_subject(canvas, seed, center_x, top, height):
+    """Scale a seed photo to height and paste it, clipped to the canvas"""
+    scale = height / seed.shape[0]
+    width = max(int(seed.shape[1] * scale), 1)
+    subject = cv2.resize(seed, (width, height), interpolation=cv2.INTER_AREA)
+    canvas_h, canvas_w = canvas.shape[:2]
+    x1 = center_x - width // 2
+    sx1, sy1 = max(-x1, 0), max(-top, 0)
+    x1, y1 = max(x1, 0), max(top, 0)
+    x2, y2 = min(x1 + width - sx1, canvas_w), min(y1 + height - sy1, canvas_h)
+    if x2 > x1 and y2 > y1:
+        canvas[y1:y2, x1:x2] = subject[sy1:sy1 + (y2 - y1), sx1:sx1 + (x2 - x1)]
+
+
+def render_image(layout, width, height, seeds, rng):
+    canvas = render_background(width, height, rng)
+    for i, (cx, top, h) in enumerate(LAYOUTS[layout]):
+        center_x, top_px, height_px = int(cx * width), int(top * height), int(h * height)
+        if seeds:
+            paste_subject(canvas, seeds[(i + rng.integers(len(seeds))) % len(seeds)], center_x, top_px, height_px)
+        else:
+            draw_figure(canvas, center_x, top_px, height_px, rng)
+    return canvas
+
+
+def generate_corpus(output_dir, seed=0, copies=1, seed_dirs=None, resolutions=None, layouts=None):
+    """Write the corpus images plus corpus.json; returns the manifest entries"""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    seeds = load_seed_images(seed_dirs)
+
+    entries = []
+    for resolution in resolutions or RESOLUTIONS:
+        width, height = RESOLUTIONS[resolution]
+        for layout in layouts or LAYOUTS:
+            for copy in range(copies):
+                filename = f"{resolution}_{layout}_{copy}.jpg"
+                img = render_image(layout, width, height, seeds, rng)
+                cv2.imwrite(os.path.join(output_dir, filename), img, [cv2.IMWRITE_JPEG_QUALITY, 92])
+                entries.append({
+                    "file": filename,
+                    "resolution": resolution,
+                    "layout": layout,
+                    "width": width,
+                    "height": height,
+                })
+
+    manifest = {"seed": seed, "copies": copies, "seed_photos": len(seeds), "images": entries}
+    with open(os.path.join(output_dir, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return entries
+
+
+def load_corpus(corpus_dir):
+    """Manifest of an existing corpus, or None"""
+    manifest_path = os.path.join(corpus_dir, "corpus.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark image corpus")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".corpus"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--copies", type=int, default=1, help="Images per resolution/layout pair")
+    parser.add_argument("--seed-dir", action="append", help="Folder of seed photos (repeatable)")
+    args = parser.parse_args()
+
+    entries = generate_corpus(args.output, args.seed, args.copies, args.seed_dir)
+    print(f"Generated {len(entries)} images in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
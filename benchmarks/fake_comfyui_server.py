@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Local Stand-in for the ComfyUI HTTP API
+Implements /prompt, /queue, /history, /view and /interrupt in-process so the
+API server can be load tested without a GPU. Prompts run one at a time, like
+a single ComfyUI worker, each taking processing_time seconds; the "output"
+is the input image border-reflect padded as the workflow requests.
+"""
+
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+
+class FakeComfyUIServer:
+    """Threaded HTTP server mimicking the ComfyUI endpoints used by scripts/comfyui_outpainting.py"""
+
+    def __init__(self, processing_time=2.0, host="127.0.0.1", port=0):
+        self.processing_time = processing_time
+        self.host = host
+        self.port = port
+        self.prompts = {}  # prompt_id -> {"number", "start", "finish", "workflow", "removed"}
+        self.request_counts = {"prompt": 0, "queue": 0, "history": 0, "view": 0, "interrupt": 0}
+        self._next_number = 0
+        self._last_finish = 0.0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, body, content_type, status=200):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, payload, status=200):
+                self._send(json.dumps(payload).encode("utf-8"), "application/json", status)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                request = json.loads(body or b"{}")
+                path = urlparse(self.path).path
+                if path == "/prompt":
+                    self._send_json(fake.submit_prompt(request.get("prompt", {})))
+                elif path == "/queue":
+                    fake.remove_prompts(request.get("delete", []))
+                    self._send_json({})
+                elif path == "/interrupt":
+                    fake.interrupt(request.get("prompt_id"))
+                    self._send_json({})
+                else:
+                    self._send_json({"error": "Not found"}, status=404)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/queue":
+                    self._send_json(fake.queue_state())
+                elif url.path == "/history":
+                    self._send_json(fake.history())
+                elif url.path == "/view":
+                    image = fake.render_output(parse_qs(url.query).get("filename", [""])[0])
+                    if image is None:
+                        self._send_json({"error": "Image not found"}, status=404)
+                    else:
+                        self._send(image, "image/jpeg")
+                else:
+                    self._send_json({"error": "Not found"}, status=404)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def submit_prompt(self, workflow):
+        prompt_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self.request_counts["prompt"] += 1
+            self._next_number += 1
+            start = max(now, self._last_finish)
+            self._last_finish = start + self.processing_time
+            self.prompts[prompt_id] = {
+                "number": self._next_number,
+                "start": start,
+                "finish": self._last_finish,
+                "workflow": workflow,
+                "removed": False,
+            }
+        return {"prompt_id": prompt_id, "number": self._next_number, "node_errors": {}}
+
+    def queue_state(self):
+        now = time.time()
+        with self._lock:
+            self.request_counts["queue"] += 1
+            active = [(prompt_id, p) for prompt_id, p in self.prompts.items() if not p["removed"] and now < p["finish"]]
+        running = [[p["number"], prompt_id, {}, {}, []] for prompt_id, p in active if p["start"] <= now]
+        pending = [[p["number"], prompt_id, {}, {}, []] for prompt_id, p in active if p["start"] > now]
+        return {"queue_running": running, "queue_pending": pending}
+
+    def history(self):
+        now = time.time()
+        with self._lock:
+            self.request_counts["history"] += 1
+            finished = [prompt_id for prompt_id, p in self.prompts.items() if not p["removed"] and now >= p["finish"]]
+        return {
+            prompt_id: {
+                "outputs": {"9": {"images": [{"filename": f"{prompt_id}.jpg", "subfolder": "", "type": "output"}]}},
+                "status": {"status_str": "success", "completed": True},
+            }
+            for prompt_id in finished
+        }
+
+    def remove_prompts(self, prompt_ids):
+        with self._lock:
+            for prompt_id in prompt_ids:
+                if prompt_id in self.prompts:
+                    self.prompts[prompt_id]["removed"] = True
+
+    def interrupt(self, prompt_id):
+        with self._lock:
+            self.request_counts["interrupt"] += 1
+            prompt = self.prompts.get(prompt_id)
+            if prompt is not None:
+                prompt["finish"] = min(prompt["finish"], time.time())
+
+    def render_output(self, filename):
+        """Pad the prompt's input image as its ImagePadForOutpaint node asks"""
+        with self._lock:
+            self.request_counts["view"] += 1
+            prompt = self.prompts.get(filename.rsplit(".", 1)[0])
+        if prompt is None:
+            return None
+
+        image_b64, padding = None, {}
+        for node in prompt["workflow"].values():
+            if node.get("class_type") == "ETN_LoadImageBase64":
+                image_b64 = node["inputs"].get("image")
+            elif node.get("class_type") == "ImagePadForOutpaint":
+                padding = node["inputs"]
+        if not image_b64:
+            return None
+
+        img = cv2.imdecode(np.frombuffer(base64.b64decode(image_b64), np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        padded = cv2.copyMakeBorder(
+            img, int(padding.get("top", 0)), int(padding.get("bottom", 0)),
+            int(padding.get("left", 0)), int(padding.get("right", 0)), cv2.BORDER_REFLECT
+        )
+        return cv2.imencode(".jpg", padded)[1].tobytes()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local ComfyUI stand-in")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--processing-time", type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = FakeComfyUIServer(processing_time=args.processing_time, port=args.port).start()
+    print(f"Fake ComfyUI server running at {server.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
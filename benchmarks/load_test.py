@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Load Test for the API Server
+Simulated clients replay a weighted mix of /upload, /analyze and /process
+(with /status polling until the job finishes) against api_server.py, stepping
+through increasing concurrency levels. For each level it reports throughput,
+error rate and p50/p95/p99 latency per endpoint, plus end-to-end job latency.
+
+By default the server is started in a subprocess with Google search replaced
+by corpus images (stubs.StubImageSearch) and ComfyUI pointed at a local
+FakeComfyUIServer, so no external service is touched. --url targets an
+already running server instead (its real search and ComfyUI are used).
+
+Usage:
+    python3 benchmarks/load_test.py
+    python3 benchmarks/load_test.py --concurrency 1,4,16 --duration 60 --mix upload=2,analyze=4,process=1
+    python3 benchmarks/load_test.py --comfyui-time 8 --output load_report.json --max-error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from urllib.request import urlopen
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+DEFAULT_CORPUS_DIR = os.path.join(BENCHMARK_DIR, ".corpus")
+
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from corpus import generate_corpus, load_corpus
+from fake_comfyui_server import FakeComfyUIServer
+from stubs import StubImageSearch
+
+DEFAULT_MIX = "upload=3,analyze=3,process=1"
+TERMINAL_STATUSES = ("completed", "error", "cancelled")
+SERVER_STARTUP_TIMEOUT = 120  # seconds; includes loading the YOLO model
+
+
+# ===== Minimal asyncio HTTP client =====
+
+async def http_request(host, port, method, path, body=b"", headers=None, timeout=60):
+    """One HTTP/1.1 request on a fresh connection; returns (status, body bytes)"""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    head_lines = head.decode("latin-1").split("\r\n")
+    status = int(head_lines[0].split()[1])
+    response_headers = {
+        name.strip().lower(): value.strip()
+        for name, value in (line.split(":", 1) for line in head_lines[1:] if ":" in line)
+    }
+    if response_headers.get("transfer-encoding", "").lower() == "chunked":
+        payload = decode_chunked(payload)
+    return status, payload
+
+
+def decode_chunked(payload):
+    body = b""
+    while payload:
+        size_line, _, payload = payload.partition(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        if size == 0:
+            break
+        body += payload[:size]
+        payload = payload[size + 2:]
+    return body
+
+
+def multipart_body(field, filename, content, content_type="application/octet-stream"):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+# ===== Statistics =====
+
+class LoadStats:
+    """Latency and outcome of every request in one concurrency step"""
+
+    def __init__(self):
+        self.samples = {}  # name -> list of (latency_seconds, ok)
+        self.errors = {}  # name -> {error message: count}
+
+    def record(self, name, latency, ok, error=None):
+        self.samples.setdefault(name, []).append((latency, ok))
+        if not ok:
+            counts = self.errors.setdefault(name, {})
+            counts[error] = counts.get(error, 0) + 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for name, samples in self.samples.items():
+            latencies_ms = np.array([latency for latency, _ in samples]) * 1000
+            failures = sum(1 for _, ok in samples if not ok)
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": failures,
+                "error_rate": round(failures / len(samples), 4),
+                "throughput_rps": round(len(samples) / elapsed, 3),
+                "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+                "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+                "p99_ms": round(float(np.percentile(latencies_ms, 99)), 1),
+                "top_errors": sorted(self.errors.get(name, {}).items(), key=lambda item: -item[1])[:3],
+            }
+
+        http = [samples for name, samples in self.samples.items() if name != "process_job"]
+        total = sum(len(samples) for samples in http)
+        failures = sum(1 for samples in http for _, ok in samples if not ok)
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 3),
+            "error_rate": round(failures / total, 4) if total else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+# ===== Simulated clients =====
+
+class LoadScenario:
+    """What one simulated client does; shared by all clients of a run"""
+
+    def __init__(self, host, port, image_paths, mix, max_candidates=3, think_time=0.1,
+                 poll_interval=1.0, job_timeout=300, request_timeout=120):
+        self.host = host
+        self.port = port
+        self.image_paths = image_paths
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.max_candidates = max_candidates
+        self.think_time = think_time
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.request_timeout = request_timeout
+        self.uploaded = []  # server-side paths available to /analyze
+
+    async def timed(self, stats, name, method, path, body=b"", headers=None):
+        """Send a request and record it; returns the parsed JSON body or None on failure"""
+        start = time.perf_counter()
+        try:
+            status, payload = await http_request(
+                self.host, self.port, method, path, body, headers, self.request_timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            stats.record(name, time.perf_counter() - start, False, type(e).__name__)
+            return None
+
+        ok = status < 400
+        stats.record(name, time.perf_counter() - start, ok, None if ok else f"HTTP {status}")
+        if not ok:
+            return None
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    async def upload(self, stats, rng):
+        image_path = rng.choice(self.image_paths)
+        with open(image_path, "rb") as f:
+            body, content_type = multipart_body("file", os.path.basename(image_path), f.read())
+        result = await self.timed(stats, "upload", "POST", "/upload", body, {"Content-Type": content_type})
+        if result and result.get("file_path"):
+            self.uploaded.append(result["file_path"])
+
+    async def analyze(self, stats, rng):
+        if not self.uploaded:
+            await self.upload(stats, rng)
+            if not self.uploaded:
+                return
+        body = json.dumps({"file_path": rng.choice(self.uploaded)}).encode("utf-8")
+        await self.timed(stats, "analyze", "POST", "/analyze", body, {"Content-Type": "application/json"})
+
+    async def process(self, stats, rng):
+        """Submit a job and poll /status until it finishes; the whole job is recorded as process_job"""
+        request = {
+            "use_google_search": True,
+            "character_name": f"load test {uuid.uuid4().hex[:8]}",
+            "max_candidates": self.max_candidates,
+        }
+        start = time.perf_counter()
+        submitted = await self.timed(stats, "process", "POST", "/process", json.dumps(request).encode("utf-8"),
+                                     {"Content-Type": "application/json", "Idempotency-Key": uuid.uuid4().hex})
+        if not submitted:
+            return
+
+        job_status = None
+        while time.perf_counter() - start < self.job_timeout:
+            await asyncio.sleep(self.poll_interval)
+            status = await self.timed(stats, "status", "GET", f"/status/{submitted['job_id']}")
+            if status and status["status"] in TERMINAL_STATUSES:
+                job_status = status["status"]
+                break
+
+        ok = job_status == "completed"
+        stats.record("process_job", time.perf_counter() - start, ok, None if ok else (job_status or "timeout"))
+
+    async def client(self, stats, seed, deadline):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            action = rng.choices(self.actions, weights=self.weights)[0]
+            await getattr(self, action)(stats, rng)
+            await asyncio.sleep(self.think_time)
+
+
+async def run_step(scenario, concurrency, duration, seed=0):
+    """Run concurrency clients for duration seconds (jobs in flight are allowed to finish)"""
+    stats = LoadStats()
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*[
+        scenario.client(stats, seed * 1000 + i, deadline) for i in range(concurrency)
+    ])
+    return stats.summary(time.perf_counter() - start)
+
+
+# ===== Stubbed server =====
+
+def serve_stubbed(port, comfyui_url, corpus_dir, work_dir, search_latency):
+    """Run api_server with Google search and ComfyUI replaced (runs in the --serve subprocess)"""
+    import uvicorn
+    import api_server
+    import character_image_pipeline as pipeline
+    import scripts.comfyui_outpainting as comfyui
+
+    manifest = load_corpus(corpus_dir)
+    image_paths = [os.path.join(corpus_dir, entry["file"]) for entry in manifest["images"]]
+
+    comfyui.HTTP_SERVER = comfyui_url
+    if not os.path.exists(comfyui.WORKFLOW_FILE):
+        comfyui.WORKFLOW_FILE = os.path.join(ROOT_DIR, "config", comfyui.WORKFLOW_FILE)
+    api_server.search_and_download_images = StubImageSearch(image_paths, latency=search_latency)
+    api_server.UPLOAD_DIR = os.path.join(work_dir, "uploaded_images")
+    api_server.OUTPUT_DIR = os.path.join(work_dir, "character_sprites")
+    pipeline.DOWNLOAD_DIR = os.path.join(work_dir, "downloaded_images")
+    pipeline.ARCHIVE_DIR = os.path.join(work_dir, "archived_images")
+    for directory in (api_server.UPLOAD_DIR, api_server.OUTPUT_DIR, pipeline.DOWNLOAD_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+    uvicorn.run(api_server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stubbed_server(comfyui_url, corpus_dir, work_dir, search_latency):
+    """Start the stubbed api_server subprocess and wait until /health answers"""
+    port = free_port()
+    log_path = os.path.join(work_dir, "server.log")
+    log_file = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+         "--comfyui-url", comfyui_url, "--corpus", corpus_dir, "--work-dir", work_dir,
+         "--search-latency", str(search_latency)],
+        cwd=ROOT_DIR, stdout=log_file, stderr=subprocess.STDOUT
+    )
+
+    start = time.time()
+    while time.time() - start < SERVER_STARTUP_TIMEOUT:
+        if process.poll() is not None:
+            log_file.close()
+            with open(log_path) as f:
+                raise RuntimeError(f"API server exited during startup:\n{f.read()[-2000:]}")
+        try:
+            urlopen(f"http://127.0.0.1:{port}/health", timeout=1).read()
+            return process, port, log_file
+        except OSError:
+            time.sleep(0.5)
+
+    process.terminate()
+    log_file.close()
+    raise RuntimeError(f"API server did not start within {SERVER_STARTUP_TIMEOUT}s")
+
+
+# ===== Reporting =====
+
+def print_step(concurrency, summary):
+    print(f"\n👥 {concurrency} clients: {summary['requests']} requests in {summary['elapsed_s']:.1f}s "
+          f"({summary['throughput_rps']:.2f} req/s, {summary['error_rate']:.1%} errors)")
+    print(f"   {'endpoint':<12} {'count':>7} {'err%':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, endpoint in sorted(summary["endpoints"].items()):
+        print(f"   {name:<12} {endpoint['requests']:>7} {endpoint['error_rate']:>7.1%} "
+              f"{endpoint['throughput_rps']:>8.2f} {endpoint['p50_ms']:>9.1f} "
+              f"{endpoint['p95_ms']:>9.1f} {endpoint['p99_ms']:>9.1f}")
+        for error, count in endpoint["top_errors"]:
+            print(f"   {'':<12} ❌ {error} x{count}")
+
+
+def print_capacity(steps):
+    print("\n📈 Capacity")
+    print(f"{'clients':>8} {'req/s':>8} {'errors':>8} {'jobs/min':>9} {'job p95 s':>10}")
+    for step in steps:
+        job = step["summary"]["endpoints"].get("process_job")
+        jobs_per_minute = (job["requests"] - job["errors"]) * 60 / step["summary"]["elapsed_s"] if job else 0.0
+        job_p95 = f"{job['p95_ms'] / 1000:.1f}" if job else "-"
+        print(f"{step['concurrency']:>8} {step['summary']['throughput_rps']:>8.2f} "
+              f"{step['summary']['error_rate']:>8.1%} {jobs_per_minute:>9.1f} {job_p95:>10}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        action, _, weight = part.partition("=")
+        if action.strip() not in ("upload", "analyze", "process"):
+            raise argparse.ArgumentTypeError(f"Unknown action in mix: {action}")
+        mix[action.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API server with simulated clients")
+    parser.add_argument("--url", help="Target an already running server (e.g. http://127.0.0.1:8000) instead of a stubbed one")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated client counts, one step each")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per concurrency step")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Action weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--max-candidates", type=int, default=3, help="max_candidates for /process jobs")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Pause between a client's actions")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between /status polls")
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--comfyui-time", type=float, default=2.0, help="Simulated ComfyUI seconds per prompt")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Simulated Google search seconds")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the full report as JSON")
+    parser.add_argument("--max-error-rate", type=float, help="Exit 1 if any step exceeds this error rate")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--comfyui-url", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_stubbed(args.port, args.comfyui_url, args.corpus, args.work_dir, args.search_latency)
+        return 0
+
+    manifest = load_corpus(args.corpus)
+    if manifest is None:
+        print(f"Generating corpus in {args.corpus}...")
+        generate_corpus(args.corpus)
+        manifest = load_corpus(args.corpus)
+    image_paths = [os.path.join(args.corpus, entry["file"]) for entry in manifest["images"]]
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    comfyui = server = log_file = None
+    work_dir = tempfile.TemporaryDirectory(prefix="load_test_")
+    try:
+        if args.url:
+            host_port = args.url.split("://", 1)[-1].rstrip("/")
+            host, _, port = host_port.partition(":")
+            port = int(port or 80)
+            print(f"🎯 Target: {args.url}")
+        else:
+            comfyui = FakeComfyUIServer(processing_time=args.comfyui_time).start()
+            print(f"🎨 Fake ComfyUI at {comfyui.base_url} ({args.comfyui_time}s per prompt)")
+            print("🚀 Starting stubbed API server...")
+            server, port, log_file = start_stubbed_server(
+                comfyui.base_url, args.corpus, work_dir.name, args.search_latency
+            )
+            host = "127.0.0.1"
+            print(f"🎯 Target: http://{host}:{port}")
+
+        scenario = LoadScenario(
+            host, port, image_paths, args.mix, max_candidates=args.max_candidates,
+            think_time=args.think_time, poll_interval=args.poll_interval, job_timeout=args.job_timeout
+        )
+        steps = []
+        for concurrency in levels:
+            summary = asyncio.run(run_step(scenario, concurrency, args.duration, args.seed))
+            steps.append({"concurrency": concurrency, "summary": summary})
+            print_step(concurrency, summary)
+        print_capacity(steps)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+            log_file.close()
+        if comfyui is not None:
+            comfyui.stop()
+        work_dir.cleanup()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "target": args.url or "stubbed",
+                "mix": args.mix,
+                "duration_per_step": args.duration,
+                "comfyui_time": None if args.url else args.comfyui_time,
+                "steps": steps,
+            }, f, indent=2)
+        print(f"\n💾 Report written to {args.output}")
+
+    if args.max_error_rate is not None:
+        failing = [step["concurrency"] for step in steps if step["summary"]["error_rate"] > args.max_error_rate]
+        if failing:
+            print(f"\n❌ Error rate above {args.max_error_rate:.1%} at {', '.join(map(str, failing))} clients")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
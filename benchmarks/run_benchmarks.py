@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Benchmark Runner for the Sprite Pipeline Stages
+Times the quality checks, every YOLO entry point, the cowboy-shot analysis,
+cropping and the whole process_character_pipeline (ComfyUI stubbed) on the
+synthetic corpus from benchmarks/corpus.py. Each benchmark runs in its own
+subprocess so peak RSS is measured per benchmark.
+
+Reports p50/p95/mean latency per call, throughput in images/s and peak RSS,
+and can save results as a named baseline or compare against one.
+
+Usage:
+    python3 benchmarks/run_benchmarks.py
+    python3 benchmarks/run_benchmarks.py --only quality_check,crop_to_target_ratio --repeat 5
+    python3 benchmarks/run_benchmarks.py --save-baseline main
+    python3 benchmarks/run_benchmarks.py --compare main --max-regression 0.10
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+BASELINE_DIR = os.path.join(BENCHMARK_DIR, "baselines")
+DEFAULT_CORPUS_DIR = os.path.join(BENCHMARK_DIR, ".corpus")
+
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from corpus import generate_corpus, load_corpus
+from stubs import StubComfyUI, patched_pipeline
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# ===== Benchmark definitions =====
+# Each setup(pipeline, paths, work_dir) returns (func, items, images_per_call);
+# func(item) is timed once per item and round. Setup work is not timed.
+
+def setup_per_image(func_name):
+    def setup(pipeline, paths, work_dir):
+        return getattr(pipeline, func_name), paths, 1
+    return setup
+
+
+def setup_quality_check_batch(pipeline, paths, work_dir):
+    import cv2
+    images = [cv2.imread(path) for path in paths]
+    return pipeline.check_image_quality_batch, [images], len(images)
+
+
+def setup_analyze_images_batch(pipeline, paths, work_dir):
+    def analyze_all(batch_paths):
+        return list(pipeline.analyze_images_batch(batch_paths, batch_size=8))
+    return analyze_all, [paths], len(paths)
+
+
+def setup_cowboy_analysis(pipeline, paths, work_dir):
+    import cv2
+    items = []
+    for path in paths:
+        faces = pipeline.detect_faces_yolo(path)
+        if not faces:
+            # Keep images without detections in the set with a nominal head box
+            height, width = cv2.imread(path).shape[:2]
+            faces = [{
+                'bbox': [width * 2 // 5, height // 10, width * 3 // 5, height // 4],
+                'confidence': 1.0, 'size_ratio': 0.03, 'width': width / 5, 'height': height * 3 / 20,
+            }]
+        items.append((path, faces))
+
+    def analyze(item):
+        return pipeline.analyze_cowboy_shot_potential(*item)
+    return analyze, items, 1
+
+
+def setup_crop(pipeline, paths, work_dir):
+    def crop(path):
+        output_path = os.path.join(work_dir, "crop_" + os.path.basename(path))
+        return pipeline.crop_to_target_ratio(path, output_path)
+    return crop, paths, 1
+
+
+def setup_full_pipeline(pipeline, paths, work_dir):
+    corpus_dir = os.path.dirname(paths[0])
+    stub = StubComfyUI(os.path.join(work_dir, "outpainted"))
+
+    def run_pipeline(_):
+        with patched_pipeline(pipeline, corpus_dir, os.path.join(work_dir, "sprites"), stub):
+            return pipeline.process_character_pipeline()
+    return run_pipeline, [None], len(paths)
+
+
+BENCHMARKS = {
+    "quality_check": setup_per_image("check_image_quality"),
+    "quality_check_batch": setup_quality_check_batch,
+    "yolo_inference": setup_per_image("run_yolo"),
+    "detect_person_count": setup_per_image("detect_person_count"),
+    "detect_faces_yolo": setup_per_image("detect_faces_yolo"),
+    "detect_body_parts": setup_per_image("detect_body_parts"),
+    "analyze_images_batch": setup_analyze_images_batch,
+    "comprehensive_image_validation": setup_per_image("comprehensive_image_validation"),
+    "analyze_cowboy_shot_potential": setup_cowboy_analysis,
+    "crop_to_target_ratio": setup_crop,
+    "process_character_pipeline": setup_full_pipeline,
+}
+
+
+# ===== Worker (one benchmark per process) =====
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_worker(name, corpus_dir, repeat, warmup):
+    manifest = load_corpus(corpus_dir)
+    paths = [os.path.join(corpus_dir, entry["file"]) for entry in manifest["images"]]
+
+    import character_image_pipeline as pipeline
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as work_dir, \
+            open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        func, items, images_per_call = BENCHMARKS[name](pipeline, paths, work_dir)
+
+        for _ in range(warmup):
+            for item in items:
+                func(item)
+
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for item in items:
+                call_start = time.perf_counter()
+                func(item)
+                latencies.append(time.perf_counter() - call_start)
+        total_seconds = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "images": len(latencies) * images_per_call,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "throughput_images_per_s": round(len(latencies) * images_per_call / total_seconds, 2),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ===== Orchestrator =====
+
+def run_in_subprocess(name, corpus_dir, repeat, warmup, verbose=False):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_file = f.name
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--worker", name,
+        "--corpus", corpus_dir, "--repeat", str(repeat), "--warmup", str(warmup),
+        "--result-file", result_file,
+    ]
+    try:
+        completed = subprocess.run(
+            cmd, cwd=ROOT_DIR, text=True,
+            stdout=None if verbose else subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+        with open(result_file, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.remove(result_file)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def print_results(results):
+    print(f"\n{'benchmark':<32} {'p50 ms':>10} {'p95 ms':>10} {'img/s':>10} {'peak MB':>9}")
+    print("-" * 75)
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<32} ❌ {result['error']}")
+            continue
+        print(f"{name:<32} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} "
+              f"{result['throughput_images_per_s']:>10.2f} {result['peak_rss_mb'] or 0:>9.1f}")
+
+
+def compare_to_baseline(results, baseline, max_regression=None):
+    """Print changes vs the baseline; returns names that regressed beyond max_regression"""
+    print(f"\n📊 Compared to baseline from {baseline['created']} (commit {baseline.get('git_commit')})")
+    print(f"{'benchmark':<32} {'p50':>9} {'p95':>9} {'img/s':>9}")
+    regressions = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if not base or "error" in base or "error" in result:
+            continue
+        p50 = result["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0
+        p95 = result["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0
+        throughput = result["throughput_images_per_s"] / base["throughput_images_per_s"] - 1
+        flag = ""
+        if max_regression is not None and p50 > max_regression:
+            regressions.append(name)
+            flag = " ⚠️"
+        print(f"{name:<32} {p50:>+8.1%} {p95:>+8.1%} {throughput:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sprite pipeline stages")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR, help="Corpus folder (generated if missing)")
+    parser.add_argument("--corpus-seed", type=int, default=0)
+    parser.add_argument("--corpus-copies", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed rounds over the corpus")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed rounds (model load, caches)")
+    parser.add_argument("--save-baseline", metavar="NAME", help="Save results to benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against benchmarks/baselines/NAME.json")
+    parser.add_argument("--max-regression", type=float, help="Exit 1 if any p50 is slower by more than this fraction")
+    parser.add_argument("--verbose", action="store_true", help="Show benchmark subprocess output")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.corpus, args.repeat, args.warmup)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    manifest = load_corpus(args.corpus)
+    if manifest is None or (manifest["seed"], manifest["copies"]) != (args.corpus_seed, args.corpus_copies):
+        print(f"Generating corpus in {args.corpus}...")
+        generate_corpus(args.corpus, args.corpus_seed, args.corpus_copies)
+        manifest = load_corpus(args.corpus)
+    print(f"Corpus: {len(manifest['images'])} images ({manifest['seed_photos']} seed photos)")
+
+    results = {}
+    for name in names:
+        print(f"⏱️  {name}...")
+        results[name] = run_in_subprocess(name, args.corpus, args.repeat, args.warmup, args.verbose)
+    print_results(results)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        baseline_path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "git_commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "corpus": {key: manifest[key] for key in ("seed", "copies", "seed_photos")},
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+        print(f"\n💾 Baseline saved to {baseline_path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\n❌ Regressed beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Stand-ins for External Services Used by the Benchmarks
+StubComfyUI replaces comfyui_outpaint_image with a local border-reflect pad
+(plus optional simulated latency), so pipeline benchmarks measure our own
+code rather than the GPU server. StubImageSearch replaces
+search_and_download_images with copies of corpus images.
+"""
+
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import cv2
+
+
+class StubComfyUI:
+    """Drop-in for comfyui_outpaint_image that pads the image locally"""
+
+    def __init__(self, output_dir, latency=0.0):
+        self.output_dir = output_dir
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def __call__(self, image_path, left_padding=0, right_padding=0, top_padding=0, bottom_padding=0,
+                 text_prompt=None, cancel_token=None):
+        with self._lock:
+            self.calls += 1
+        if cancel_token is not None and cancel_token.cancelled:
+            return None
+
+        img = cv2.imread(image_path)
+        if img is None:
+            return None
+        if self.latency:
+            time.sleep(self.latency)
+
+        padded = cv2.copyMakeBorder(
+            img, int(top_padding), int(bottom_padding), int(left_padding), int(right_padding),
+            cv2.BORDER_REFLECT
+        )
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        output_path = os.path.join(self.output_dir, f"{stem}_outpainted.jpg")
+        cv2.imwrite(output_path, padded)
+        return output_path
+
+
+class StubImageSearch:
+    """Drop-in for search_and_download_images that copies corpus images"""
+
+    def __init__(self, image_paths, latency=0.0):
+        self.image_paths = list(image_paths)
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, character_name, num_images=10, download_dir="downloaded_images"):
+        with self._lock:
+            offset = self.calls * num_images
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        os.makedirs(download_dir, exist_ok=True)
+        slug = re.sub(r"[^a-z0-9]+", "_", character_name.lower()).strip("_")
+        downloaded = []
+        for i in range(num_images):
+            source = self.image_paths[(offset + i) % len(self.image_paths)]
+            destination = os.path.join(download_dir, f"{slug}_{i + 1:02d}{os.path.splitext(source)[1]}")
+            shutil.copyfile(source, destination)
+            downloaded.append(destination)
+        return downloaded
+
+
+@contextmanager
+def patched_pipeline(pipeline, download_dir, output_dir, comfyui_stub):
+    """Point character_image_pipeline at the corpus and the ComfyUI stub"""
+    saved = (pipeline.DOWNLOAD_DIR, pipeline.OUTPUT_DIR, pipeline.comfyui_outpaint_image)
+    pipeline.DOWNLOAD_DIR = download_dir
+    pipeline.OUTPUT_DIR = output_dir
+    pipeline.comfyui_outpaint_image = comfyui_stub
+    try:
+        yield pipeline
+    finally:
+        pipeline.DOWNLOAD_DIR, pipeline.OUTPUT_DIR, pipeline.comfyui_outpaint_image = saved
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Cancellation Tokens for Character Image Pipeline
+Lets a job be stopped from another thread (e.g. DELETE /jobs/{id}) and
+propagates the cancellation into worker threads and ComfyUI requests.
+"""
+
+import threading
+
+
+class JobCancelled(Exception):
+    """Raised when work is abandoned because its job was cancelled"""
+
+
+class CancellationToken:
+    """Thread-safe cancellation flag with cancel callbacks
+
+    Long-running calls register a callback (e.g. to delete their ComfyUI
+    prompt) that fires once when cancel() is called.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Mark the token cancelled and run registered callbacks once"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Cancellation callback failed: {e}")
+
+    def add_callback(self, callback):
+        """Register a callback; runs immediately if already cancelled"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled("Job was cancelled")
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds; returns True early if cancelled"""
+        return self._event.wait(timeout)
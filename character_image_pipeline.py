@@ -15,9 +15,20 @@ from urllib.parse import quote
 from ultralytics import YOLO
 import time
 import shutil
+import threading
+import itertools
+from contextlib import nullcontext
+from datetime import datetime
 from pathlib import Path
+import google_search_integration
 from google_search_integration import search_and_download_images
 from scripts.comfyui_outpainting import comfyui_outpaint_image
+from pipeline_metrics import time_stage, observe_stage, record_rejection
+from pipeline_tracing import span
+from pipeline_profiling import JobProfiler, PROFILE_MODES
+from stage_pipeline import Stage, StagePipeline, StageRejected
+from run_manifest import RunManifest
+from image_index import ImageIndex
 
 # --- CONFIG ---
 SEARCH_QUERY = ""  # Will be set dynamically
@@ -34,10 +45,58 @@ TARGET_ASPECT_RATIO = TARGET_WIDTH / TARGET_HEIGHT
 FACE_TARGET_Y_RATIO = 0.25
 FACE_SIZE_RATIO_MIN = 0.15
 FACE_SIZE_RATIO_MAX = 0.25
+YOLO_MODEL_PATH = "models/yolov8n.pt"
+MAX_SPRITES = 5  # Candidates admitted for outpainting/cropping per run
+SPRITE_NAME = "sprite_{number:02d}.jpg"  # formatted with the candidate's sprite number
+
+# Worker threads per streaming stage, in pipeline order
+STREAM_STAGE_WORKERS = {
+    "download": 4,
+    "probe": 2,
+    "decode": 2,
+    "detect": 1,  # YOLO inference
+    "plan": 1,
+    "outpaint": 3,  # ComfyUI requests in flight
+    "crop": 2,
+    "verify": 1  # YOLO inference
+}
+
+# Stages that judge a candidate on its own, before admission (plan)
+ANALYSIS_STAGES = ("download", "probe", "decode", "detect")
+# Candidate fields written by the analysis stages
+ANALYSIS_FIELDS = ("width", "height", "faces", "body_parts", "person_count", "cowboy_analysis", "validation")
+
+# Streaming stages checkpointed in the run manifest, in pipeline order:
+# (candidate field holding the output file, JSON fields restored on resume)
+CHECKPOINT_FIELDS = {
+    "download": ("path", ()),
+    "detect": (None, ANALYSIS_FIELDS),
+    "plan": (None, ("sprite_number",)),
+    "outpaint": ("processed_input", ()),
+    "crop": ("output", ()),
+    "verify": (None, ("sprite",))
+}
+# Rejections from these stages are final; later failures are retried on resume
+FINAL_REJECTION_STAGES = ("probe", "decode", "detect", "plan")
+
+# Incremental folder mode: per-image results kept in the folder's image index
+INDEX_FIELDS = {
+    "detect": (None, ANALYSIS_FIELDS),
+    "plan": (None, ("sprite_number",)),
+    "outpaint": ("processed_input", ())
+}
+# Rejections that depend only on the image itself (not on the candidate limit)
+INDEX_REJECTION_STAGES = ("probe", "decode", "detect")
 
 # --- LOAD YOLO ---
 print("Loading YOLO model...")
-yolo_model = YOLO("models/yolov8n.pt")
+yolo_model = YOLO(YOLO_MODEL_PATH)
+
+def run_yolo(source):
+    """Run YOLO inference on a path, array or list of arrays (timed)"""
+    batch_size = len(source) if isinstance(source, list) else 1
+    with time_stage("yolo_inference", detector=os.path.basename(YOLO_MODEL_PATH), batch_size=batch_size):
+        return yolo_model(source, verbose=False)
 
 def search_google_images(query, max_images=15):
     """Search for real images using web scraping"""
@@ -77,11 +136,12 @@ def download_image(url, filename):
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            with open(filename, 'wb') as f:
-                f.write(response.content)
-            return True
+        with time_stage("download"):
+            response = requests.get(url, headers=headers, timeout=10)
+            if response.status_code == 200:
+                with open(filename, 'wb') as f:
+                    f.write(response.content)
+                return True
     except Exception as e:
         print(f"❌ Download error for {url}: {e}")
     return False
@@ -94,6 +154,19 @@ def check_image_quality(img_path):
         if img is None:
             return False, "Could not load image"
         
+        return check_image_quality_array(img)
+        
+    except Exception as e:
+        return False, f"Quality check error: {e}"
+
+def check_image_quality_array(img):
+    """Quality checks on an already decoded BGR image"""
+    height, width = img.shape[:2]
+    with time_stage("quality_check", image_width=width, image_height=height):
+        return _check_image_quality_array(img)
+
+def _check_image_quality_array(img):
+    try:
         height, width = img.shape[:2]
         min_dimension = min(width, height)
         
@@ -121,10 +194,153 @@ def check_image_quality(img_path):
     except Exception as e:
         return False, f"Quality check error: {e}"
 
+def check_image_quality_batch(images):
+    """Quality checks for a batch of decoded images
+    
+    Resolution and aspect ratio are checked for the whole batch at once;
+    only the blur check (Laplacian variance) runs per image.
+    """
+    if not images:
+        return []
+    
+    start_time = time.perf_counter()
+    shapes = np.array([img.shape[:2] for img in images], dtype=np.float64)
+    heights, widths = shapes[:, 0], shapes[:, 1]
+    min_dimensions = np.minimum(widths, heights)
+    aspect_ratios = widths / heights
+    quality_scores = np.minimum(min_dimensions / 1024, 1.0) * 100
+    
+    results = []
+    for img, min_dimension, aspect_ratio, quality_score in zip(images, min_dimensions, aspect_ratios, quality_scores):
+        if min_dimension < MIN_RESOLUTION:
+            results.append((False, f"Resolution too low: {int(min_dimension)}px (min: {MIN_RESOLUTION}px)"))
+            continue
+        
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        blur_score = cv2.Laplacian(gray, cv2.CV_64F).var()
+        
+        if blur_score < 100:
+            results.append((False, f"Image too blurry: {blur_score:.1f} (min: 100)"))
+        elif aspect_ratio < 0.3 or aspect_ratio > 3.0:
+            results.append((False, f"Extreme aspect ratio: {aspect_ratio:.2f}"))
+        else:
+            results.append((True, f"Quality score: {quality_score:.1f}/100, Blur: {blur_score:.1f}"))
+    
+    # Report the per-image share of the batch so the histogram stays comparable
+    per_image = (time.perf_counter() - start_time) / len(images)
+    for _ in images:
+        observe_stage("quality_check", per_image)
+    
+    return results
+
+def parse_yolo_detections(result):
+    """Split one YOLO result into the person, face and body part views
+    
+    Mirrors detect_person_count, detect_faces_yolo and detect_body_parts so a
+    single inference pass can serve all three.
+    """
+    img_area = result.orig_shape[0] * result.orig_shape[1]
+    person_details = []
+    faces = []
+    body_parts = []
+    
+    for box in result.boxes:
+        cls = result.names[int(box.cls)]
+        confidence = float(box.conf)
+        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+        bbox = [int(x1), int(y1), int(x2), int(y2)]
+        
+        if cls == "person" and confidence > 0.5:
+            size_ratio = float(((x2 - x1) * (y2 - y1)) / img_area)
+            person_details.append({
+                'bbox': bbox,
+                'confidence': confidence,
+                'size_ratio': size_ratio
+            })
+            faces.append({
+                'bbox': bbox,
+                'confidence': confidence,
+                'size_ratio': size_ratio,
+                'width': float(x2 - x1),
+                'height': float(y2 - y1)
+            })
+        
+        if cls in ["person", "hand", "arm"] and confidence > 0.3:
+            body_parts.append({
+                'type': cls,
+                'bbox': bbox,
+                'confidence': confidence
+            })
+    
+    return {
+        'person_count': len(person_details),
+        'person_details': person_details,
+        'faces': faces,
+        'body_parts': body_parts
+    }
+
+def analyze_images_batch(img_paths, batch_size=8):
+    """Analyze many images with one decode and one batched YOLO pass per image
+    
+    Yields one result per input path (same shape as the /analyze response)
+    as soon as its batch completes.
+    """
+    for batch_start in range(0, len(img_paths), batch_size):
+        batch_paths = img_paths[batch_start:batch_start + batch_size]
+        
+        # Shared decode
+        decoded = []
+        for img_path in batch_paths:
+            img = cv2.imread(img_path)
+            if img is None:
+                yield {'file_path': img_path, 'error': 'Could not load image'}
+            else:
+                decoded.append((img_path, img))
+        
+        if not decoded:
+            continue
+        
+        images = [img for _, img in decoded]
+        quality_results = check_image_quality_batch(images)
+        
+        # Batched inference
+        try:
+            yolo_results = run_yolo(images)
+        except Exception as e:
+            print(f"❌ Batched detection error: {e}")
+            for img_path, _ in decoded:
+                yield {'file_path': img_path, 'error': f'Detection error: {e}'}
+            continue
+        
+        for (img_path, img), (is_quality_ok, quality_msg), result in zip(decoded, quality_results, yolo_results):
+            detections = parse_yolo_detections(result)
+            faces = detections['faces']
+            body_parts = detections['body_parts']
+            
+            cowboy_analysis = analyze_cowboy_shot_potential(
+                img_path, faces, img_shape=img.shape, body_parts=body_parts
+            )
+            composition = analyze_shot_composition(body_parts, faces[0]['bbox'] if faces else None)
+            
+            yield {
+                'file_path': img_path,
+                'quality': {
+                    'is_ok': is_quality_ok,
+                    'message': quality_msg
+                },
+                'person_count': [detections['person_count'], detections['person_details']],
+                'face_count': len(faces),
+                'faces': faces,
+                'body_parts': body_parts,
+                'composition': composition,
+                'cowboy_analysis': cowboy_analysis,
+                'analysis_timestamp': datetime.now().isoformat()
+            }
+
 def detect_person_count(img_path):
     """Detect and validate number of people in image using YOLO"""
     try:
-        results = yolo_model(img_path, verbose=False)
+        results = run_yolo(img_path)
         person_count = 0
         person_details = []
         
@@ -148,7 +364,7 @@ def detect_person_count(img_path):
 def detect_faces_yolo(img_path):
     """Detect and validate faces using YOLO model"""
     try:
-        results = yolo_model(img_path, verbose=False)
+        results = run_yolo(img_path)
         faces = []
         
         for r in results:
@@ -176,9 +392,33 @@ def detect_faces_yolo(img_path):
 
 def comprehensive_image_validation(img_path):
     """Comprehensive validation of image for character sprite generation"""
+    try:
+        img = cv2.imread(img_path)
+        if img is None:
+            return validate_detections(None, False, "Could not load image")
+        
+        quality_ok, quality_msg = check_image_quality_array(img)
+        if not quality_ok:
+            return validate_detections(None, quality_ok, quality_msg)
+        
+        # One YOLO pass serves person and face detection
+        return validate_detections(parse_yolo_detections(run_yolo(img)[0]), quality_ok, quality_msg)
+        
+    except Exception as e:
+        validation_results = validate_detections(None, False)
+        validation_results['issues'] = [f"Validation error: {e}"]
+        return validation_results
+
+def validate_detections(detections, quality_ok=True, quality_msg=""):
+    """Sprite suitability rules shared by every entry point
+    
+    detections: parse_yolo_detections() output (None if the quality check
+    already failed). Returns the validation dict with is_valid, issues,
+    warnings and a 0-100 score.
+    """
     validation_results = {
         'is_valid': False,
-        'quality_ok': False,
+        'quality_ok': quality_ok,
         'person_count': 0,
         'face_count': 0,
         'face_details': [],
@@ -188,84 +428,106 @@ def comprehensive_image_validation(img_path):
         'score': 0
     }
     
-    try:
-        # 1. Quality check
-        quality_ok, quality_msg = check_image_quality(img_path)
-        validation_results['quality_ok'] = quality_ok
-        if not quality_ok:
-            validation_results['issues'].append(f"Quality: {quality_msg}")
-            return validation_results
-        
-        # 2. Person detection
-        person_count, person_details = detect_person_count(img_path)
-        validation_results['person_count'] = person_count
-        validation_results['person_details'] = person_details
-        
-        if person_count == 0:
-            validation_results['issues'].append("No people detected")
-            return validation_results
-        elif person_count > 1:
-            validation_results['warnings'].append(f"Multiple people detected: {person_count}")
-        
-        # 3. Face detection
-        faces = detect_faces_yolo(img_path)
-        validation_results['face_count'] = len(faces)
-        validation_results['face_details'] = faces
-        
-        if len(faces) == 0:
-            validation_results['issues'].append("No faces detected")
-            return validation_results
-        elif len(faces) > 1:
-            validation_results['issues'].append(f"Multiple faces detected: {len(faces)}")
-            return validation_results
-        
-        # 4. Face quality validation
-        best_face = faces[0]
-        face_size_ratio = best_face['size_ratio']
-        face_confidence = best_face['confidence']
-        
-        if face_confidence < 0.7:
-            validation_results['warnings'].append(f"Low face confidence: {face_confidence:.2f}")
-        
-        if face_size_ratio < 0.01:
-            validation_results['issues'].append("Face too small in image")
-            return validation_results
-        elif face_size_ratio > 0.5:
-            validation_results['warnings'].append("Face very large in image")
-        
-        # 5. Calculate overall score
-        score = 50  # Base score
-        
-        # Quality bonus
-        if quality_ok:
-            score += 20
-        
-        # Face confidence bonus
-        score += int(face_confidence * 20)
-        
-        # Face size bonus (optimal range)
-        if 0.02 <= face_size_ratio <= 0.3:
-            score += 10
-        
-        # Person count penalty
-        if person_count == 1:
-            score += 10
-        elif person_count > 1:
-            score -= 10
-        
-        validation_results['score'] = min(score, 100)
-        validation_results['is_valid'] = len(validation_results['issues']) == 0
-        
+    # 1. Quality check
+    if not quality_ok:
+        validation_results['issues'].append(f"Quality: {quality_msg}")
         return validation_results
-        
-    except Exception as e:
-        validation_results['issues'].append(f"Validation error: {e}")
+    
+    # 2. Person detection
+    person_count = detections['person_count']
+    validation_results['person_count'] = person_count
+    validation_results['person_details'] = detections['person_details']
+    
+    if person_count == 0:
+        validation_results['issues'].append("No people detected")
+        return validation_results
+    elif person_count > 1:
+        validation_results['warnings'].append(f"Multiple people detected: {person_count}")
+    
+    # 3. Face detection
+    faces = detections['faces']
+    validation_results['face_count'] = len(faces)
+    validation_results['face_details'] = faces
+    
+    if len(faces) == 0:
+        validation_results['issues'].append("No faces detected")
         return validation_results
+    elif len(faces) > 1:
+        validation_results['issues'].append(f"Multiple faces detected: {len(faces)}")
+        return validation_results
+    
+    # 4. Face quality validation
+    best_face = faces[0]
+    face_size_ratio = best_face['size_ratio']
+    face_confidence = best_face['confidence']
+    
+    if face_confidence < 0.7:
+        validation_results['warnings'].append(f"Low face confidence: {face_confidence:.2f}")
+    
+    if face_size_ratio < 0.01:
+        validation_results['issues'].append("Face too small in image")
+        return validation_results
+    elif face_size_ratio > 0.5:
+        validation_results['warnings'].append("Face very large in image")
+    
+    # 5. Calculate overall score
+    score = 50  # Base score
+    
+    # Quality bonus
+    if quality_ok:
+        score += 20
+    
+    # Face confidence bonus
+    score += int(face_confidence * 20)
+    
+    # Face size bonus (optimal range)
+    if 0.02 <= face_size_ratio <= 0.3:
+        score += 10
+    
+    # Person count penalty
+    if person_count == 1:
+        score += 10
+    elif person_count > 1:
+        score -= 10
+    
+    validation_results['score'] = min(score, 100)
+    validation_results['is_valid'] = len(validation_results['issues']) == 0
+    
+    return validation_results
+
+def metadata_rank_score(width, height, file_size):
+    """Cheap pre-detection score from header metadata (higher is evaluated first)
+
+    Prefers images at least MIN_RESOLUTION on the short side, with an aspect
+    ratio close to the portrait sprite target, then larger images.
+    """
+    if min(width, height) < MIN_RESOLUTION:
+        return 0.0
+    aspect_error = abs(np.log((width / height) / TARGET_ASPECT_RATIO))
+    megapixels = min(width * height / 1e6, 4.0)
+    return 10.0 + 5.0 / (1.0 + 3.0 * aspect_error) + megapixels + min(file_size / 1e6, 1.0)
+
+def rank_images_by_metadata(img_paths):
+    """Order image paths by metadata_rank_score without decoding any pixels
+
+    Unreadable images keep their relative order at the end, where
+    validation rejects them as usual.
+    """
+    scored = []
+    for order, img_path in enumerate(img_paths):
+        try:
+            with Image.open(img_path) as img:
+                width, height = img.size
+            score = metadata_rank_score(width, height, os.path.getsize(img_path))
+        except Exception:
+            score = -1.0
+        scored.append((-score, order, img_path))
+    return [img_path for _, _, img_path in sorted(scored)]
 
 def detect_body_parts(img_path):
     """Detect body parts to understand current shot composition"""
     try:
-        results = yolo_model(img_path, verbose=False)
+        results = run_yolo(img_path)
         body_parts = []
         
         for r in results:
@@ -308,17 +570,23 @@ def analyze_shot_composition(body_parts, face_bbox):
     
     return 'headshot_only'
 
-def analyze_cowboy_shot_potential(img_path, faces):
-    """Smart analysis to determine if outpainting is needed for cowboy shot"""
+def analyze_cowboy_shot_potential(img_path, faces, img_shape=None, body_parts=None):
+    """Smart analysis to determine if outpainting is needed for cowboy shot
+    
+    img_shape and body_parts can be passed in when the caller already decoded
+    the image / ran detection, to skip the extra imread and YOLO pass.
+    """
     if not faces:
         return {'needs_outpainting': True, 'reason': 'No face detected', 'strategy': 'extend_downward'}
     
     # Get image dimensions
-    img = cv2.imread(img_path)
-    if img is None:
-        return {'needs_outpainting': False, 'reason': 'Could not load image'}
+    if img_shape is None:
+        img = cv2.imread(img_path)
+        if img is None:
+            return {'needs_outpainting': False, 'reason': 'Could not load image'}
+        img_shape = img.shape
     
-    img_height, img_width = img.shape[:2]
+    img_height, img_width = img_shape[:2]
     best_face = max(faces, key=lambda x: x['confidence'])
     
     # Face position analysis
@@ -328,7 +596,8 @@ def analyze_cowboy_shot_potential(img_path, faces):
     face_size_ratio = face_height / img_height
     
     # Detect body parts to understand composition
-    body_parts = detect_body_parts(img_path)
+    if body_parts is None:
+        body_parts = detect_body_parts(img_path)
     composition = analyze_shot_composition(body_parts, best_face['bbox'])
     
     print(f"  📊 Composition analysis: {composition}")
@@ -522,6 +791,10 @@ def analyze_face_positioning(img_path, faces):
 
 def crop_to_target_ratio(img_path, output_path, crop_suggestion=None):
     """Crop image to target 2:3 aspect ratio"""
+    with time_stage("crop", image=os.path.basename(img_path)):
+        return _crop_to_target_ratio(img_path, output_path, crop_suggestion)
+
+def _crop_to_target_ratio(img_path, output_path, crop_suggestion=None):
     try:
         img = cv2.imread(img_path)
         if img is None:
@@ -561,7 +834,6 @@ def archive_previous_images(character_name=None):
     """Archive previous images to keep history"""
     try:
         # Create archive directory with timestamp
-        from datetime import datetime
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         archive_subdir = f"{character_name}_{timestamp}" if character_name else f"search_{timestamp}"
         archive_path = os.path.join(ARCHIVE_DIR, archive_subdir)
@@ -618,17 +890,70 @@ def search_character_images(character_name, num_images=10):
         print(f"❌ Search error: {e}")
         return []
 
-def process_character_pipeline(character_name=None, use_google_search=False):
-    """Main pipeline function"""
+def process_character_pipeline(character_name=None, use_google_search=False, profile=None, run_id=None,
+                               incremental=False):
+    """Main pipeline function (traced as one job span)
+    
+    profile: optional "cprofile", "pyinstrument" or "tracemalloc"; the
+    profiler artifact is written to OUTPUT_DIR/profiles.
+    run_id: checkpoint the run in a run manifest under this id so it can be
+    resumed; if that run already exists it is resumed instead. Without a
+    run_id nothing is checkpointed.
+    incremental: when processing the DOWNLOAD_DIR folder, reuse the analysis
+    and outpainting of images unchanged since the last incremental run.
+    """
+    manifest = None
+    if run_id:
+        manifest = RunManifest.open(run_id, params={
+            'character_name': character_name,
+            'use_google_search': use_google_search,
+            'incremental': incremental
+        })
+    
+    profiler = None
+    if profile:
+        profile_name = f"pipeline_{time.strftime('%Y%m%d_%H%M%S')}"
+        profiler = JobProfiler(profile, os.path.join(OUTPUT_DIR, "profiles"), profile_name)
+    
+    with span("pipeline_job", kind="job", character_name=character_name, use_google_search=use_google_search,
+              run_id=run_id):
+        with profiler or nullcontext():
+            result = _process_character_pipeline(character_name, use_google_search, manifest, incremental, profiler)
+    
+    if profiler is not None:
+        print(f"📈 Profile ({profile}): {profiler.artifact or profiler.error}")
+    return result
+
+def resume(run_id, profile=None):
+    """Resume a checkpointed run, redoing only the unfinished candidate stages
+    
+    Raises FileNotFoundError if there is no manifest for run_id.
+    """
+    manifest = RunManifest.load(run_id)
+    return process_character_pipeline(
+        manifest.params.get('character_name'),
+        manifest.params.get('use_google_search', False),
+        profile=profile,
+        run_id=run_id,
+        incremental=manifest.params.get('incremental', False)
+    )
+
+def _process_character_pipeline(character_name, use_google_search, manifest, incremental=False, profiler=None):
     print("🎭 Character Image Acquisition Pipeline")
     print("=" * 50)
+    if manifest is not None:
+        print(f"🧾 Run ID: {manifest.run_id}")
     
     # Create directories
     os.makedirs(DOWNLOAD_DIR, exist_ok=True)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     # Step 0: Search for images if requested
-    if use_google_search and character_name:
+    if manifest is not None and manifest.inputs is not None:
+        # Resumed run: reuse the recorded candidates instead of searching again
+        candidates = [dict(candidate) for candidate in manifest.inputs]
+        print(f"\n♻️ Resuming run with {len(candidates)} candidates (checkpoints: {manifest.completed_stages()})")
+    elif use_google_search and character_name:
         print("\n🔍 Step 0: Searching for Character Images")
         
         # Archive previous images first
@@ -636,9 +961,9 @@ def process_character_pipeline(character_name=None, use_google_search=False):
         if archived_count > 0:
             print(f"📦 Archived {archived_count} previous images to: {archive_path}")
         
-        # Download fresh images
-        downloaded_images = search_character_images(character_name, num_images=10)
-        if not downloaded_images:
+        # Candidates are downloaded by the pipeline's download stage
+        candidates = search_candidates(character_name, num_images=10)
+        if not candidates:
             print("❌ No images found, continuing with existing images...")
             return
     else:
@@ -659,162 +984,66 @@ def process_character_pipeline(character_name=None, use_google_search=False):
             print(f"❌ No images found in {DOWNLOAD_DIR} folder")
             print(f"💡 Please add images to the {DOWNLOAD_DIR} folder and run again")
             return
-    
-    print(f"Found {len(downloaded_images)} images in {DOWNLOAD_DIR} folder:")
-    for img in downloaded_images:
-        print(f"  - {os.path.basename(img)}")
-    
-    # Step 2: Image Validation & Selection
-    print("\n🔍 Step 2: Image Validation & Selection")
-    valid_candidates = []
-    
-    for img_path in downloaded_images:
-        print(f"\nAnalyzing {os.path.basename(img_path)}:")
-        
-        # Quality check
-        is_quality_ok, quality_msg = check_image_quality(img_path)
-        print(f"  Quality: {quality_msg}")
-        
-        if not is_quality_ok:
-            continue
-        
-        # Person count check
-        person_count = detect_person_count(img_path)
-        print(f"  Persons: {person_count}")
-        
-        # Face detection and smart cowboy shot analysis
-        faces = detect_faces_yolo(img_path)
         
-        print(f"  Faces: {len(faces)}")
-        
-        # Allow if single face detected (regardless of person count)
-        if len(faces) != 1:
-            print(f"  ❌ Skipped: {len(faces)} faces detected")
-            continue
-        
-        # Smart cowboy shot analysis
-        cowboy_analysis = analyze_cowboy_shot_potential(img_path, faces)
-        print(f"  🎯 Cowboy shot analysis: {cowboy_analysis['reason']}")
-        
-        valid_candidates.append({
-            'path': img_path,
-            'faces': faces,
-            'cowboy_analysis': cowboy_analysis,
-            'positioning_score': 50  # Default score for smart analysis
-        })
-        print(f"  ✅ Valid candidate")
+        print(f"Found {len(downloaded_images)} images in {DOWNLOAD_DIR} folder:")
+        for img in downloaded_images:
+            print(f"  - {os.path.basename(img)}")
+        candidates = [{'index': i, 'key': path, 'path': path} for i, path in enumerate(downloaded_images)]
     
-    # Rank candidates by positioning score
-    valid_candidates.sort(key=lambda x: x['positioning_score'], reverse=True)
+    if manifest is not None and manifest.inputs is None:
+        manifest.set_inputs(candidates)
     
-    print(f"\n📊 Found {len(valid_candidates)} valid candidates")
+    # Incremental folder mode: results of unchanged images come from the folder's index
+    index = None
+    if incremental and not use_google_search:
+        index = ImageIndex.for_directory(DOWNLOAD_DIR)
+        index.prune([candidate['path'] for candidate in candidates])
     
-    # Step 3-4: Processing and Cropping
-    print("\n✂️ Step 3-4: Processing and Cropping")
-    processed_sprites = []
+    # Skip candidates a previous attempt rejected and restore checkpointed stages
+    engine = SpritePipeline(max_sprites=MAX_SPRITES, manifest=manifest, index=index, profiler=profiler)
+    pending = engine.prepare(candidates)
+    if len(pending) < len(candidates):
+        print(f"⏭️ {len(candidates) - len(pending)} candidates already rejected in an earlier attempt or incremental run")
+    if index is not None:
+        reused = sum(1 for candidate in pending if candidate.get('index_reused'))
+        print(f"♻️ Incremental: {reused} unchanged images reuse their analysis, "
+              f"{len(pending) - reused} new or changed images to analyze")
     
-    for i, candidate in enumerate(valid_candidates[:5]):  # Top 5 candidates
-        input_path = candidate['path']
-        output_filename = f"sprite_{i+1:02d}.jpg"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-        
-        print(f"\nProcessing {os.path.basename(input_path)} -> {output_filename}")
-        
-        # Step 1: Smart outpainting analysis and application
-        cowboy_analysis = candidate['cowboy_analysis']
-        
-        if cowboy_analysis['needs_outpainting']:
-            print(f"  🎨 Smart outpainting needed: {cowboy_analysis['reason']}")
-            print(f"  📝 Strategy: {cowboy_analysis['strategy']}")
-            
-            # Apply smart outpainting with composition-aware padding
-            padding = cowboy_analysis['padding']
-            prompt = cowboy_analysis['prompt']
-            
-            print(f"  📏 Smart padding: top={padding['top']}, bottom={padding['bottom']}, left={padding['left']}, right={padding['right']}")
-            print(f"  💬 Smart prompt: {prompt}")
-            
-            # Apply outpainting with ComfyUI
-            outpainted_path = comfyui_outpaint_image(
-                input_path,
-                left_padding=padding['left'],
-                right_padding=padding['right'],
-                top_padding=padding['top'],
-                bottom_padding=padding['bottom'],
-                text_prompt=prompt
-            )
-            
-            if outpainted_path and os.path.exists(outpainted_path):
-                # Use outpainted image for further processing
-                processed_input = outpainted_path
-                print(f"  ✅ Smart outpainting applied successfully")
-            else:
-                # Fallback to original image
-                processed_input = input_path
-                print(f"  ⚠️ Outpainting failed, using original image")
-        else:
-            print(f"  ✅ No outpainting needed: {cowboy_analysis['reason']}")
-            processed_input = input_path
-        
-        # Step 2: Crop to target aspect ratio (2:3)
-        success, crop_msg = crop_to_target_ratio(processed_input, output_path)
-        
-        if success:
-            print(f"  ✅ {crop_msg}")
-            
-            processed_sprites.append({
-                'input': input_path,
-                'output': output_path,
-                'score': candidate['positioning_score'],
-                'cowboy_analysis': cowboy_analysis
-            })
-        else:
-            print(f"  ❌ {crop_msg}")
+    # Steps 2-6 run per candidate: each one flows through every stage on its own
+    print(f"\n🌊 Streaming {len(pending)} candidates through: {' → '.join(STREAM_STAGE_WORKERS)}")
     
-    # Step 6: Final Validation
-    print("\n✅ Step 6: Final Validation")
+    start_time = time.perf_counter()
+    time_to_first_sprite = None
     final_sprites = []
+    rejected = []
     
-    for sprite in processed_sprites:
-        output_path = sprite['output']
-        print(f"\nValidating {os.path.basename(output_path)}:")
-        
-        # Check dimensions
-        img = cv2.imread(output_path)
-        if img is not None:
-            height, width = img.shape[:2]
-            print(f"  Dimensions: {width}x{height}")
-            
-            if width == TARGET_WIDTH and height == TARGET_HEIGHT:
-                print("  ✅ Correct dimensions")
-                
-                # Smart final analysis
-                faces = detect_faces_yolo(output_path)
-                if faces:
-                    final_cowboy_analysis = analyze_cowboy_shot_potential(output_path, faces)
-                    print(f"  🎯 Final cowboy shot analysis: {final_cowboy_analysis['reason']}")
-                    
-                    # Calculate final score based on smart analysis
-                    final_score = 80 if not final_cowboy_analysis['needs_outpainting'] else 60
-                    
-                    final_sprites.append({
-                        'path': output_path,
-                        'score': final_score,
-                        'cowboy_analysis': final_cowboy_analysis,
-                        'original_analysis': sprite.get('cowboy_analysis', {})
-                    })
-                    print(f"  ✅ Valid sprite (score: {final_score}/100)")
-                else:
-                    print("  ❌ Face detection failed in final image")
-            else:
-                print("  ❌ Incorrect dimensions")
+    for candidate in engine.run(pending):
+        name = os.path.basename(candidate.get('path') or candidate.get('url', '?'))
+        if candidate['status'] == 'completed':
+            if time_to_first_sprite is None:
+                time_to_first_sprite = time.perf_counter() - start_time
+            final_sprites.append(candidate['sprite'])
+            print(f"  ✅ {name} -> {os.path.basename(candidate['sprite']['path'])} "
+                  f"(score: {candidate['sprite']['score']}/100, {sum(candidate['timings'].values()):.1f}s)")
         else:
-            print("  ❌ Could not load final image")
+            rejected.append(candidate)
+            if candidate['rejected_stage'] in ('probe', 'decode', 'detect'):
+                record_rejection([candidate['reason']])
+            print(f"  ❌ {name} dropped at {candidate['rejected_stage']}: {candidate['reason']}")
+    
+    total_time = time.perf_counter() - start_time
+    final_sprites.sort(key=lambda sprite: sprite['path'])
+    if manifest is not None:
+        manifest.set_status("completed")
+    if index is not None:
+        index.save()
     
     # Final Results
     print("\n🎯 Final Results")
     print("=" * 30)
-    print(f"Generated {len(final_sprites)} character sprites:")
+    print(f"Generated {len(final_sprites)} character sprites ({len(rejected)} candidates dropped):")
+    if time_to_first_sprite is not None:
+        print(f"⏱️ First sprite after {time_to_first_sprite:.1f}s, all done after {total_time:.1f}s")
     
     for i, sprite in enumerate(final_sprites):
         print(f"\nSprite {i+1}: {os.path.basename(sprite['path'])}")
@@ -833,12 +1062,430 @@ def process_character_pipeline(character_name=None, use_google_search=False):
             print(f"  ✅ No outpainting was needed")
     
     print(f"\n📁 Output directory: {OUTPUT_DIR}")
+    if manifest is not None:
+        print(f"🧾 Run manifest: {manifest.path}")
     print("🎭 Pipeline complete!")
+    return final_sprites
+
+def search_candidates(character_name, num_images=10):
+    """Google image results as pipeline candidates (downloaded later, per candidate)"""
+    print(f"🔍 Searching for images of: {character_name}")
+    try:
+        results = google_search_integration.search_google_images(
+            character_name, num_results=num_images, img_size="large", img_type="photo"
+        )
+    except Exception as e:
+        print(f"❌ Search error: {e}")
+        return []
+    
+    candidates = []
+    for i, result in enumerate(results[:num_images]):
+        safe_title = "".join(c for c in result['title'] if c.isalnum() or c in (' ', '-', '_')).rstrip()[:30]
+        candidates.append({
+            'index': i,
+            'key': result['url'],
+            'url': result['url'],
+            'filename': f"{character_name}_{i+1:02d}_{safe_title}",
+            'width': result.get('width'),
+            'height': result.get('height')
+        })
+    return candidates
+
+# --- STREAMING CANDIDATE STAGES ---
+# Each stage takes and returns a candidate dict; StageRejected drops it.
+
+def download_candidate(candidate):
+    """Fetch a search result (local candidates pass straight through)"""
+    if candidate.get('path'):
+        return candidate
+    
+    filepath = google_search_integration.download_image(
+        candidate['url'], candidate['filename'], candidate.get('download_dir', DOWNLOAD_DIR)
+    )
+    if not filepath:
+        raise StageRejected("Download failed")
+    candidate['path'] = filepath
+    return candidate
+
+def probe_candidate(candidate):
+    """Read the image header only and drop too-small images before decoding"""
+    try:
+        with Image.open(candidate['path']) as img:
+            width, height = img.size
+    except Exception as e:
+        raise StageRejected(f"Quality: Could not read image: {e}")
+    
+    min_dimension = min(width, height)
+    if min_dimension < MIN_RESOLUTION:
+        raise StageRejected(f"Quality: Resolution too low: {min_dimension}px (min: {MIN_RESOLUTION}px)")
+    candidate['width'], candidate['height'] = width, height
+    return candidate
+
+def decode_candidate(candidate):
+    img = cv2.imread(candidate['path'])
+    if img is None:
+        raise StageRejected("Quality: Could not load image")
+    candidate['image'] = img
+    return candidate
+
+def detect_candidate(candidate):
+    """Quality checks plus a single YOLO pass for persons, faces and body parts
+    
+    Candidates are judged by validate_detections(), the same rules as
+    comprehensive_image_validation(); its score is kept in 'validation'.
+    """
+    img = candidate.pop('image')  # decoded pixels are not needed past detection
+    is_quality_ok, quality_msg = check_image_quality_array(img)
+    if not is_quality_ok:
+        raise StageRejected(f"Quality: {quality_msg}")
+    
+    detections = parse_yolo_detections(run_yolo(img)[0])
+    validation = validate_detections(detections, is_quality_ok, quality_msg)
+    if not validation['is_valid']:
+        raise StageRejected(', '.join(validation['issues']))
+    
+    faces = detections['faces']
+    candidate['validation'] = validation
+    candidate['faces'] = faces
+    candidate['body_parts'] = detections['body_parts']
+    candidate['person_count'] = detections['person_count']
+    candidate['cowboy_analysis'] = analyze_cowboy_shot_potential(
+        candidate['path'], faces, img_shape=img.shape, body_parts=detections['body_parts']
+    )
+    return candidate
+
+def make_plan_candidate(max_sprites, admitted_numbers=()):
+    """Plan stage that admits only the first max_sprites valid candidates
+    
+    Admitted candidates get their sprite number here, so later stages can
+    run in parallel without racing for output file names. admitted_numbers
+    are the sprite numbers a resumed run already handed out; candidates
+    that arrive already numbered (callers doing their own selection, or
+    unchanged images keeping last run's number) keep their number, and the
+    others get the lowest number not yet used.
+    
+    Limits and numbers are kept per candidate 'group' (e.g. one per
+    character in a batch); a candidate's own 'max_sprites' overrides the
+    default. plan_candidate.is_full(candidate) tells whether its group
+    can still admit anything.
+    """
+    lock = threading.Lock()
+    # group -> [admitted count, sprite numbers in use]
+    admitted = {None: [len(admitted_numbers), set(admitted_numbers)]}
+    
+    def is_full(candidate):
+        with lock:
+            count = admitted.get(candidate.get('group'), [0, set()])[0]
+        return count >= candidate.get('max_sprites', max_sprites)
+    
+    def plan_candidate(candidate):
+        limit = candidate.get('max_sprites', max_sprites)
+        with lock:
+            group = admitted.setdefault(candidate.get('group'), [0, set()])
+            if group[0] >= limit:
+                raise StageRejected(f"Candidate limit reached ({limit})")
+            group[0] += 1
+            if 'sprite_number' not in candidate:
+                candidate['sprite_number'] = next(number for number in itertools.count(1) if number not in group[1])
+            group[1].add(candidate['sprite_number'])
+        return candidate
+    
+    plan_candidate.is_full = is_full
+    return plan_candidate
+
+def outpaint_candidate(candidate, outpaint=None, cancel_token=None):
+    """Smart outpainting when the composition needs it (falls back to the original)
+    
+    outpaint: the outpainting backend (default comfyui_outpaint_image).
+    """
+    cowboy_analysis = candidate['cowboy_analysis']
+    candidate['processed_input'] = candidate['path']
+    if not cowboy_analysis['needs_outpainting']:
+        return candidate
+    
+    padding = cowboy_analysis['padding']
+    outpainted_path = (outpaint or comfyui_outpaint_image)(
+        candidate['path'],
+        left_padding=padding['left'],
+        right_padding=padding['right'],
+        top_padding=padding['top'],
+        bottom_padding=padding['bottom'],
+        text_prompt=cowboy_analysis['prompt'],
+        cancel_token=cancel_token
+    )
+    if outpainted_path and os.path.exists(outpainted_path):
+        candidate['processed_input'] = outpainted_path
+    else:
+        print(f"  ⚠️ Outpainting failed for {os.path.basename(candidate['path'])}, using original image")
+    return candidate
+
+def crop_candidate(candidate, output_dir=None, sprite_name=SPRITE_NAME):
+    output_dir = candidate.get('output_dir') or output_dir or OUTPUT_DIR
+    output_path = os.path.join(output_dir, sprite_name.format(number=candidate['sprite_number']))
+    success, crop_msg = crop_to_target_ratio(candidate['processed_input'], output_path)
+    if not success:
+        raise StageRejected(crop_msg)
+    candidate['output'] = output_path
+    return candidate
+
+def verify_candidate(candidate):
+    """Final validation of the written sprite"""
+    output_path = candidate['output']
+    with time_stage("final_validation"):
+        img = cv2.imread(output_path)
+        if img is None:
+            raise StageRejected("Could not load final image")
+        
+        height, width = img.shape[:2]
+        if width != TARGET_WIDTH or height != TARGET_HEIGHT:
+            raise StageRejected(f"Incorrect dimensions: {width}x{height}")
+        
+        faces = detect_faces_yolo(output_path)
+        if not faces:
+            raise StageRejected("Face detection failed in final image")
+        
+        final_cowboy_analysis = analyze_cowboy_shot_potential(output_path, faces, img_shape=img.shape)
+    
+    candidate['sprite'] = {
+        'path': output_path,
+        'input': candidate['path'],
+        'score': 80 if not final_cowboy_analysis['needs_outpainting'] else 60,
+        'cowboy_analysis': final_cowboy_analysis,
+        'original_analysis': candidate['cowboy_analysis'],
+        'validation': candidate.get('validation', {})
+    }
+    return candidate
+
+def restore_candidate(candidate, manifest):
+    """Apply the candidate's still-valid checkpoints from an earlier attempt
+    
+    Checkpoints count only up to the first missing or changed one; the
+    candidate's skip_stages are the stages it does not need to redo.
+    """
+    stage_order = list(STREAM_STAGE_WORKERS)
+    for stage, (output_field, data_fields) in CHECKPOINT_FIELDS.items():
+        entry = manifest.stage_result(candidate['key'], stage)
+        if entry is None:
+            break
+        if output_field:
+            candidate[output_field] = entry['output']
+        candidate.update(entry['data'])
+        candidate['skip_stages'] = stage_order[:stage_order.index(stage) + 1]
+    return candidate
+
+def restore_from_index(candidate, index):
+    """Reuse the analysis (and outpainting) of an image unchanged since the last run
+    
+    Admission (plan) always runs again: which candidates become sprites
+    is decided per run (SpritePipeline.prepare reuses the sprite number).
+    """
+    stage_order = list(STREAM_STAGE_WORKERS)
+    for stage, (output_field, data_fields) in INDEX_FIELDS.items():
+        if stage == 'plan':
+            continue
+        result = index.result(candidate['path'], stage)
+        if result is None:
+            break
+        if output_field:
+            candidate[output_field] = result['output']
+        candidate.update(result['data'])
+        if stage == 'detect':
+            candidate['skip_stages'] = stage_order[:stage_order.index('detect') + 1]
+        else:
+            candidate['skip_stages'].append(stage)
+        candidate['index_reused'] = True
+    return candidate
+
+def checkpointed_stage(name, func, manifest=None, index=None):
+    """Skip stages a resumed candidate already finished; checkpoint new results
+    
+    Checkpoints go to the run manifest and, in incremental folder mode, the
+    per-image results also go to the folder's image index.
+    """
+    output_field, data_fields = CHECKPOINT_FIELDS.get(name, (None, None))
+    index_output_field, index_data_fields = INDEX_FIELDS.get(name, (None, None))
+    
+    def run(candidate):
+        if name in candidate.get('skip_stages', ()):
+            return candidate
+        try:
+            candidate = func(candidate)
+        except StageRejected as e:
+            if manifest is not None and name in FINAL_REJECTION_STAGES:
+                manifest.record_rejection(candidate['key'], name, str(e))
+            if index is not None and name in INDEX_REJECTION_STAGES:
+                index.record_rejection(candidate['path'], name, str(e))
+            raise
+        if manifest is not None and data_fields is not None:
+            manifest.record_stage(
+                candidate['key'], name,
+                output=candidate[output_field] if output_field else None,
+                data={field: candidate[field] for field in data_fields}
+            )
+        if index is not None and index_data_fields is not None:
+            index_output = candidate[index_output_field] if index_output_field else None
+            # Only real outpainting results are worth keeping, not the original passed through
+            if index_output != candidate['path']:
+                index.record(candidate['path'], name, output=index_output,
+                             data={field: candidate[field] for field in index_data_fields})
+        return candidate
+    
+    return run
+
+class SpritePipeline:
+    """The candidate engine behind the CLI, the API server and the Gradio app
+    
+    download → probe → decode → detect → plan → outpaint → crop → verify
+    
+    - executor: run() streams candidates through a worker pool per stage
+      (sized by stage_workers); process() runs one candidate through the
+      stages in the calling thread
+    - cache: with a run manifest, finished stages are checkpointed and
+      candidates restored by restore() skip the stages they already
+      completed; with an image index, per-image results are recorded for
+      incremental folder runs
+    - backend: outpaint replaces comfyui_outpaint_image; sprites are written
+      to output_dir (default OUTPUT_DIR) as sprite_name
+    """
+    
+    def __init__(self, max_sprites=MAX_SPRITES, stage_workers=None, manifest=None, index=None, outpaint=None,
+                 output_dir=None, sprite_name=SPRITE_NAME, cancel_token=None, profiler=None):
+        self.max_sprites = max_sprites
+        self.workers = dict(STREAM_STAGE_WORKERS, **(stage_workers or {}))
+        self.manifest = manifest
+        self.index = index
+        self.outpaint = outpaint
+        self.output_dir = output_dir
+        self.sprite_name = sprite_name
+        self.cancel_token = cancel_token
+        self.profiler = profiler
+        self.plan_candidate = make_plan_candidate(max_sprites)
+        self._stages = self._build_stages()
+    
+    def restore(self, candidate):
+        """Apply the candidate's checkpoints and index results
+        
+        Returns None if an interrupted attempt (or, for an unchanged image,
+        an earlier incremental run) already rejected it for good.
+        """
+        if self.manifest is not None:
+            if self.manifest.rejection(candidate['key']) is not None:
+                return None
+            candidate = restore_candidate(candidate, self.manifest)
+        if self.index is not None and 'skip_stages' not in candidate and self.index.is_unchanged(candidate['path']):
+            if self.index.rejection(candidate['path']) is not None:
+                return None
+            candidate = restore_from_index(candidate, self.index)
+        return candidate
+    
+    def prepare(self, candidates):
+        """restore() every candidate, ready for run()
+        
+        Candidates with the most finished work go first, so they are the
+        ones admitted again; sprite numbers already handed out are kept.
+        Candidates whose analysis was restored are admitted here, before
+        any new image finishes analysis in run(), and unchanged images of
+        an incremental run keep the sprite number they had last time.
+        """
+        pending = [candidate for candidate in map(self.restore, candidates) if candidate is not None]
+        pending.sort(key=lambda candidate: -len(candidate.get('skip_stages', ())))
+        admitted_numbers = [candidate['sprite_number'] for candidate in pending if 'sprite_number' in candidate]
+        self.plan_candidate = make_plan_candidate(self.max_sprites, admitted_numbers)
+        self._stages = self._build_stages()
+        
+        analyzed = [candidate for candidate in pending
+                    if 'detect' in candidate.get('skip_stages', ()) and 'plan' not in candidate['skip_stages']]
+        if self.index is not None:
+            taken = set(admitted_numbers)
+            for candidate in analyzed:
+                result = self.index.result(candidate['path'], 'plan')
+                number = result['data'].get('sprite_number') if result else None
+                if number is not None and number not in taken:
+                    taken.add(number)
+                    candidate['sprite_number'] = number
+        # Previously numbered first, by number; the rest keep their order
+        analyzed.sort(key=lambda candidate: candidate.get('sprite_number', float('inf')))
+        for candidate in analyzed:
+            try:
+                self.process(candidate, stages=("plan",))
+            except StageRejected:
+                pass  # limit reached: run()'s plan stage reports the rejection
+        return pending
+    
+    def run(self, candidates):
+        """Stream candidates through every stage, yielding each as it leaves
+        
+        Finished candidates have status "completed" and their 'sprite';
+        dropped ones status "rejected" with the stage and reason.
+        """
+        stages = [Stage(name, func, self.workers[name]) for name, func in self._stages.items()]
+        return StagePipeline(stages, cancel_token=self.cancel_token).run(candidates)
+    
+    def process(self, candidate, stages=None, on_stage=None):
+        """Run one candidate through stages (default: all) in this thread
+        
+        Raises StageRejected if a stage drops it. The stages it passed are
+        added to its skip_stages, so a later run() carries on from there.
+        on_stage(name, candidate) is called before each stage.
+        """
+        candidate.setdefault('timings', {})
+        for name in stages or self._stages:
+            if self.cancel_token is not None:
+                self.cancel_token.raise_if_cancelled()
+            if on_stage is not None:
+                on_stage(name, candidate)
+            start = time.perf_counter()
+            with span(name, kind="stage", candidate=candidate.get('index')):
+                candidate = self._stages[name](candidate)
+            candidate['timings'][name] = time.perf_counter() - start
+            if name not in candidate.setdefault('skip_stages', []):
+                candidate['skip_stages'].append(name)
+        return candidate
+    
+    def _build_stages(self):
+        plan_candidate = self.plan_candidate
+        
+        def download_unless_full(candidate):
+            # No point downloading and detecting once the candidate's group has its sprites
+            if plan_candidate.is_full(candidate):
+                raise StageRejected(f"Candidate limit reached ({candidate.get('max_sprites', self.max_sprites)})")
+            return download_candidate(candidate)
+        
+        stage_funcs = {
+            'download': download_unless_full,
+            'probe': probe_candidate,
+            'decode': decode_candidate,
+            'detect': detect_candidate,
+            'plan': plan_candidate,
+            'outpaint': lambda candidate: outpaint_candidate(candidate, self.outpaint, self.cancel_token),
+            'crop': lambda candidate: crop_candidate(candidate, self.output_dir, self.sprite_name),
+            'verify': verify_candidate
+        }
+        stages = {}
+        for name in STREAM_STAGE_WORKERS:
+            func = checkpointed_stage(name, stage_funcs[name], self.manifest, self.index)
+            # cProfile only sees its own thread: stage workers need their own profilers
+            stages[name] = self.profiler.wrap(func) if self.profiler is not None else func
+        return stages
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Character Image Processing Pipeline")
+    parser.add_argument("--profile", choices=PROFILE_MODES, help=f"Profile the run and save the artifact to {OUTPUT_DIR}/profiles")
+    parser.add_argument("--run-id", help="Checkpoint the run in a run manifest so it can be resumed with --resume")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run from its run manifest")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Only analyze images in {DOWNLOAD_DIR} that are new or changed since the last incremental run")
+    args = parser.parse_args()
+    
+    if args.resume:
+        resume(args.resume, profile=args.profile)
+        raise SystemExit(0)
+    
     print("🎭 Character Image Processing Pipeline")
     print("This pipeline processes images from the 'downloaded_images' folder")
     print("Please add your images to that folder before running the pipeline.")
     print()
     
-    process_character_pipeline()
+    process_character_pipeline(profile=args.profile, run_id=args.run_id, incremental=args.incremental)
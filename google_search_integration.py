@@ -8,6 +8,8 @@ import os
 import time
 from urllib.parse import quote
 import json
+from pipeline_metrics import time_stage
+from pipeline_tracing import span
 
 # Google Custom Search API Configuration
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "your_google_api_key_here")
@@ -100,6 +102,10 @@ def download_image(url, filename, download_dir="downloaded_images"):
     Returns:
         Path to downloaded image or None if failed
     """
+    with time_stage("download"):
+        return _download_image(url, filename, download_dir)
+
+def _download_image(url, filename, download_dir):
     try:
         # Create download directory if it doesn't exist
         os.makedirs(download_dir, exist_ok=True)
@@ -148,6 +154,12 @@ def search_and_download_images(character_name, num_images=10, download_dir="down
     Returns:
         List of downloaded image paths
     """
+    with span("google_search", kind="external", query=character_name, num_images=num_images) as search_span:
+        downloaded_images = _search_and_download_images(character_name, num_images, download_dir)
+        search_span.set_attribute("downloaded", len(downloaded_images))
+        return downloaded_images
+
+def _search_and_download_images(character_name, num_images, download_dir):
     print(f"🎭 Searching for images of: {character_name}")
     print("=" * 50)
     
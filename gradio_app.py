@@ -80,7 +80,10 @@ from typing import Generator, Tuple
 # Import voice pipeline classes
 import sys
 sys.path.append('voice')
-from voice.main import AssemblyAITranscriber, TargetSpeakerIdentifier, VideoSegmentExtractor
+from voice.main import create_transcriber, TargetSpeakerIdentifier, VideoSegmentExtractor, TranscriptCache, VoiceBatchPipeline, SegmentPlanner
+
+# Extracted segments: dataset clips (wav/flac) or older video clips (mp4)
+AUDIO_SEGMENT_EXTENSIONS = ('.wav', '.flac', '.mp4')
 
 # API Configuration
 API_BASE_URL = "http://localhost:8000"
@@ -180,72 +183,37 @@ def analyze_single_image(image, progress=gr.Progress()):
     
     progress(0.2, desc="🎭 Processing image for character sprite...")
     
-    # Check if image is valid for processing
-    if analysis['face_count'] != 1:
-        return f"❌ Image has {analysis['face_count']} faces. Need exactly 1 face for processing.", analysis, None, None
-    
-    if not analysis['quality']['is_ok']:
-        return f"❌ Image quality too poor: {analysis['quality']['message']}", analysis, None, None
-    
-    # Process the image through the full pipeline
+    # Process the image through the same engine as the CLI and the API server
     try:
-        from character_image_pipeline import (
-            detect_faces_yolo, analyze_cowboy_shot_potential, 
-            crop_to_target_ratio, comfyui_outpaint_image
-        )
-        
-        progress(0.3, desc="🎨 Applying smart outpainting...")
-        
-        # Get cowboy shot analysis
-        faces = detect_faces_yolo(upload_result['file_path'])
-        cowboy_analysis = analyze_cowboy_shot_potential(upload_result['file_path'], faces)
-        
-        processed_input = upload_result['file_path']
-        
-        # Apply outpainting if needed
-        if cowboy_analysis['needs_outpainting']:
-            progress(0.5, desc=f"🎨 {cowboy_analysis['reason']}")
-            
-            padding = cowboy_analysis['padding']
-            prompt = cowboy_analysis['prompt']
-            
-            outpainted_path = comfyui_outpaint_image(
-                upload_result['file_path'],
-                left_padding=padding['left'],
-                right_padding=padding['right'],
-                top_padding=padding['top'],
-                bottom_padding=padding['bottom'],
-                text_prompt=prompt
-            )
-            
-            if outpainted_path and os.path.exists(outpainted_path):
-                processed_input = outpainted_path
-                progress(0.7, desc="✅ Outpainting applied successfully")
-            else:
-                progress(0.7, desc="⚠️ Outpainting failed, using original")
-        else:
-            progress(0.7, desc="✅ No outpainting needed")
-        
-        # Crop to target ratio
-        progress(0.8, desc="✂️ Cropping to target dimensions...")
-        
-        output_filename = f"single_sprite_{int(time.time())}.jpg"
-        output_path = os.path.join("character_sprites", output_filename)
+        from character_image_pipeline import SpritePipeline
+        from stage_pipeline import StageRejected
         
-        # Ensure output directory exists
+        engine = SpritePipeline(output_dir="character_sprites", sprite_name=f"single_sprite_{int(time.time())}.jpg")
         os.makedirs("character_sprites", exist_ok=True)
         
-        success, crop_msg = crop_to_target_ratio(processed_input, output_path)
+        stage_progress = {
+            'detect': (0.25, "🔍 Validating image..."),
+            'outpaint': (0.3, "🎨 Applying smart outpainting..."),
+            'crop': (0.8, "✂️ Cropping to target dimensions..."),
+            'verify': (0.9, "✅ Final validation...")
+        }
         
-        if not success:
-            return f"❌ Cropping failed: {crop_msg}", analysis, None, None
+        def on_stage(stage, candidate):
+            if stage in stage_progress:
+                fraction, desc = stage_progress[stage]
+                if stage == 'outpaint' and candidate['cowboy_analysis']['needs_outpainting']:
+                    desc = f"🎨 {candidate['cowboy_analysis']['reason']}"
+                progress(fraction, desc=desc)
         
-        progress(0.9, desc="✅ Final validation...")
+        image_path = upload_result['file_path']
+        try:
+            candidate = engine.process({'index': 0, 'key': image_path, 'path': image_path}, on_stage=on_stage)
+        except StageRejected as e:
+            return f"❌ Image not usable for a sprite: {e}", analysis, None, None
         
-        # Final analysis
-        final_faces = detect_faces_yolo(output_path)
-        final_analysis = analyze_cowboy_shot_potential(output_path, final_faces)
-        final_score = 80 if not final_analysis['needs_outpainting'] else 60
+        cowboy_analysis = candidate['cowboy_analysis']
+        output_path = candidate['sprite']['path']
+        final_score = candidate['sprite']['score']
         
         progress(1.0, desc="🎭 Character sprite generated!")
         
@@ -421,6 +389,9 @@ def run_pipeline_with_progress(character_name, max_candidates, progress=gr.Progr
         elif status['status'] == 'error':
             return f"❌ Pipeline failed: {status['error']}", None, None, None, None
         
+        elif status['status'] == 'cancelled':
+            return f"🛑 Pipeline cancelled: {status['message']}", None, None, None, None
+        
         # Wait before next check
         time.sleep(1)
     
@@ -460,10 +431,10 @@ def transcribe_video_file(video_file, target_speaker_description, progress=gr.Pr
     try:
         progress(0.1, desc="🎬 Initializing transcription...")
         
-        # Initialize transcriber
-        transcriber = AssemblyAITranscriber("70702281c18e427f8093e5f5385a3195")
+        # Initialize transcriber (VOICE_TRANSCRIPTION_BACKEND picks cloud/local; stored transcripts are reused)
+        transcriber = create_transcriber(transcript_cache=TranscriptCache())
         
-        progress(0.2, desc="📤 Uploading video to AssemblyAI...")
+        progress(0.2, desc="📤 Transcribing video (or loading cached transcript)...")
         
         # Transcribe the video
         transcription_result = transcriber.transcribe_file(
@@ -617,6 +588,7 @@ def transcribe_video_file(video_file, target_speaker_description, progress=gr.Pr
         
         # Extract audio segments using FFmpeg
         audio_segments_path = None
+        planned_segments = SegmentPlanner().plan(target_segments, utterances)
         try:
             progress(0.95, desc="🎵 Extracting audio segments...")
             
@@ -628,14 +600,14 @@ def transcribe_video_file(video_file, target_speaker_description, progress=gr.Pr
                 segments_dir = os.path.join("voice", f"audio_segments_{int(time.time())}")
                 os.makedirs(segments_dir, exist_ok=True)
                 
-                # Extract individual segments
-                success = video_extractor.extract_individual_segments(
-                    target_segments, 
+                # Export the planned cuts as normalized 24 kHz mono WAV clips + manifest.jsonl
+                manifest = video_extractor.export_voice_dataset(
+                    planned_segments, 
                     video_file, 
                     segments_dir
                 )
                 
-                if success:
+                if manifest:
                     audio_segments_path = segments_dir
                     progress(1.0, desc="✅ Audio segments extracted!")
                 else:
@@ -650,7 +622,7 @@ def transcribe_video_file(video_file, target_speaker_description, progress=gr.Pr
         # Create audio segments info
         audio_segments_info = ""
         if audio_segments_path and os.path.exists(audio_segments_path):
-            segment_files = [f for f in os.listdir(audio_segments_path) if f.endswith('.mp4')]
+            segment_files = [f for f in os.listdir(audio_segments_path) if f.endswith(AUDIO_SEGMENT_EXTENSIONS)]
             audio_segments_info = f"""
             ## 🎵 Audio Segments Extracted
             
@@ -667,13 +639,13 @@ def transcribe_video_file(video_file, target_speaker_description, progress=gr.Pr
             audio_segments_info = "❌ Audio segments could not be extracted. FFmpeg may not be available."
         
         # Create audio segments info
-        audio_segments_info = create_audio_players_info(audio_segments_path, target_segments)
+        audio_segments_info = create_audio_players_info(audio_segments_path, planned_segments)
         
         # Get audio segment files for download
         audio_segment_files = get_audio_segments_files(audio_segments_path)
         
         # Create audio players HTML
-        audio_players_html = create_audio_players_html(audio_segments_path, target_segments)
+        audio_players_html = create_audio_players_html(audio_segments_path, planned_segments)
         
         # Get individual audio files for playback
         individual_audio_files = get_individual_audio_files(audio_segments_path)
@@ -707,6 +679,53 @@ def search_and_transcribe_video(character_name, max_videos, target_speaker_descr
     except Exception as e:
         return f"❌ Video search and transcription failed: {str(e)}", None, None, None, None, None, None, None, None, None
 
+def batch_transcribe_videos(video_files, video_urls, target_speaker_description, progress=gr.Progress()):
+    """Run several videos through the voice pipeline with pipelined stages"""
+    sources = [getattr(f, "name", f) for f in (video_files or [])]
+    sources += [url.strip() for url in (video_urls or "").splitlines() if url.strip()]
+    if not sources:
+        return "❌ Please upload videos or enter video URLs first", None
+    
+    try:
+        transcriber = create_transcriber(transcript_cache=TranscriptCache())
+        video_extractor = VideoSegmentExtractor()
+        if not video_extractor.ffmpeg_available:
+            video_extractor = None
+        
+        # Progress counts finished stages across all videos
+        total_steps = len(sources) * len(VoiceBatchPipeline.STAGES)
+        finished_steps = [0]
+        progress_lock = threading.Lock()
+        
+        def on_progress(source, stage, status, details):
+            if status not in ("done", "cached") and stage != "finished":
+                return
+            with progress_lock:
+                finished_steps[0] = min(finished_steps[0] + 1, total_steps)
+                progress(finished_steps[0] / total_steps,
+                         desc=f"🎬 {os.path.basename(source)}: {stage} {status}")
+        
+        pipeline = VoiceBatchPipeline(
+            transcriber, TargetSpeakerIdentifier(), video_extractor,
+            progress_callback=on_progress,
+            segment_planner=SegmentPlanner(),
+            output_dir=os.path.join("voice", f"batch_output_{int(time.time())}")
+        )
+        results = pipeline.run(sources, target_speaker_description)
+        
+        completed = sum(1 for result in results if result["status"] in ("completed", "transcribed"))
+        summary = f"## 🎤 Batch Results: {completed}/{len(results)} videos processed\n\n"
+        summary += "| Video | Status | Speaker | Segments | Output |\n|---|---|---|---|---|\n"
+        for result in results:
+            summary += (f"| {os.path.basename(result['source'])} | {result['status']} | "
+                        f"{result['identified_speaker'] or '-'} | {result['segments']} | "
+                        f"{result['output'] or result['error'] or '-'} |\n")
+        
+        return summary, results
+        
+    except Exception as e:
+        return f"❌ Batch transcription failed: {str(e)}", None
+
 def get_audio_segments_files(audio_segments_path):
     """Get list of audio segment files for download"""
     if not audio_segments_path or not os.path.exists(audio_segments_path):
@@ -714,7 +733,7 @@ def get_audio_segments_files(audio_segments_path):
     
     segment_files = []
     for file in os.listdir(audio_segments_path):
-        if file.endswith('.mp4'):
+        if file.endswith(AUDIO_SEGMENT_EXTENSIONS):
             file_path = os.path.join(audio_segments_path, file)
             segment_files.append(file_path)
     
@@ -727,7 +746,7 @@ def get_individual_audio_files(audio_segments_path):
     
     segment_files = []
     for file in sorted(os.listdir(audio_segments_path)):
-        if file.endswith('.mp4'):
+        if file.endswith(AUDIO_SEGMENT_EXTENSIONS):
             file_path = os.path.join(audio_segments_path, file)
             segment_files.append(file_path)
     
@@ -740,7 +759,7 @@ def populate_audio_players(audio_segments_path):
     
     segment_files = []
     for file in sorted(os.listdir(audio_segments_path)):
-        if file.endswith('.mp4'):
+        if file.endswith(AUDIO_SEGMENT_EXTENSIONS):
             file_path = os.path.join(audio_segments_path, file)
             segment_files.append(file_path)
     
@@ -759,7 +778,7 @@ def create_audio_players_info(audio_segments_path, target_segments):
     if not audio_segments_path or not os.path.exists(audio_segments_path):
         return "No audio segments available"
     
-    segment_files = sorted([f for f in os.listdir(audio_segments_path) if f.endswith('.mp4')])
+    segment_files = sorted([f for f in os.listdir(audio_segments_path) if f.endswith(AUDIO_SEGMENT_EXTENSIONS)])
     
     info_text = f"""
     ## 🎵 Audio Segments Extracted
@@ -793,7 +812,7 @@ def create_audio_players_html(audio_segments_path, target_segments):
     if not audio_segments_path or not os.path.exists(audio_segments_path):
         return "No audio segments available"
     
-    segment_files = sorted([f for f in os.listdir(audio_segments_path) if f.endswith('.mp4')])
+    segment_files = sorted([f for f in os.listdir(audio_segments_path) if f.endswith(AUDIO_SEGMENT_EXTENSIONS)])
     
     if not segment_files:
         return "No audio segments found"
@@ -1054,7 +1073,7 @@ def create_interface():
                             
                             segment_files = []
                             for file in sorted(os.listdir(audio_segments_path)):
-                                if file.endswith('.mp4'):
+                                if file.endswith(AUDIO_SEGMENT_EXTENSIONS):
                                     file_path = os.path.join(audio_segments_path, file)
                                     segment_files.append(file_path)
                             
@@ -1181,7 +1200,7 @@ def create_interface():
                             
                             segment_files = []
                             for file in sorted(os.listdir(audio_segments_path)):
-                                if file.endswith('.mp4'):
+                                if file.endswith(AUDIO_SEGMENT_EXTENSIONS):
                                     file_path = os.path.join(audio_segments_path, file)
                                     segment_files.append(file_path)
                             
@@ -1201,6 +1220,38 @@ def create_interface():
                             outputs=[audio_player_1_search, audio_player_2_search, audio_player_3_search, audio_player_4_search, audio_player_5_search]
                         )
             
+                    with gr.Tab("📚 Batch Transcribe"):
+                        gr.Markdown("#### 📚 Transcribe many videos with pipelined upload, transcription, speaker ID and extraction")
+                        
+                        with gr.Row():
+                            with gr.Column():
+                                batch_videos_input = gr.File(
+                                    label="Upload Videos (MP4)",
+                                    file_count="multiple",
+                                    file_types=["video"]
+                                )
+                                batch_urls_input = gr.Textbox(
+                                    label="Video URLs (one per line)",
+                                    lines=4,
+                                    placeholder="https://example.com/interview.mp4"
+                                )
+                                target_speaker_batch = gr.Textbox(
+                                    label="Target Speaker Description",
+                                    value="Donald Trump",
+                                    placeholder="Describe the target speaker"
+                                )
+                                batch_transcribe_btn = gr.Button("📚 Transcribe All", variant="primary")
+                            
+                            with gr.Column():
+                                batch_summary = gr.Markdown(value="Batch results will appear here...")
+                                batch_results_json = gr.JSON(label="Per-Video Results")
+                        
+                        batch_transcribe_btn.click(
+                            batch_transcribe_videos,
+                            inputs=[batch_videos_input, batch_urls_input, target_speaker_batch],
+                            outputs=[batch_summary, batch_results_json]
+                        )
+            
             with gr.Tab("📊 API Status"):
                 gr.Markdown("### 🔧 API Server Status")
                 
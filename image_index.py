@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Incremental Image Index for Character Image Pipeline
+Remembers, per image in a folder, its mtime, size and SHA-256 together with
+the pipeline's last results for it (analysis, rejection, outpainted file).
+Re-running on the same folder then only analyzes new or changed images.
+
+An entry is reused while the file's mtime and size are unchanged; if they
+differ, the content hash decides, so touched-but-identical files still
+count as unchanged. Outpainted results are only reused while their own
+output file still has the recorded hash.
+
+Layout: <folder>/.image_index.json, rewritten atomically on save().
+"""
+
+import json
+import os
+import threading
+
+from run_manifest import file_sha256, json_default
+
+INDEX_FILENAME = ".image_index.json"
+INDEX_VERSION = 1
+AUTOSAVE_EVERY = 25  # records between saves, so a crash loses little work
+
+
+class ImageIndex:
+    """Per-file results of earlier runs over one folder (thread-safe)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION:
+                    self.entries = data["entries"]
+            except (OSError, ValueError):
+                # A corrupt index only costs a full re-analysis
+                self.entries = {}
+
+    @classmethod
+    def for_directory(cls, directory):
+        return cls(os.path.join(directory, INDEX_FILENAME))
+
+    def is_unchanged(self, img_path):
+        """True if img_path has an entry and its content has not changed since"""
+        key = os.path.abspath(img_path)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return False
+
+        stat = os.stat(img_path)
+        if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return True
+        if entry["size"] == stat.st_size and entry["sha256"] == file_sha256(img_path):
+            with self._lock:
+                entry["mtime_ns"] = stat.st_mtime_ns
+                self._unsaved += 1
+            return True
+
+        # Changed content: forget the stale results
+        with self._lock:
+            self.entries.pop(key, None)
+            self._unsaved += 1
+        return False
+
+    def result(self, img_path, stage):
+        """Last results of stage for an unchanged image, or None
+
+        Call is_unchanged() first; entries with an output file are only
+        returned while that file still has its recorded hash.
+        """
+        with self._lock:
+            entry = self.entries.get(os.path.abspath(img_path))
+            result = entry["results"].get(stage) if entry else None
+        if result is None:
+            return None
+        if result["output"]:
+            if not os.path.exists(result["output"]) or file_sha256(result["output"]) != result["sha256"]:
+                return None
+        return result
+
+    def rejection(self, img_path):
+        with self._lock:
+            entry = self.entries.get(os.path.abspath(img_path))
+            return entry["rejected"] if entry else None
+
+    def record(self, img_path, stage, data=None, output=None):
+        """Store stage results for img_path (output: a file the stage wrote)"""
+        result = {
+            "output": output,
+            "sha256": file_sha256(output) if output else None,
+            "data": json.loads(json.dumps(data or {}, default=json_default)),
+        }
+        entry = self._entry(img_path)
+        with self._lock:
+            entry["results"][stage] = result
+        self._record_done()
+
+    def record_rejection(self, img_path, stage, reason):
+        entry = self._entry(img_path)
+        with self._lock:
+            entry["rejected"] = {"stage": stage, "reason": reason}
+        self._record_done()
+
+    def prune(self, img_paths):
+        """Drop entries of files that are no longer in the folder"""
+        keep = {os.path.abspath(img_path) for img_path in img_paths}
+        with self._lock:
+            for key in [key for key in self.entries if key not in keep]:
+                del self.entries[key]
+                self._unsaved += 1
+
+    def save(self):
+        with self._lock:
+            data = {"version": INDEX_VERSION, "entries": self.entries}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, default=json_default)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+
+    def _entry(self, img_path):
+        key = os.path.abspath(img_path)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is not None:
+            return entry
+
+        stat = os.stat(img_path)
+        new_entry = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": file_sha256(img_path),
+            "rejected": None,
+            "results": {},
+        }
+        with self._lock:
+            return self.entries.setdefault(key, new_entry)
+
+    def _record_done(self):
+        with self._lock:
+            self._unsaved += 1
+            due = self._unsaved >= AUTOSAVE_EVERY
+        if due:
+            self.save()
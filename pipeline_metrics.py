@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Prometheus Metrics for Character Image Pipeline
+Per-stage latency histograms and pipeline counters shared by the pipeline,
+the ComfyUI client and the API server (exported on /metrics).
+"""
+
+import time
+from contextlib import contextmanager
+
+from pipeline_tracing import span
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    # Metrics become no-ops so the pipeline still runs without prometheus_client
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stage names used as the "stage" label
+STAGES = (
+    "download",
+    "quality_check",
+    "yolo_inference",
+    "outpaint_submit",
+    "outpaint_wait",
+    "outpaint_fetch",
+    "crop",
+    "final_validation",
+)
+
+# Buckets cover fast CPU stages (ms) up to the 5 minute ComfyUI timeout
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class _NoOpMetric:
+    """Stand-in used when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_LATENCY = Histogram(
+        "pipeline_stage_duration_seconds",
+        "Wall time spent in each pipeline stage",
+        ["stage"],
+        buckets=STAGE_BUCKETS,
+    )
+    CANDIDATES_REJECTED = Counter(
+        "pipeline_candidates_rejected_total",
+        "Candidate images rejected during validation, by reason",
+        ["reason"],
+    )
+    CANDIDATES_SKIPPED = Counter(
+        "pipeline_candidates_skipped_total",
+        "Candidate images never validated because early-stop selection had enough",
+    )
+    QUEUE_DEPTH = Gauge(
+        "pipeline_queue_depth",
+        "Pipeline jobs that are pending or processing",
+    )
+    COMFYUI_IN_FLIGHT = Gauge(
+        "comfyui_requests_in_flight",
+        "Outpaint requests currently submitted to ComfyUI",
+    )
+else:
+    STAGE_LATENCY = _NoOpMetric()
+    CANDIDATES_REJECTED = _NoOpMetric()
+    CANDIDATES_SKIPPED = _NoOpMetric()
+    QUEUE_DEPTH = _NoOpMetric()
+    COMFYUI_IN_FLIGHT = _NoOpMetric()
+
+
+@contextmanager
+def time_stage(stage, **attributes):
+    """Observe the wall time of the wrapped block in the stage histogram
+
+    The block is also traced as a "stage" span carrying the given attributes.
+    """
+    start = time.perf_counter()
+    try:
+        with span(stage, kind="stage", **attributes) as stage_span:
+            yield stage_span
+    finally:
+        STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def observe_stage(stage, seconds):
+    """Record an already measured stage duration"""
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+
+
+def rejection_reason(issue):
+    """Collapse a validation issue message into a low-cardinality label
+
+    "Quality: Image too blurry: 42.0 (min: 100)" -> "image_too_blurry"
+    "Multiple faces detected: 3"                -> "multiple_faces_detected"
+    """
+    parts = [part.strip() for part in issue.split(":")]
+    reason = parts[1] if parts[0] == "Quality" and len(parts) > 1 else parts[0]
+    return reason.lower().replace(" ", "_") or "unknown"
+
+
+def record_rejection(issues):
+    """Count a rejected candidate under the reason of its first issue"""
+    reason = rejection_reason(issues[0]) if issues else "unknown"
+    CANDIDATES_REJECTED.labels(reason=reason).inc()
+
+
+def render_metrics():
+    """Return the Prometheus exposition payload, or None if unavailable"""
+    if not PROMETHEUS_AVAILABLE:
+        return None
+    return generate_latest()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Per-Job Profiling for Character Image Pipeline
+Wraps one pipeline job in cProfile, pyinstrument or tracemalloc and writes
+the result as an artifact file (served by GET /jobs/{job_id}/profile).
+
+- cprofile: .prof stats (snakeviz / pstats) plus a cumulative-time .txt summary;
+  candidate worker threads are profiled too when wrapped with JobProfiler.wrap
+- pyinstrument: HTML call tree of the job thread (optional dependency)
+- tracemalloc: .txt report of allocation hotspots, image-handling code first,
+  taken at the sampled memory peak and at the end of the job
+"""
+
+import cProfile
+import fnmatch
+import importlib.util
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+PROFILE_MODES = ("cprofile", "pyinstrument", "tracemalloc")
+
+# Pipeline modules that tracemalloc reports charge allocations to
+# (cv2/numpy/PIL buffers count against the pipeline line calling them)
+IMAGE_CODE_PATTERNS = (
+    "*character_image_pipeline.py",
+    "*comfyui_outpainting.py",
+    "*api_server.py",
+)
+TRACEMALLOC_FRAMES = 25
+TRACEMALLOC_SAMPLE_INTERVAL = 1.0  # seconds between peak snapshots
+REPORT_TOP_N = 25
+SUMMARY_LINES = 15
+
+# tracemalloc is process-wide: concurrent jobs share one tracing session,
+# started by the first tracemalloc profiler and stopped by the last one
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False  # True if a profiler (not the host app) started tracing
+
+
+def profile_mode_available(mode):
+    """True if mode is known and its profiler can be imported"""
+    if mode == "pyinstrument":
+        return importlib.util.find_spec("pyinstrument") is not None
+    return mode in PROFILE_MODES
+
+
+class JobProfiler:
+    """Context manager profiling everything run inside it
+
+    After exit, artifact holds the written file path (or None) and summary a
+    short plain-text excerpt for status responses.
+    """
+
+    def __init__(self, mode, output_dir, name):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}' (choose from {', '.join(PROFILE_MODES)})")
+        if not profile_mode_available(mode):
+            raise ValueError(f"Profile mode '{mode}' needs the {mode} package")
+
+        self.mode = mode
+        self.output_dir = output_dir
+        self.name = name
+        self.artifact = None
+        self.summary = None
+        self.error = None
+        self.duration = None
+        self._profiler = None
+        self._owner_thread = None
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+        self._start = None
+        self._stop_sampling = threading.Event()
+        self._sampler = None
+        self._peak_snapshot = None
+        self._peak_size = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        try:
+            getattr(self, f"_start_{self.mode}")()
+        except (ValueError, RuntimeError) as e:
+            # e.g. another job's profiler already owns the interpreter hook
+            self.error = f"Profiler could not start: {e}"
+            self._profiler = None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        if self.error is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            getattr(self, f"_finish_{self.mode}")()
+        return False
+
+    def wrap(self, func):
+        """Profile func in whichever worker thread runs it (cprofile only)
+
+        cProfile only sees the thread that enabled it, so candidates handed
+        to a thread pool need their own profilers; their stats are merged
+        into the job's. Calls on the job's own thread run unwrapped, since
+        enabling a second profiler there would replace the job's hook.
+        Other modes return func unchanged.
+        """
+        if self.mode != "cprofile" or self.error is not None:
+            return func
+
+        def profiled(*args, **kwargs):
+            if threading.get_ident() == self._owner_thread:
+                return func(*args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+: the job's profiler already sees every thread
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                with self._lock:
+                    self._thread_profiles.append(profiler)
+
+        return profiled
+
+    def to_dict(self):
+        return {
+            "mode": self.mode,
+            "artifact": self.artifact,
+            "summary": self.summary,
+            "error": self.error,
+            "duration": round(self.duration, 3) if self.duration is not None else None,
+        }
+
+    def _path(self, extension):
+        return os.path.join(self.output_dir, f"{self.name}_{self.mode}.{extension}")
+
+    # ===== cProfile =====
+
+    def _start_cprofile(self):
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        self._owner_thread = threading.get_ident()
+
+    def _finish_cprofile(self):
+        self._profiler.disable()
+        stats = pstats.Stats(self._profiler)
+        with self._lock:
+            for thread_profile in self._thread_profiles:
+                stats.add(thread_profile)
+
+        self.artifact = self._path("prof")
+        stats.dump_stats(self.artifact)
+
+        report = io.StringIO()
+        stats.stream = report
+        stats.sort_stats("cumulative").print_stats(REPORT_TOP_N * 2)
+        with open(self._path("txt"), "w", encoding="utf-8") as f:
+            f.write(report.getvalue())
+        self.summary = _excerpt(report.getvalue())
+
+    # ===== pyinstrument =====
+
+    def _start_pyinstrument(self):
+        from pyinstrument import Profiler
+        self._profiler = Profiler()
+        self._profiler.start()
+
+    def _finish_pyinstrument(self):
+        self._profiler.stop()
+        self.artifact = self._path("html")
+        with open(self.artifact, "w", encoding="utf-8") as f:
+            f.write(self._profiler.output_html())
+        self.summary = _excerpt(self._profiler.output_text(unicode=False, color=False))
+
+    # ===== tracemalloc =====
+
+    def _start_tracemalloc(self):
+        global _tracemalloc_users, _tracemalloc_started
+        with _tracemalloc_lock:
+            if _tracemalloc_users == 0:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(TRACEMALLOC_FRAMES)
+                    _tracemalloc_started = True
+                # Only the first job resets the peak, so it never wipes a running job's
+                tracemalloc.reset_peak()
+            _tracemalloc_users += 1
+        self._sampler = threading.Thread(target=self._sample_peak, daemon=True)
+        self._sampler.start()
+
+    def _sample_peak(self):
+        """Keep the snapshot taken at the highest traced memory seen so far
+
+        Snapshots only contain live blocks, so one taken at the end would
+        miss image buffers that were already freed.
+        """
+        while not self._stop_sampling.wait(TRACEMALLOC_SAMPLE_INTERVAL):
+            if not tracemalloc.is_tracing():
+                return  # stopped by the host application
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self._peak_size:
+                self._peak_size = current
+                try:
+                    self._peak_snapshot = tracemalloc.take_snapshot()
+                except RuntimeError:
+                    return
+
+    def _finish_tracemalloc(self):
+        global _tracemalloc_users, _tracemalloc_started
+        self._stop_sampling.set()
+        self._sampler.join()
+        with _tracemalloc_lock:
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                final_snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0 and _tracemalloc_started:
+                if tracing:
+                    tracemalloc.stop()
+                _tracemalloc_started = False
+        if not tracing:
+            self.error = "tracemalloc was stopped before the job finished"
+            return
+
+        lines = [
+            f"tracemalloc report for {self.name}",
+            f"Peak traced memory: {peak / 1024 / 1024:.1f} MB, at end: {current / 1024 / 1024:.1f} MB",
+            "",
+        ]
+        if self._peak_snapshot is not None:
+            lines.append(f"=== At sampled peak ({self._peak_size / 1024 / 1024:.1f} MB) ===")
+            lines += _allocation_report(self._peak_snapshot)
+        lines.append("=== At end of job ===")
+        lines += _allocation_report(final_snapshot)
+
+        self.artifact = self._path("txt")
+        with open(self.artifact, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        self.summary = _excerpt("\n".join(lines))
+
+
+def _allocation_report(snapshot):
+    """Top allocation sites attributed to image-handling code, then overall"""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+    lines = ["Image-handling allocation hotspots:"]
+    lines += [f"  {_format_size(size)} in {count} blocks: {frame.filename}:{frame.lineno}"
+              for frame, (size, count) in _image_code_sites(snapshot)[:REPORT_TOP_N]]
+
+    lines.append("All allocation hotspots:")
+    lines += [f"  {_format_size(stat.size)} in {stat.count} blocks: {stat.traceback[0]}"
+              for stat in snapshot.statistics("lineno")[:REPORT_TOP_N]]
+    lines.append("")
+    return lines
+
+
+def _image_code_sites(snapshot):
+    """Group live blocks by the innermost pipeline frame on their stack
+
+    A buffer allocated inside cv2.imread or numpy is charged to the pipeline
+    line that called it, which is where the fix would go.
+    """
+    sites = {}
+    for trace in snapshot.traces:
+        for frame in reversed(trace.traceback):
+            if any(fnmatch.fnmatch(frame.filename, pattern) for pattern in IMAGE_CODE_PATTERNS):
+                size, count = sites.get(frame, (0, 0))
+                sites[frame] = (size + trace.size, count + 1)
+                break
+    return sorted(sites.items(), key=lambda item: -item[1][0])
+
+
+def _format_size(size):
+    return f"{size / 1024 / 1024:8.2f} MB" if size >= 1024 * 1024 else f"{size / 1024:8.1f} KB"
+
+
+def _excerpt(text):
+    lines = [line for line in text.splitlines() if line.strip()]
+    return "\n".join(lines[:SUMMARY_LINES])
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Span Tracing for Character Image Pipeline
+Nested job, candidate, stage and external-call spans with attributes,
+exported one JSON object per line. Fields follow the OpenTelemetry span
+model (hex trace/span ids, unix-nanosecond start/end, status code, events)
+so trace files can be converted for OTel tooling.
+
+Tracing is off unless PIPELINE_TRACE_FILE is set or configure_tracing() is
+called; while off, span() returns a shared no-op span and exports nothing.
+
+Usage:
+    PIPELINE_TRACE_FILE=traces/pipeline.jsonl python3 api_server.py
+    python3 pipeline_tracing.py traces/pipeline.jsonl   # per-job time breakdown
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_FILE_ENV = "PIPELINE_TRACE_FILE"
+
+# Span kinds, outermost first
+SPAN_KINDS = ("job", "candidate", "stage", "external")
+
+_current_span = contextvars.ContextVar("pipeline_current_span", default=None)
+
+
+class Span:
+    """One timed unit of work; ended and exported when its span() block exits"""
+
+    recording = True
+
+    def __init__(self, name, kind, trace_id, parent_span_id=None, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status_code = "UNSET"
+        self.status_message = None
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = None
+        self._start = time.perf_counter()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+    def set_status(self, code, message=None):
+        self.status_code = code
+        self.status_message = message
+
+    def record_exception(self, exc):
+        self.events.append({
+            "name": "exception",
+            "time_unix_nano": time.time_ns(),
+            "attributes": {"exception.type": type(exc).__name__, "exception.message": str(exc)},
+        })
+        self.set_status("ERROR", str(exc))
+
+    def end(self):
+        elapsed_ns = int((time.perf_counter() - self._start) * 1e9)
+        self.end_time_unix_nano = self.start_time_unix_nano + elapsed_ns
+        if self.status_code == "UNSET":
+            self.status_code = "OK"
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": round((self.end_time_unix_nano - self.start_time_unix_nano) / 1e6, 3),
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {"code": self.status_code, "message": self.status_message},
+        }
+
+
+class _NoOpSpan:
+    """Stand-in returned while tracing is disabled (its own context manager)"""
+
+    recording = False
+    trace_id = None
+    span_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def set_status(self, code, message=None):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+
+NOOP_SPAN = _NoOpSpan()
+
+
+class JsonlSpanExporter:
+    """Appends finished spans to a JSONL file (thread-safe, line buffered)"""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", buffering=1, encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_exporter = JsonlSpanExporter(os.environ[TRACE_FILE_ENV]) if os.getenv(TRACE_FILE_ENV) else None
+
+
+def configure_tracing(path=None):
+    """Start exporting spans to path (None disables tracing); returns the exporter"""
+    global _exporter
+    if _exporter is not None:
+        _exporter.close()
+    _exporter = JsonlSpanExporter(path) if path else None
+    return _exporter
+
+
+def tracing_enabled():
+    return _exporter is not None
+
+
+def current_span():
+    """The innermost open span in this thread/context, or the no-op span"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def span(name, kind="stage", parent=None, **attributes):
+    """Trace the wrapped block as a child of parent (default: the current span)
+
+    Worker threads don't inherit the current span, so pass parent explicitly
+    when fanning out to a thread pool. While tracing is disabled this returns
+    the shared no-op span without creating a generator.
+    """
+    if _exporter is None:
+        return NOOP_SPAN
+    return _recording_span(name, kind, parent, attributes)
+
+
+@contextmanager
+def _recording_span(name, kind, parent, attributes):
+    if parent is None or not parent.recording:
+        parent = _current_span.get()
+    if parent is None:
+        new_span = Span(name, kind, secrets.token_hex(16), attributes=attributes)
+    else:
+        new_span = Span(name, kind, parent.trace_id, parent.span_id, attributes)
+
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.end()
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(new_span)
+
+
+def load_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize_trace(spans):
+    """Per-trace wall time with the time spent in each stage/external span name
+
+    Returns {trace_id: {"name", "duration_ms", "status", "breakdown": {name: total_ms}}}
+    for every trace with a root span. Totals are summed over spans, so
+    candidates processed in parallel can add up to more than the wall time.
+    """
+    summaries = {}
+    for entry in spans:
+        if entry["parent_span_id"] is None:
+            summaries[entry["trace_id"]] = {
+                "name": entry["name"],
+                "duration_ms": entry["duration_ms"],
+                "status": entry["status"]["code"],
+                "attributes": entry["attributes"],
+                "breakdown": {},
+            }
+
+    for entry in spans:
+        summary = summaries.get(entry["trace_id"])
+        if summary is None or entry["kind"] not in ("stage", "external"):
+            continue
+        breakdown = summary["breakdown"]
+        breakdown[entry["name"]] = round(breakdown.get(entry["name"], 0.0) + entry["duration_ms"], 3)
+
+    return summaries
+
+
+def main():
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Usage: python3 pipeline_tracing.py <trace.jsonl>")
+        return 1
+
+    for trace_id, summary in summarize_trace(load_spans(sys.argv[1])).items():
+        print(f"\n🧵 {summary['name']} {trace_id[:8]} ({summary['status']}): {summary['duration_ms'] / 1000:.2f}s")
+        for name, total_ms in sorted(summary["breakdown"].items(), key=lambda item: -item[1]):
+            share = total_ms / summary["duration_ms"] if summary["duration_ms"] else 0
+            print(f"  {name:<24} {total_ms / 1000:>8.2f}s {share:>7.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
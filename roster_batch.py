@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Roster Batch Driver for Character Image Pipeline
+Generates sprites for a whole cast read from a JSONL roster. All characters
+share one streaming candidate pipeline, so the YOLO detector is loaded once
+and the download pool, the ComfyUI request pool and every other stage pool
+are global concurrency limits rather than per-character ones.
+
+Roster lines (only character_name is required):
+    {"character_name": "Alice", "num_images": 10, "max_sprites": 5}
+    {"character_name": "Bob", "image_dir": "art/bob"}   # local images, no search
+
+One results line per character is appended to the results JSONL as soon as
+its last candidate leaves the pipeline, with status, sprites and timings.
+
+Usage:
+    python3 roster_batch.py roster.jsonl --results roster_results.jsonl
+    python3 roster_batch.py roster.jsonl --outpaint-workers 6 --resume
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import character_image_pipeline as pipeline
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif", ".webp", ".avif")
+DEFAULT_NUM_IMAGES = 10
+DEFAULT_SEARCH_WORKERS = 2  # characters searched ahead of the pipeline
+
+
+def character_slug(name):
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "character"
+
+
+def load_roster(path):
+    """Parse the roster JSONL into entries; bad lines become error entries"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                if not isinstance(entry, dict) or not entry.get("character_name"):
+                    raise ValueError("missing character_name")
+            except ValueError as e:
+                entry = {"character_name": f"<line {line_number}>", "error": f"Invalid roster line: {e}"}
+            entry["line"] = line_number
+            entries.append(entry)
+    return entries
+
+
+def completed_characters(results_path):
+    """Names already completed in an earlier run's results file (for --resume)"""
+    if not os.path.exists(results_path):
+        return set()
+    completed = set()
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                if result.get("status") == "completed":
+                    completed.add(result["character_name"])
+    return completed
+
+
+def find_character_candidates(entry, group, max_sprites):
+    """Search results (or local images) of one roster entry as pipeline candidates"""
+    name = entry["character_name"]
+    slug = character_slug(name)
+    output_dir = entry.get("output_dir") or os.path.join(pipeline.OUTPUT_DIR, slug)
+    download_dir = os.path.join(pipeline.DOWNLOAD_DIR, slug)
+
+    if entry.get("image_dir"):
+        paths = sorted(
+            os.path.join(entry["image_dir"], file) for file in os.listdir(entry["image_dir"])
+            if file.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        candidates = [{'index': i, 'key': path, 'path': path} for i, path in enumerate(paths)]
+    else:
+        candidates = pipeline.search_candidates(name, num_images=entry.get("num_images", DEFAULT_NUM_IMAGES))
+    if candidates:
+        os.makedirs(output_dir, exist_ok=True)
+
+    for candidate in candidates:
+        candidate.update({
+            'group': group,
+            'character_name': name,
+            'max_sprites': entry.get("max_sprites", max_sprites),
+            'output_dir': output_dir,
+            'download_dir': download_dir
+        })
+    return candidates, output_dir
+
+
+class RosterTracker:
+    """Per-character progress; writes a character's result once it finishes"""
+
+    def __init__(self, results_file):
+        self.results_file = results_file
+        self.characters = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def start(self, group, entry, candidate_count, search_time, output_dir=None, error=None):
+        record = {
+            "character_name": entry["character_name"],
+            "line": entry["line"],
+            "status": "running",
+            "output_dir": output_dir,
+            "candidates": candidate_count,
+            "rejected": 0,
+            "rejections": {},
+            "sprites": [],
+            "search_time": round(search_time, 3),
+            "time_to_first_sprite": None,
+            "total_time": None,
+            "error": error,
+            "started_at": datetime.now().isoformat(),
+            "_start": time.perf_counter() - search_time,
+            "_pending": candidate_count,
+        }
+        with self._lock:
+            self.characters[group] = record
+        if error is not None or candidate_count == 0:
+            self._finish(record, "error" if error else "no_candidates")
+
+    def candidate_done(self, candidate):
+        with self._lock:
+            record = self.characters[candidate['group']]
+            elapsed = time.perf_counter() - record["_start"]
+            if candidate['status'] == 'completed':
+                record["sprites"].append(candidate['sprite'])
+                if record["time_to_first_sprite"] is None:
+                    record["time_to_first_sprite"] = round(elapsed, 3)
+            else:
+                record["rejected"] += 1
+                stage = candidate['rejected_stage']
+                record["rejections"][stage] = record["rejections"].get(stage, 0) + 1
+            record["_pending"] -= 1
+            finished = record["_pending"] == 0
+        if finished:
+            self._finish(record, "completed" if record["sprites"] else "no_sprites")
+
+    def interrupt_unfinished(self):
+        with self._lock:
+            unfinished = [record for record in self.characters.values() if record["status"] == "running"]
+        for record in unfinished:
+            self._finish(record, "interrupted")
+
+    def _finish(self, record, status):
+        record["status"] = status
+        record["total_time"] = round(time.perf_counter() - record["_start"], 3)
+        record["finished_at"] = datetime.now().isoformat()
+        record["sprites"].sort(key=lambda sprite: sprite['path'])
+        result = {key: value for key, value in record.items() if not key.startswith("_")}
+        result["sprite_count"] = len(result["sprites"])
+        result["sprites"] = [
+            {"path": sprite['path'], "input": sprite['input'], "score": sprite['score']} for sprite in result["sprites"]
+        ]
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+            self.results_file.write(json.dumps(result) + "\n")
+            self.results_file.flush()
+        print(f"🎭 {result['character_name']}: {status}, {result['sprite_count']} sprites "
+              f"({result['rejected']}/{result['candidates']} candidates dropped, {result['total_time']:.1f}s)")
+
+
+def roster_candidates(entries, tracker, max_sprites, search_workers=DEFAULT_SEARCH_WORKERS):
+    """Yield every character's candidates in roster order
+
+    Searches run up to search_workers characters ahead in a small pool, so
+    the pipeline is not left idle waiting on the next search.
+    """
+    def search(entry):
+        start = time.perf_counter()
+        if entry.get("error"):
+            return None, None, time.perf_counter() - start, entry["error"]
+        try:
+            candidates, output_dir = find_character_candidates(entry, entry["line"], max_sprites)
+            return candidates, output_dir, time.perf_counter() - start, None
+        except Exception as e:
+            return None, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+    remaining = iter(entries)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(1, search_workers)) as executor:
+        def submit_next():
+            entry = next(remaining, None)
+            if entry is not None:
+                pending.append((entry, executor.submit(search, entry)))
+
+        for _ in range(max(1, search_workers)):
+            submit_next()
+
+        while pending:
+            entry, future = pending.popleft()
+            candidates, output_dir, search_time, error = future.result()
+            submit_next()
+            tracker.start(entry["line"], entry, len(candidates or []), search_time, output_dir, error)
+            yield from candidates or []
+
+
+def run_roster(entries, results_path, max_sprites=pipeline.MAX_SPRITES, stage_workers=None,
+               search_workers=DEFAULT_SEARCH_WORKERS, append=False, cancel_token=None):
+    """Process a roster through one shared pipeline; returns {status: characters}"""
+    os.makedirs(os.path.dirname(os.path.abspath(results_path)), exist_ok=True)
+    batch = pipeline.SpritePipeline(max_sprites=max_sprites, stage_workers=stage_workers, cancel_token=cancel_token)
+
+    with open(results_path, "a" if append else "w", encoding="utf-8") as results_file:
+        tracker = RosterTracker(results_file)
+        try:
+            for candidate in batch.run(roster_candidates(entries, tracker, max_sprites, search_workers)):
+                tracker.candidate_done(candidate)
+        finally:
+            tracker.interrupt_unfinished()
+    return tracker.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sprites for a roster of characters")
+    parser.add_argument("roster", help="JSONL file with one character per line")
+    parser.add_argument("--results", default="roster_results.jsonl", help="Results JSONL (one line per character)")
+    parser.add_argument("--resume", action="store_true", help="Skip characters already completed in --results and append")
+    parser.add_argument("--max-sprites", type=int, default=pipeline.MAX_SPRITES, help="Default sprites per character")
+    parser.add_argument("--search-workers", type=int, default=DEFAULT_SEARCH_WORKERS, help="Concurrent image searches")
+    for stage, workers in pipeline.STREAM_STAGE_WORKERS.items():
+        parser.add_argument(f"--{stage}-workers", type=int, default=workers, help=f"Global {stage} stage workers")
+    args = parser.parse_args()
+
+    entries = load_roster(args.roster)
+    if args.resume:
+        done = completed_characters(args.results)
+        entries = [entry for entry in entries if entry["character_name"] not in done]
+        print(f"♻️ Resuming: {len(done)} characters already completed")
+
+    stage_workers = {stage: getattr(args, f"{stage}_workers") for stage in pipeline.STREAM_STAGE_WORKERS}
+    print(f"🎭 Processing {len(entries)} characters "
+          f"(workers: {', '.join(f'{stage}={count}' for stage, count in stage_workers.items())})")
+
+    start_time = time.perf_counter()
+    counts = run_roster(entries, args.results, args.max_sprites, stage_workers, args.search_workers, append=args.resume)
+    print(f"\n✅ Roster done in {time.perf_counter() - start_time:.1f}s: "
+          f"{', '.join(f'{status}={count}' for status, count in sorted(counts.items()))}")
+    print(f"📄 Results: {args.results}")
+    return 0 if counts.get("error", 0) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Run Manifests for Character Image Pipeline
+Checkpoints a pipeline run so it can be resumed after the process dies
+(ComfyUI timeout storms, pod restarts). The manifest records the run's
+parameters and inputs, then per candidate every completed stage with its
+output file, that file's SHA-256 and any small JSON results.
+
+A checkpoint only counts on resume if its output file still exists with the
+recorded hash, so deleted or overwritten outputs are simply redone.
+
+Layout: RUNS_DIR/<run_id>.json holds the run (rewritten atomically when its
+inputs or status change); stage checkpoints and rejections are appended as
+one JSON line each to RUNS_DIR/<run_id>.checkpoints.jsonl, which is folded
+into the .json by the next rewrite or load.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+RUNS_DIR = "runs"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def json_default(value):
+    # numpy scalars/arrays from detection and analysis results
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class RunManifest:
+    """Checkpoint record of one pipeline run (thread-safe)"""
+
+    def __init__(self, path, data):
+        self.path = path
+        self.log_path = f"{os.path.splitext(path)[0]}.checkpoints.jsonl"
+        self.data = data
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, run_id=None, params=None, runs_dir=RUNS_DIR):
+        run_id = run_id or str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        manifest = cls(os.path.join(runs_dir, f"{run_id}.json"), {
+            "run_id": run_id,
+            "status": "running",
+            "created_at": now,
+            "updated_at": now,
+            "params": params or {},
+            "inputs": None,
+            "candidates": {},
+        })
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, run_id, runs_dir=RUNS_DIR):
+        """Load an existing run; raises FileNotFoundError for unknown run ids"""
+        path = os.path.join(runs_dir, f"{run_id}.json")
+        with open(path, encoding="utf-8") as f:
+            manifest = cls(path, json.load(f))
+        if os.path.exists(manifest.log_path):
+            manifest._replay_log()
+            manifest.save()  # fold the log in, dropping a line cut off by a crash
+        return manifest
+
+    @classmethod
+    def open(cls, run_id=None, params=None, runs_dir=RUNS_DIR):
+        """Resume run_id if its manifest exists, otherwise start a new run"""
+        if run_id and os.path.exists(os.path.join(runs_dir, f"{run_id}.json")):
+            return cls.load(run_id, runs_dir)
+        return cls.create(run_id, params, runs_dir)
+
+    @classmethod
+    def delete(cls, run_id, runs_dir=RUNS_DIR):
+        """Remove the manifest and checkpoint log of run_id (missing files are ignored)"""
+        manifest = cls(os.path.join(runs_dir, f"{run_id}.json"), None)
+        for path in (manifest.path, manifest.log_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def run_id(self):
+        return self.data["run_id"]
+
+    @property
+    def params(self):
+        return self.data["params"]
+
+    @property
+    def status(self):
+        return self.data["status"]
+
+    @property
+    def inputs(self):
+        """Candidate list stored by set_inputs (None until the run got that far)"""
+        return self.data["inputs"]
+
+    def set_inputs(self, inputs):
+        # Snapshot: the pipeline keeps adding fields to the live candidate dicts
+        snapshot = json.loads(json.dumps(inputs, default=json_default))
+        with self._lock:
+            self.data["inputs"] = snapshot
+            self._save()
+
+    def set_status(self, status):
+        with self._lock:
+            self.data["status"] = status
+            self._save()
+
+    def record_stage(self, key, stage, output=None, data=None):
+        """Checkpoint a finished stage of candidate key (output: file it wrote)"""
+        entry = {
+            "output": output,
+            "sha256": file_sha256(output) if output else None,
+            "data": json.loads(json.dumps(data or {}, default=json_default)),
+            "completed_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self._apply({"key": key, "stage": stage, "entry": entry})
+
+    def stage_result(self, key, stage):
+        """The checkpoint of stage for key, or None if missing or its output changed"""
+        with self._lock:
+            entry = self.data["candidates"].get(key, {"stages": {}})["stages"].get(stage)
+        if entry is None:
+            return None
+        if entry["output"]:
+            if not os.path.exists(entry["output"]) or file_sha256(entry["output"]) != entry["sha256"]:
+                return None
+        return entry
+
+    def record_rejection(self, key, stage, reason):
+        """Mark candidate key as finally rejected so resumed runs skip it"""
+        with self._lock:
+            self._apply({"key": key, "rejected": {"stage": stage, "reason": reason}})
+
+    def rejection(self, key):
+        with self._lock:
+            return self.data["candidates"].get(key, {}).get("rejected")
+
+    def completed_stages(self):
+        """{stage: number of candidates with a checkpoint for it}"""
+        counts = {}
+        with self._lock:
+            for candidate in self.data["candidates"].values():
+                for stage in candidate["stages"]:
+                    counts[stage] = counts.get(stage, 0) + 1
+        return counts
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _apply(self, record, append=True):
+        """Apply one checkpoint record to data and, unless replaying, append it to the log"""
+        candidate = self.data["candidates"].setdefault(record["key"], {"stages": {}, "rejected": None})
+        if "stage" in record:
+            candidate["stages"][record["stage"]] = record["entry"]
+        else:
+            candidate["rejected"] = record["rejected"]
+        if append:
+            # One short line per checkpoint instead of rewriting the whole run
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=json_default) + "\n")
+
+    def _replay_log(self):
+        with open(self.log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # line cut off by a crash mid-append
+                self._apply(record, append=False)
+
+    def _save(self):
+        self.data["updated_at"] = datetime.now().isoformat()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write-then-rename so a crash never leaves a truncated manifest
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, default=json_default)
+        os.replace(tmp_path, self.path)
+        # The rewrite includes every logged checkpoint (replaying them again is harmless)
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
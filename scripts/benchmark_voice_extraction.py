@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark combined voice segment extraction: exact (re-encode) vs fast (stream copy)
+
+By default a synthetic test video is generated with FFmpeg (testsrc2 + sine)
+and a set of evenly spaced fake utterances is extracted from it. Pass
+--video and --transcript (AssemblyAI JSON with "utterances") to benchmark
+real data instead.
+
+Usage:
+    python3 scripts/benchmark_voice_extraction.py --duration 600 --segments 100
+    python3 scripts/benchmark_voice_extraction.py --video voice/mp4_files/videoplayback.mp4 \
+        --transcript transcript.json --speaker A
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "voice"))
+from main import VideoSegmentExtractor
+
+
+def generate_test_video(path, duration):
+    """Create a test video with a moving pattern and a tone track"""
+    cmd = [
+        'ffmpeg', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-g', '60',
+        '-c:a', 'aac', '-shortest',
+        path
+    ]
+    subprocess.run(cmd, capture_output=True, check=True)
+
+
+def synthetic_segments(duration, count, segment_length=3.0):
+    """Evenly spaced utterances of segment_length seconds"""
+    spacing = duration / count
+    segments = []
+    for i in range(count):
+        start = i * spacing
+        end = min(start + segment_length, duration)
+        segments.append({'speaker': 'A', 'start': int(start * 1000), 'end': int(end * 1000), 'text': f'utterance {i+1}'})
+    return segments
+
+
+def time_mode(extractor, segments, video_path, output_path, mode):
+    start = time.perf_counter()
+    success = extractor.extract_target_speaker_segments(segments, video_path, output_path, mode=mode)
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(output_path) / (1024 * 1024) if success and os.path.exists(output_path) else 0
+    return success, elapsed, size_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark exact vs fast combined segment extraction")
+    parser.add_argument("--video", help="Input video (default: generate a synthetic one)")
+    parser.add_argument("--transcript", help="AssemblyAI transcript JSON with utterances")
+    parser.add_argument("--speaker", default="A", help="Speaker label to extract from --transcript")
+    parser.add_argument("--duration", type=int, default=300, help="Synthetic video length in seconds")
+    parser.add_argument("--segments", type=int, default=50, help="Number of synthetic utterances")
+    parser.add_argument("--modes", default="exact,fast", help="Comma-separated modes to run")
+    args = parser.parse_args()
+
+    extractor = VideoSegmentExtractor()
+    if not extractor.ffmpeg_available:
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory(prefix="voice_bench_") as work_dir:
+        if args.video:
+            video_path = args.video
+        else:
+            video_path = os.path.join(work_dir, "synthetic.mp4")
+            print(f"Generating {args.duration}s synthetic video...")
+            generate_test_video(video_path, args.duration)
+
+        if args.transcript:
+            with open(args.transcript, 'r', encoding='utf-8') as f:
+                utterances = json.load(f).get('utterances', [])
+            segments = [u for u in utterances if u.get('speaker') == args.speaker]
+        else:
+            segments = synthetic_segments(args.duration, args.segments)
+
+        print(f"Benchmarking {len(segments)} segments from {video_path}")
+        print("=" * 60)
+
+        results = []
+        for mode in args.modes.split(","):
+            output_path = os.path.join(work_dir, f"combined_{mode}.mp4")
+            success, elapsed, size_mb = time_mode(extractor, segments, video_path, output_path, mode)
+            results.append((mode, success, elapsed, size_mb))
+
+        print("\n📊 Results")
+        print(f"{'mode':<8} {'ok':<4} {'seconds':>10} {'output MB':>10}")
+        for mode, success, elapsed, size_mb in results:
+            print(f"{mode:<8} {'✅' if success else '❌':<4} {elapsed:>10.2f} {size_mb:>10.1f}")
+
+        timings = {mode: elapsed for mode, success, elapsed, _ in results if success}
+        if 'exact' in timings and 'fast' in timings and timings['fast'] > 0:
+            print(f"\nfast mode speedup: {timings['exact'] / timings['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
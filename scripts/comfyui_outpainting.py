@@ -14,7 +14,10 @@ import random
 import time
 import logging
 from datetime import datetime
+from functools import partial
 from threading import Thread
+from pipeline_metrics import time_stage, COMFYUI_IN_FLIGHT
+from pipeline_tracing import span, current_span
 
 # ComfyUI Configuration
 HTTP_SERVER = "http://18.189.25.28:8004"
@@ -25,7 +28,7 @@ WORKFLOW_FILE = "working.json"
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def comfyui_outpaint_image(image_path, left_padding=0, right_padding=0, top_padding=0, bottom_padding=0, text_prompt=None):
+def comfyui_outpaint_image(image_path, left_padding=0, right_padding=0, top_padding=0, bottom_padding=0, text_prompt=None, cancel_token=None):
     """
     Use ComfyUI to outpaint an image
     
@@ -33,12 +36,28 @@ def comfyui_outpaint_image(image_path, left_padding=0, right_padding=0, top_padd
         image_path: Path to the input image
         left_padding, right_padding, top_padding, bottom_padding: Padding in pixels
         text_prompt: Optional text prompt to guide the outpainting
+        cancel_token: Optional CancellationToken; cancelling it interrupts /
+            dequeues this request's prompt on the ComfyUI server
     
     Returns:
-        Path to outpainted image or None if failed
+        Path to outpainted image or None if failed or cancelled
     """
+    with span("comfyui_outpaint", kind="external", comfyui_server=HTTP_SERVER,
+              image=os.path.basename(image_path),
+              padding=[left_padding, top_padding, right_padding, bottom_padding]) as outpaint_span:
+        outpainted_path = _comfyui_outpaint_image(
+            image_path, left_padding, right_padding, top_padding, bottom_padding, text_prompt, cancel_token
+        )
+        outpaint_span.set_attribute("succeeded", outpainted_path is not None)
+        return outpainted_path
+
+def _comfyui_outpaint_image(image_path, left_padding, right_padding, top_padding, bottom_padding, text_prompt, cancel_token):
     print(f"  🎨 Outpainting with ComfyUI...")
     
+    if cancel_token is not None and cancel_token.cancelled:
+        print(f"  🛑 Outpainting skipped: job cancelled")
+        return None
+    
     try:
         # Load and encode image
         with open(image_path, "rb") as f:
@@ -82,59 +101,44 @@ def comfyui_outpaint_image(image_path, left_padding=0, right_padding=0, top_padd
         payload = {"prompt": workflow_data, "client_id": client_id}
         
         # Submit workflow
-        resp = requests.post(f"{HTTP_SERVER}/prompt", json=payload)
+        with time_stage("outpaint_submit"):
+            resp = requests.post(f"{HTTP_SERVER}/prompt", json=payload)
         if resp.status_code != 200:
             print(f"  ❌ ComfyUI submission failed: {resp.status_code}")
             return None
         
         response_data = resp.json()
         prompt_id = response_data.get("prompt_id")
+        current_span().set_attribute("prompt_id", prompt_id)
         
-        # Wait for completion
-        print(f"  ⏳ Waiting for ComfyUI execution...")
-        timeout = 300  # 5 minutes
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            # Check queue status
-            queue_response = requests.get(f"{HTTP_SERVER}/queue")
-            if queue_response.status_code == 200:
-                queue_data = queue_response.json()
-                if not queue_data.get('queue_running') and not queue_data.get('queue_pending'):
-                    break
-            time.sleep(2)
+        # Cancelling the job removes this prompt from the ComfyUI server
+        cancel_callback = partial(cancel_comfyui_prompt, prompt_id)
+        if cancel_token is not None and prompt_id:
+            cancel_token.add_callback(cancel_callback)
         
-        # Wait for server to save image
-        time.sleep(5)
+        COMFYUI_IN_FLIGHT.inc()
+        try:
+            # Wait for completion
+            print(f"  ⏳ Waiting for ComfyUI execution...")
+            with time_stage("outpaint_wait"):
+                _wait_for_prompt(prompt_id, cancel_token=cancel_token)
+            
+            if cancel_token is not None and cancel_token.cancelled:
+                print(f"  🛑 Outpainting cancelled")
+                return None
+            
+            # Retrieve output image
+            with time_stage("outpaint_fetch"):
+                outpainted_path = _fetch_output_image(image_path, prompt_id)
+        finally:
+            COMFYUI_IN_FLIGHT.dec()
+            if cancel_token is not None:
+                cancel_token.remove_callback(cancel_callback)
         
-        # Retrieve output image
-        history_response = requests.get(f"{HTTP_SERVER}/history")
-        if history_response.status_code == 200:
-            history_data = history_response.json()
-            if prompt_id and prompt_id in history_data:
-                entry = history_data[prompt_id]
-                outputs = entry.get('outputs', {})
-                
-                for node_id, node_output in outputs.items():
-                    if 'images' in node_output:
-                        for img_info in node_output['images']:
-                            filename = img_info.get('filename', '')
-                            if filename:
-                                # Download the image
-                                img_response = requests.get(f"{HTTP_SERVER}/view", params={
-                                    "filename": filename,
-                                    "subfolder": "",
-                                    "type": "output"
-                                })
-                                
-                                if img_response.status_code == 200:
-                                    # Save outpainted image
-                                    outpainted_path = image_path.replace('.jpg', '_outpainted.jpg').replace('.jpeg', '_outpainted.jpg').replace('.png', '_outpainted.jpg')
-                                    with open(outpainted_path, 'wb') as f:
-                                        f.write(img_response.content)
-                                    print(f"  ✅ ComfyUI outpainting complete!")
-                                    print(f"  💾 Saved: {os.path.basename(outpainted_path)}")
-                                    return outpainted_path
+        if outpainted_path:
+            print(f"  ✅ ComfyUI outpainting complete!")
+            print(f"  💾 Saved: {os.path.basename(outpainted_path)}")
+            return outpainted_path
         
         print(f"  ❌ ComfyUI outpainting failed")
         return None
@@ -142,3 +146,81 @@ def comfyui_outpaint_image(image_path, left_padding=0, right_padding=0, top_padd
     except Exception as e:
         print(f"  ❌ ComfyUI outpainting error: {e}")
         return None
+
+def _wait_for_prompt(prompt_id, timeout=300, cancel_token=None):
+    """Block until the ComfyUI queue has drained (5 minute default timeout)
+    
+    Returns early if cancel_token is cancelled.
+    """
+    start_time = time.time()
+    
+    while time.time() - start_time < timeout:
+        # Check queue status
+        queue_response = requests.get(f"{HTTP_SERVER}/queue")
+        if queue_response.status_code == 200:
+            queue_data = queue_response.json()
+            if not queue_data.get('queue_running') and not queue_data.get('queue_pending'):
+                break
+        if _sleep(2, cancel_token):
+            return
+    
+    # Wait for server to save image
+    _sleep(5, cancel_token)
+
+def _sleep(seconds, cancel_token=None):
+    """Sleep that wakes up on cancellation; returns True if cancelled"""
+    if cancel_token is None:
+        time.sleep(seconds)
+        return False
+    return cancel_token.wait(seconds)
+
+def cancel_comfyui_prompt(prompt_id):
+    """Stop one of our prompts on the ComfyUI server
+    
+    Interrupts it if it is currently executing and deletes it from the
+    pending queue otherwise. Other clients' prompts are left alone.
+    """
+    try:
+        queue_response = requests.get(f"{HTTP_SERVER}/queue", timeout=10)
+        if queue_response.status_code == 200:
+            queue_data = queue_response.json()
+            running_ids = [item[1] for item in queue_data.get('queue_running', []) if len(item) > 1]
+            if prompt_id in running_ids:
+                requests.post(f"{HTTP_SERVER}/interrupt", json={"prompt_id": prompt_id}, timeout=10)
+                print(f"  🛑 Interrupted running ComfyUI prompt {prompt_id}")
+        
+        requests.post(f"{HTTP_SERVER}/queue", json={"delete": [prompt_id]}, timeout=10)
+        print(f"  🛑 Removed ComfyUI prompt {prompt_id} from queue")
+    except Exception as e:
+        print(f"  ⚠️ Could not cancel ComfyUI prompt {prompt_id}: {e}")
+
+def _fetch_output_image(image_path, prompt_id):
+    """Download the first output image of a finished prompt, or None"""
+    history_response = requests.get(f"{HTTP_SERVER}/history")
+    if history_response.status_code == 200:
+        history_data = history_response.json()
+        if prompt_id and prompt_id in history_data:
+            entry = history_data[prompt_id]
+            outputs = entry.get('outputs', {})
+            
+            for node_id, node_output in outputs.items():
+                if 'images' in node_output:
+                    current_span().set_attribute("output_node", node_id)
+                    for img_info in node_output['images']:
+                        filename = img_info.get('filename', '')
+                        if filename:
+                            # Download the image
+                            img_response = requests.get(f"{HTTP_SERVER}/view", params={
+                                "filename": filename,
+                                "subfolder": "",
+                                "type": "output"
+                            })
+                            
+                            if img_response.status_code == 200:
+                                # Save outpainted image
+                                outpainted_path = image_path.replace('.jpg', '_outpainted.jpg').replace('.jpeg', '_outpainted.jpg').replace('.png', '_outpainted.jpg')
+                                with open(outpainted_path, 'wb') as f:
+                                    f.write(img_response.content)
+                                return outpainted_path
+    
+    return None
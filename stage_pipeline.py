@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Streaming Stage Pipeline for Character Image Pipeline
+Runs items (candidate dicts) through a chain of stages, each with its own
+worker pool, connected by bounded queues. An item moves to the next stage
+as soon as its current stage finishes, so the first result comes out after
+roughly one item's latency instead of after the slowest batch phase.
+"""
+
+import queue
+import threading
+import time
+
+from pipeline_tracing import span, current_span
+
+DEFAULT_QUEUE_SIZE = 4
+_DONE = object()  # end-of-stream marker, one per downstream worker
+_POLL_INTERVAL = 0.1
+
+
+class StageRejected(Exception):
+    """Raised by a stage function to drop its item (e.g. failed validation)"""
+
+
+class Stage:
+    """One pipeline step: func(item) -> item, run by `workers` threads"""
+
+    def __init__(self, name, func, workers=1):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker")
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class StagePipeline:
+    """Stream items through stages with a worker pool per stage
+
+    run() yields every item when it leaves the pipeline, in completion order:
+    finished items have status "completed", dropped ones status "rejected"
+    with the stage and reason. Each item records its per-stage timings.
+    """
+
+    def __init__(self, stages, queue_size=DEFAULT_QUEUE_SIZE, cancel_token=None):
+        if not stages:
+            raise ValueError("StagePipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.cancel_token = cancel_token
+
+    def run(self, items):
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        output = queue.Queue()
+        stop = threading.Event()
+        remaining = [stage.workers for stage in self.stages]
+        lock = threading.Lock()
+        parent_span = current_span()
+
+        def cancelled():
+            return stop.is_set() or (self.cancel_token is not None and self.cancel_token.cancelled)
+
+        def put(target, item):
+            # Bounded puts give backpressure but must not block a stopped pipeline forever
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    continue
+
+        def take(source):
+            while not stop.is_set():
+                try:
+                    return source.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def feed():
+            try:
+                for item in items:
+                    if cancelled():
+                        break
+                    item.setdefault("timings", {})
+                    put(queues[0], item)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    put(queues[0], _DONE)
+
+        def work(index):
+            stage = self.stages[index]
+            downstream = queues[index + 1] if index + 1 < len(self.stages) else output
+            while True:
+                item = take(queues[index])
+                if item is _DONE:
+                    with lock:
+                        remaining[index] -= 1
+                        last_worker = remaining[index] == 0
+                    if last_worker:
+                        following = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+                        for _ in range(following):
+                            put(downstream, _DONE)
+                    return
+
+                if cancelled():
+                    output.put(_rejected(item, stage.name, "cancelled"))
+                    continue
+
+                start = time.perf_counter()
+                try:
+                    with span(stage.name, kind="stage", parent=parent_span, candidate=item.get("index")):
+                        item = stage.func(item)
+                except StageRejected as e:
+                    output.put(_rejected(item, stage.name, str(e), start))
+                    continue
+                except Exception as e:
+                    output.put(_rejected(item, stage.name, f"{type(e).__name__}: {e}", start))
+                    continue
+
+                item["timings"][stage.name] = time.perf_counter() - start
+                if downstream is output:
+                    item["status"] = "completed"
+                put(downstream, item)
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=work, args=(index,), daemon=True) for _ in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = output.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Consumer finished or gave up early: release any blocked workers
+            stop.set()
+
+
+def _rejected(item, stage_name, reason, start=None):
+    if start is not None:
+        item["timings"][stage_name] = time.perf_counter() - start
+    item["status"] = "rejected"
+    item["rejected_stage"] = stage_name
+    item["reason"] = reason
+    return item
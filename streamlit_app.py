@@ -300,8 +300,11 @@ def main():
                     st.session_state['pipeline_results'] = status['results']
                 elif status['status'] == 'error':
                     st.markdown(f'<p class="status-error">❌ Error: {status["error"]}</p>', unsafe_allow_html=True)
-                elif status['status'] == 'processing':
-                    st.markdown('<p class="status-processing">🔄 Processing...</p>', unsafe_allow_html=True)
+                elif status['status'] == 'cancelled':
+                    st.markdown(f'<p class="status-error">🛑 Cancelled: {status["message"]}</p>', unsafe_allow_html=True)
+                elif status['status'] in ('processing', 'cancelling'):
+                    label = "🔄 Processing..." if status['status'] == 'processing' else "🛑 Cancelling..."
+                    st.markdown(f'<p class="status-processing">{label}</p>', unsafe_allow_html=True)
                     # Auto-refresh in 2 seconds
                     time.sleep(2)
                     st.rerun()
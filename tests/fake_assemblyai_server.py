@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Local Stand-in for the AssemblyAI Transcription API
+Implements /v2/upload, /v2/transcript and /v2/transcript/{id} in-process so
+the voice pipeline can be exercised offline. Transcripts complete after
+processing_time seconds and, if a webhook_url was given, the completion
+callback is POSTed to it.
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+
+DEFAULT_UTTERANCES = [
+    {"speaker": "A", "text": "Thanks for joining us today.", "start": 0, "end": 2000, "confidence": 0.95},
+    {"speaker": "B", "text": "Happy to be here, thank you.", "start": 2300, "end": 4200, "confidence": 0.93},
+    {"speaker": "A", "text": "Let's talk about the new project.", "start": 4500, "end": 7000, "confidence": 0.94},
+    {"speaker": "B", "text": "Sure, it has been a long journey.", "start": 7400, "end": 10100, "confidence": 0.92},
+]
+
+
+class FakeAssemblyAIServer:
+    """Threaded HTTP server mimicking the AssemblyAI endpoints used by voice/main.py"""
+
+    def __init__(self, processing_time=2.0, utterances=None, audio_duration=10.1):
+        self.processing_time = processing_time
+        self.utterances = utterances if utterances is not None else DEFAULT_UTTERANCES
+        self.audio_duration = audio_duration
+        self.transcripts = {}
+        self.uploaded_bytes = 0
+        self.request_counts = {"upload": 0, "submit": 0, "poll": 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _read_body(self):
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    body = b""
+                    while True:
+                        size = int(self.rfile.readline().strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return body
+                        body += self.rfile.read(size)
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self._read_body()
+                if self.path == "/v2/upload":
+                    with fake._lock:
+                        fake.request_counts["upload"] += 1
+                        fake.uploaded_bytes += len(body)
+                    self._send_json({"upload_url": f"{fake.base_url}/uploads/{uuid.uuid4()}"})
+                elif self.path == "/v2/transcript":
+                    request = json.loads(body or b"{}")
+                    transcript_id = fake.create_transcript(request)
+                    self._send_json({"id": transcript_id, "status": "queued"})
+                else:
+                    self._send_json({"error": "Not found"}, status=404)
+
+            def do_GET(self):
+                prefix = "/v2/transcript/"
+                if self.path.startswith(prefix):
+                    with fake._lock:
+                        fake.request_counts["poll"] += 1
+                    transcript = fake.transcript_state(self.path[len(prefix):])
+                    if transcript is None:
+                        self._send_json({"error": "Transcript not found"}, status=404)
+                    else:
+                        self._send_json(transcript)
+                else:
+                    self._send_json({"error": "Not found"}, status=404)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def create_transcript(self, request):
+        transcript_id = str(uuid.uuid4())
+        with self._lock:
+            self.request_counts["submit"] += 1
+            self.transcripts[transcript_id] = {
+                "created": time.time(),
+                "request": request,
+            }
+
+        webhook_url = request.get("webhook_url")
+        if webhook_url:
+            timer = threading.Timer(self.processing_time, self._send_webhook, args=(webhook_url, transcript_id))
+            timer.daemon = True
+            timer.start()
+
+        return transcript_id
+
+    def transcript_state(self, transcript_id):
+        with self._lock:
+            transcript = self.transcripts.get(transcript_id)
+        if transcript is None:
+            return None
+
+        if time.time() - transcript["created"] < self.processing_time:
+            return {"id": transcript_id, "status": "processing"}
+
+        return {
+            "id": transcript_id,
+            "status": "completed",
+            "text": " ".join(u["text"] for u in self.utterances),
+            "utterances": self.utterances,
+            "audio_duration": self.audio_duration,
+            "speech_model": transcript["request"].get("speech_model"),
+        }
+
+    def _send_webhook(self, webhook_url, transcript_id):
+        payload = json.dumps({"transcript_id": transcript_id, "status": "completed"}).encode("utf-8")
+        request = Request(webhook_url, data=payload, headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            urlopen(request, timeout=10).read()
+        except Exception as e:
+            print(f"⚠️ Fake webhook delivery failed: {e}")
+
+
+if __name__ == "__main__":
+    server = FakeAssemblyAIServer().start()
+    print(f"Fake AssemblyAI server running at {server.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Test API Server
+Checks the streamed upload path: format sniffing (415), the size limit
+(413) and content-addressed storage of duplicate uploads; /process
+deduplication by Idempotency-Key and request fingerprint; that a
+cancelled job reports "cancelling" until its worker stops; that deletes
+are atomic; and that run manifests are only kept while a job can be resumed.
+"""
+
+import os
+import sys
+import tempfile
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import api_server
+from cancellation import CancellationToken
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def make_client(work_dir):
+    api_server.UPLOAD_DIR = os.path.join(work_dir, "uploads")
+    api_server.OUTPUT_DIR = work_dir
+    os.makedirs(api_server.UPLOAD_DIR)
+    return TestClient(api_server.app)
+
+
+def add_pending_job(job_id):
+    api_server.job_status[job_id] = api_server.JobStatus(
+        job_id=job_id, status="pending", progress=0, current_step="", message=""
+    )
+    api_server.job_cancel_tokens[job_id] = CancellationToken()
+
+
+def test_upload_rejects_unknown_format():
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = make_client(work_dir)
+        response = client.post("/upload", files={"file": ("notes.png", b"just some text", "image/png")})
+        assert response.status_code == 415
+        assert os.listdir(api_server.UPLOAD_DIR) == []  # temp file removed
+        print("✅ Unrecognized formats are rejected with 415")
+
+
+def test_upload_size_limit():
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = make_client(work_dir)
+        saved_limit = api_server.MAX_UPLOAD_SIZE
+        api_server.MAX_UPLOAD_SIZE = 32
+        try:
+            response = client.post("/upload", files={"file": ("big.png", PNG_BYTES, "image/png")})
+        finally:
+            api_server.MAX_UPLOAD_SIZE = saved_limit
+        assert response.status_code == 413
+        assert os.listdir(api_server.UPLOAD_DIR) == []
+        print("✅ Oversized uploads are rejected with 413")
+
+
+def test_duplicate_uploads_share_one_file():
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = make_client(work_dir)
+        first = client.post("/upload", files={"file": ("a.png", PNG_BYTES, "image/png")}).json()
+        second = client.post("/upload", files={"file": ("b.png", PNG_BYTES, "image/png")}).json()
+
+        assert first["format"] == "png" and first["filename"] == f"{first['sha256']}.png"
+        assert not first["duplicate"] and second["duplicate"]
+        assert second["file_path"] == first["file_path"]
+        assert os.listdir(api_server.UPLOAD_DIR) == [first["filename"]]
+        print("✅ Identical uploads resolve to one content-addressed file")
+
+
+def submit(client, body, key=None):
+    headers = {"Idempotency-Key": key} if key else {}
+    return client.post("/process", json=body, headers=headers)
+
+
+def test_idempotency_keys():
+    """A key replays its job, rejects a different body and expires after the TTL"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = make_client(work_dir)
+        saved = api_server.run_pipeline_background
+        api_server.run_pipeline_background = lambda *args: None  # keep jobs pending
+        try:
+            body = {"character_name": "Alice", "use_google_search": True}
+            first = submit(client, body, key="key-1").json()
+            retry = submit(client, body, key="key-1").json()
+            assert retry == {"job_id": first["job_id"], "status": "attached", "deduplicated": True}
+
+            conflict = submit(client, dict(body, max_candidates=9), key="key-1")
+            assert conflict.status_code == 422
+
+            api_server.idempotency_keys["key-1"]["expires_at"] = 0
+            api_server.job_status[first["job_id"]].status = "completed"
+            fresh = submit(client, dict(body, max_candidates=9), key="key-1").json()
+            assert not fresh["deduplicated"] and fresh["job_id"] != first["job_id"]
+            assert api_server.idempotency_keys["key-1"]["job_id"] == fresh["job_id"]
+        finally:
+            api_server.run_pipeline_background = saved
+        print("✅ Idempotency keys replay, reject reuse with another body and expire")
+
+
+def test_folder_runs_fingerprint_their_uploads():
+    """A folder run is only a duplicate while the uploaded images are unchanged"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = make_client(work_dir)
+        saved = api_server.run_pipeline_background
+        api_server.run_pipeline_background = lambda *args: None
+        try:
+            client.post("/upload", files={"file": ("a.png", PNG_BYTES, "image/png")})
+            first = submit(client, {"max_candidates": 2}).json()
+            assert submit(client, {"max_candidates": 2}).json()["job_id"] == first["job_id"]
+
+            client.post("/upload", files={"file": ("b.png", PNG_BYTES + b"\x01", "image/png")})
+            second = submit(client, {"max_candidates": 2}).json()
+            assert not second["deduplicated"] and second["job_id"] != first["job_id"]
+        finally:
+            api_server.run_pipeline_background = saved
+        print("✅ Folder runs are deduplicated only while their uploads are unchanged")
+
+
+def test_cancel_reports_cancelling_until_worker_stops():
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = make_client(work_dir)
+        request = api_server.PipelineRequest(max_candidates=2)
+        job_id = "job-cancel"
+        add_pending_job(job_id)
+        fingerprint = api_server.request_fingerprint(request)
+        api_server.inflight_requests[fingerprint] = job_id
+
+        assert client.post(f"/jobs/{job_id}/cancel").json() == {"message": "Job cancelling"}
+        assert api_server.job_status[job_id].status == "cancelling"
+        with api_server.submission_lock:
+            # Still running: identical submissions must not start a second job yet
+            assert api_server.find_existing_job(fingerprint, None) == job_id
+
+        api_server.run_pipeline_background(job_id, request)
+        assert api_server.job_status[job_id].status == "cancelled"
+        assert job_id not in api_server.job_cancel_tokens
+        print("✅ Cancel reports cancelling until the worker sets cancelled")
+
+
+def test_manifests_kept_only_while_resumable():
+    """Completed jobs drop their run manifest; failed ones keep it until deleted"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = make_client(work_dir)
+        runs_dir = os.path.join(work_dir, "runs")
+        outcomes = {"job-done": "completed", "job-failed": "error"}
+        saved = api_server._run_pipeline_job
+
+        def finish(job_id, request, status, manifest, profiler=None):
+            manifest.record_stage(job_id, "detect", data={"person_count": 1})
+            status.status = outcomes[job_id]
+
+        api_server._run_pipeline_job = finish
+        try:
+            for job_id in outcomes:
+                add_pending_job(job_id)
+                api_server.run_pipeline_background(job_id, api_server.PipelineRequest())
+                api_server.job_cancel_tokens.pop(job_id, None)
+        finally:
+            api_server._run_pipeline_job = saved
+
+        assert sorted(os.listdir(runs_dir)) == ["job-failed.checkpoints.jsonl", "job-failed.json"]
+        assert client.delete("/jobs/job-failed").json() == {"message": "Job deleted"}
+        assert os.listdir(runs_dir) == []
+        print("✅ Run manifests are kept only while a job can be resumed")
+
+
+def test_delete_is_atomic_and_beats_the_worker():
+    """A second DELETE is a 404; a job deleted before its worker starts never runs"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        client = make_client(work_dir)
+        job_id = "job-delete"
+        add_pending_job(job_id)
+        fingerprint = api_server.request_fingerprint(api_server.PipelineRequest())
+        api_server.inflight_requests[fingerprint] = job_id
+
+        assert client.delete(f"/jobs/{job_id}").json() == {"message": "Job cancelled and deleted"}
+        assert client.delete(f"/jobs/{job_id}").status_code == 404
+        assert client.post(f"/jobs/{job_id}/cancel").status_code == 404
+
+        api_server.run_pipeline_background(job_id, api_server.PipelineRequest())
+        assert job_id not in api_server.job_status and job_id not in api_server.job_cancel_tokens
+        assert fingerprint not in api_server.inflight_requests
+        assert not os.path.exists(os.path.join(work_dir, "runs", f"{job_id}.json"))
+        print("✅ Deletes are atomic and a deleted pending job never starts")
+
+
+def main():
+    print("🧪 API Server Test")
+    print("=" * 40)
+    test_upload_rejects_unknown_format()
+    test_upload_size_limit()
+    test_duplicate_uploads_share_one_file()
+    test_idempotency_keys()
+    test_folder_runs_fingerprint_their_uploads()
+    test_cancel_reports_cancelling_until_worker_stops()
+    test_manifests_kept_only_while_resumable()
+    test_delete_is_atomic_and_beats_the_worker()
+
+
+if __name__ == "__main__":
+    main()
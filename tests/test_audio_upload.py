@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test Audio Upload
+Streams the audio track of a synthetic video to the local fake AssemblyAI
+server in chunks, and checks that a failed streaming request falls back to
+uploading the original file. Needs FFmpeg.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fake_assemblyai_server import FakeAssemblyAIServer
+from voice.main import AssemblyAITranscriber
+
+
+def make_video(path, duration=5):
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate=15:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=300:duration={duration},volume=0.1",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", path
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def test_audio_stream_upload():
+    """Only the compact audio track reaches the upload endpoint"""
+    server = FakeAssemblyAIServer().start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            video_path = os.path.join(work_dir, "source.mp4")
+            make_video(video_path)
+
+            transcriber = AssemblyAITranscriber("test-key", base_url=server.base_url)
+            upload_url = transcriber.upload_audio_stream(video_path)
+
+            assert upload_url.startswith(f"{server.base_url}/uploads/")
+            assert server.request_counts["upload"] == 1, server.request_counts
+            assert 0 < server.uploaded_bytes < os.path.getsize(video_path)
+            print(f"✅ Streamed {server.uploaded_bytes} bytes of audio ({os.path.getsize(video_path)} byte source)")
+    finally:
+        server.stop()
+
+
+def test_request_errors_fall_back_to_file_upload():
+    """A connection error while streaming uploads the original file instead"""
+    server = FakeAssemblyAIServer().start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            video_path = os.path.join(work_dir, "source.mp4")
+            make_video(video_path)
+
+            transcriber = AssemblyAITranscriber("test-key", base_url=server.base_url)
+            post = transcriber.session.post
+
+            def failing_stream_post(url, data=None, **kwargs):
+                if not hasattr(data, "read"):  # the chunked audio stream
+                    raise requests.ConnectionError("connection reset while streaming")
+                return post(url, data=data, **kwargs)
+
+            transcriber.session.post = failing_stream_post
+            upload_url = transcriber.upload_media(video_path)
+
+            assert upload_url.startswith(f"{server.base_url}/uploads/")
+            assert server.request_counts["upload"] == 1, server.request_counts
+            assert server.uploaded_bytes == os.path.getsize(video_path)
+            print("✅ Request errors fall back to uploading the original file")
+    finally:
+        server.stop()
+
+
+def main():
+    print("🧪 Audio Upload Test")
+    print("=" * 40)
+    test_audio_stream_upload()
+    test_request_errors_fall_back_to_file_upload()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test Image Index
+Checks that unchanged (or touched-but-identical) images keep their results,
+that changed images and changed outputs lose them, and that the index
+survives a reload.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from image_index import ImageIndex
+
+
+def write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_unchanged_and_touched_images():
+    """Same content keeps its results, even with a new mtime"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        image = write(os.path.join(work_dir, "a.jpg"), b"image a")
+        index = ImageIndex.for_directory(work_dir)
+        assert not index.is_unchanged(image)  # never seen
+
+        index.record(image, "detect", data={"person_count": 1})
+        assert index.is_unchanged(image)
+        assert index.result(image, "detect")["data"] == {"person_count": 1}
+
+        stat = os.stat(image)
+        os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert index.is_unchanged(image)
+        assert index.result(image, "detect") is not None
+        print("✅ Unchanged and touched-but-identical images are reused")
+
+
+def test_changed_images_and_outputs():
+    """New content drops the entry; a changed output drops that result"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        image = write(os.path.join(work_dir, "a.jpg"), b"image a")
+        other = write(os.path.join(work_dir, "b.jpg"), b"image b")
+        outpainted = write(os.path.join(work_dir, "b_outpainted.png"), b"first")
+
+        index = ImageIndex.for_directory(work_dir)
+        index.record_rejection(image, "detect", "No faces detected")
+        index.record(other, "outpaint", output=outpainted)
+
+        write(image, b"image a, edited")
+        assert not index.is_unchanged(image)
+        assert index.rejection(image) is None
+
+        write(outpainted, b"second")
+        assert index.is_unchanged(other)
+        assert index.result(other, "outpaint") is None
+        print("✅ Changed images and changed outputs are redone")
+
+
+def test_prune_and_reload():
+    """Removed files are pruned; saved entries survive a reload"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        kept = write(os.path.join(work_dir, "a.jpg"), b"image a")
+        removed = write(os.path.join(work_dir, "b.jpg"), b"image b")
+
+        index = ImageIndex.for_directory(work_dir)
+        index.record_rejection(kept, "probe", "too small")
+        index.record(removed, "detect")
+        index.prune([kept])
+        index.save()
+
+        reloaded = ImageIndex.for_directory(work_dir)
+        assert reloaded.is_unchanged(kept)
+        assert reloaded.rejection(kept) == {"stage": "probe", "reason": "too small"}
+        assert not reloaded.is_unchanged(removed)
+        print("✅ Index prunes removed files and survives a reload")
+
+
+def main():
+    print("🧪 Image Index Test")
+    print("=" * 40)
+    test_unchanged_and_touched_images()
+    test_changed_images_and_outputs()
+    test_prune_and_reload()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test Local Transcription Backend
+Runs LocalWhisperTranscriber on a synthetic two-voice recording. The
+faster-whisper model is replaced by a stand-in that returns the known
+segment timings, so the test exercises audio decoding, diarization,
+utterance building and caching offline (needs FFmpeg, not faster-whisper).
+"""
+
+import os
+import sys
+import tempfile
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import voice.main as voice_main
+from voice.main import AutoTranscriber, LocalWhisperTranscriber, TranscriptCache, LOCAL_SAMPLE_RATE
+
+# (fundamental Hz, formant Hz) per synthetic speaker
+VOICES = {"low": (120, 700), "high": (220, 1800)}
+
+
+def synth_voice(f0, formant, seconds, rng):
+    t = np.arange(int(seconds * LOCAL_SAMPLE_RATE)) / LOCAL_SAMPLE_RATE
+    signal = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 15))
+    signal += 0.5 * np.sin(2 * np.pi * formant * t)
+    return 0.1 * signal + 0.01 * rng.standard_normal(len(t))
+
+
+def make_conversation(path, turns=8):
+    """Alternating low/high voices; returns the (start, end, voice) turns"""
+    rng = np.random.default_rng(0)
+    chunks, timeline, position = [], [], 0.0
+    for i in range(turns):
+        voice = "low" if i % 2 == 0 else "high"
+        seconds = rng.uniform(1.5, 3.5)
+        chunks.append(synth_voice(*VOICES[voice], seconds, rng))
+        timeline.append((position, position + seconds, voice))
+        position += seconds
+
+    samples = (np.concatenate(chunks) * 32767).astype(np.int16)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(LOCAL_SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+    return timeline
+
+
+class TimelineWhisperModel:
+    """Stand-in for faster_whisper.WhisperModel returning known segments"""
+
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.calls = 0
+
+    def transcribe(self, samples, **kwargs):
+        self.calls += 1
+        segments = [
+            SimpleNamespace(start=start, end=end, text=f" {voice} voice turn {i}", avg_logprob=-0.2)
+            for i, (start, end, voice) in enumerate(self.timeline)
+        ]
+        return iter(segments), SimpleNamespace(duration=self.timeline[-1][1])
+
+
+def test_local_transcription():
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_path = os.path.join(work_dir, "conversation.wav")
+        timeline = make_conversation(audio_path)
+
+        model = TimelineWhisperModel(timeline)
+        transcriber = LocalWhisperTranscriber(
+            model=model, transcript_cache=TranscriptCache(os.path.join(work_dir, "cache"))
+        )
+        result = transcriber.transcribe_file(audio_path)
+
+        utterances = result["utterances"]
+        assert result["status"] == "completed"
+        assert len(utterances) == len(timeline), utterances
+        assert [u["speaker"] for u in utterances] == ["A", "B"] * (len(timeline) // 2)
+        assert all(isinstance(u["start"], int) and u["end"] > u["start"] for u in utterances)
+
+        transcriber.transcribe_file(audio_path)
+        assert model.calls == 1, "second run should come from the transcript cache"
+        print(f"✅ {len(utterances)} utterances from 2 speakers, cached on re-run")
+
+
+def test_auto_backend_probes_each_file_once():
+    """The stage calls of one file share a single ffprobe decision"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        audio_path = os.path.join(work_dir, "conversation.wav")
+        timeline = make_conversation(audio_path, turns=2)
+
+        probes = []
+        probe = voice_main.probe_media_duration
+        voice_main.probe_media_duration = lambda path: probes.append(path) or 5.0
+        try:
+            local_backend = LocalWhisperTranscriber(model=TimelineWhisperModel(timeline))
+            transcriber = AutoTranscriber(local_backend, cloud_backend=None)
+            cache_key, cached = transcriber.lookup_cached(audio_path)
+            audio_url = transcriber.upload_media(audio_path)
+            result = transcriber.transcribe_uploaded(audio_url, audio_path, cache_key=cache_key)
+        finally:
+            voice_main.probe_media_duration = probe
+
+        assert result["status"] == "completed" and result["utterances"]
+        assert probes == [audio_path], probes
+        print("✅ Auto backend probes each file once")
+
+
+def main():
+    print("🧪 Local Transcription Test")
+    print("=" * 40)
+    test_local_transcription()
+    test_auto_backend_probes_each_file_once()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test Pipeline Profiling
+Runs a small image workload (main thread plus a worker pool, like the API
+server's candidate processing) under each profile mode and checks the artifacts.
+"""
+
+import os
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline_profiling import JobProfiler, profile_mode_available
+
+
+def blur_candidate(seed):
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 255, (768, 512, 3), dtype=np.uint8)
+    return float(cv2.Laplacian(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var())
+
+
+def run_job(profiler):
+    frames = [np.zeros((1536, 1024, 3), dtype=np.uint8) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        scores = list(executor.map(profiler.wrap(blur_candidate), range(4)))
+    return frames, scores
+
+
+def test_cprofile_includes_workers():
+    """Worker-thread candidates should show up in the merged cProfile stats"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        with JobProfiler("cprofile", work_dir, "job-1") as profiler:
+            run_job(profiler)
+
+        assert profiler.artifact.endswith("job-1_cprofile.prof") and os.path.exists(profiler.artifact)
+        with open(os.path.join(work_dir, "job-1_cprofile.txt")) as f:
+            assert "blur_candidate" in f.read()
+        print(f"✅ cProfile artifact written in {profiler.duration:.2f}s, worker threads included")
+
+
+def after_inline_candidate():
+    return sum(range(1000))
+
+
+def test_cprofile_inline_wrapped_call():
+    """A wrapped call on the job's own thread must not end the job's profile"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        with JobProfiler("cprofile", work_dir, "job-5") as profiler:
+            profiler.wrap(blur_candidate)(0)
+            after_inline_candidate()
+
+        with open(os.path.join(work_dir, "job-5_cprofile.txt")) as f:
+            report = f.read()
+        assert "blur_candidate" in report and "after_inline_candidate" in report
+        print("✅ Inline wrapped calls keep the job thread profiled")
+
+
+def test_tracemalloc_report():
+    """The tracemalloc report should attribute the job's image buffers"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        with JobProfiler("tracemalloc", work_dir, "job-2") as profiler:
+            frames, _ = run_job(profiler)
+            del frames
+
+        with open(profiler.artifact) as f:
+            report = f.read()
+        assert "Image-handling allocation hotspots:" in report
+        assert "Peak traced memory:" in report
+        peak_mb = float(report.split("Peak traced memory: ")[1].split(" MB")[0])
+        assert peak_mb >= 18, report[:300]  # four 1024x1536 RGB frames
+        print(f"✅ tracemalloc report written (peak {peak_mb:.1f} MB)")
+
+
+def test_overlapping_tracemalloc_jobs():
+    """The first of two overlapping jobs to finish must not stop the other's tracing"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        first = JobProfiler("tracemalloc", work_dir, "job-6").__enter__()
+        second = JobProfiler("tracemalloc", work_dir, "job-7").__enter__()
+        run_job(first)
+        first.__exit__(None, None, None)
+        assert tracemalloc.is_tracing()
+
+        frames, _ = run_job(second)
+        del frames
+        second.__exit__(None, None, None)
+        assert not tracemalloc.is_tracing()
+        for profiler in (first, second):
+            assert profiler.error is None and os.path.exists(profiler.artifact), profiler.to_dict()
+        print("✅ Overlapping tracemalloc jobs both write their reports")
+
+
+def test_pyinstrument_or_unavailable():
+    """pyinstrument is optional: profile a job if installed, reject it otherwise"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        if not profile_mode_available("pyinstrument"):
+            try:
+                JobProfiler("pyinstrument", work_dir, "job-3")
+            except ValueError:
+                print("✅ pyinstrument not installed; mode rejected")
+                return
+            raise AssertionError("pyinstrument mode accepted without the package")
+
+        with JobProfiler("pyinstrument", work_dir, "job-3") as profiler:
+            run_job(profiler)
+        assert profiler.artifact.endswith(".html") and os.path.exists(profiler.artifact)
+        print("✅ pyinstrument HTML artifact written")
+
+
+def test_unknown_mode():
+    try:
+        JobProfiler("perf", tempfile.gettempdir(), "job-4")
+    except ValueError:
+        print("✅ Unknown profile mode rejected")
+        return
+    raise AssertionError("Unknown profile mode accepted")
+
+
+def main():
+    print("🧪 Pipeline Profiling Test")
+    print("=" * 40)
+    test_cprofile_includes_workers()
+    test_cprofile_inline_wrapped_call()
+    test_tracemalloc_report()
+    test_overlapping_tracemalloc_jobs()
+    test_pyinstrument_or_unavailable()
+    test_unknown_mode()
+
+
+if __name__ == "__main__":
+    main()
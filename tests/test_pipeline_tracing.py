@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test Pipeline Tracing
+Checks span nesting, explicit parents across worker threads, error status,
+the disabled no-op path and the per-job breakdown.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pipeline_tracing import configure_tracing, span, current_span, load_spans, summarize_trace, NOOP_SPAN
+from pipeline_metrics import time_stage
+
+
+def test_nested_spans():
+    """Stage and external spans should nest under the job span in one trace"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        trace_path = os.path.join(work_dir, "trace.jsonl")
+        configure_tracing(trace_path)
+        try:
+            with span("pipeline_job", kind="job", job_id="job-1") as job_span:
+                with time_stage("quality_check", image_width=640, image_height=480):
+                    current_span().set_attribute("checked", True)
+
+                def worker():
+                    with span("process_candidate", kind="candidate", parent=job_span, candidate_id=1):
+                        with span("comfyui_outpaint", kind="external") as outpaint_span:
+                            outpaint_span.set_attribute("prompt_id", "p-1")
+
+                thread = threading.Thread(target=worker)
+                thread.start()
+                thread.join()
+        finally:
+            configure_tracing(None)
+
+        spans = {entry["name"]: entry for entry in load_spans(trace_path)}
+        job = spans["pipeline_job"]
+        assert len({entry["trace_id"] for entry in spans.values()}) == 1
+        assert spans["quality_check"]["parent_span_id"] == job["span_id"]
+        assert spans["quality_check"]["attributes"] == {"image_width": 640, "image_height": 480, "checked": True}
+        assert spans["process_candidate"]["parent_span_id"] == job["span_id"]
+        assert spans["comfyui_outpaint"]["parent_span_id"] == spans["process_candidate"]["span_id"]
+        assert spans["comfyui_outpaint"]["attributes"]["prompt_id"] == "p-1"
+        assert job["end_time_unix_nano"] >= job["start_time_unix_nano"]
+
+        breakdown = summarize_trace(list(spans.values()))[job["trace_id"]]["breakdown"]
+        assert set(breakdown) == {"quality_check", "comfyui_outpaint"}
+        print("✅ Job, candidate, stage and external spans share one trace")
+
+
+def test_error_status():
+    """An exception escaping a span should mark it ERROR and still export it"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        trace_path = os.path.join(work_dir, "trace.jsonl")
+        configure_tracing(trace_path)
+        try:
+            with span("crop"):
+                raise ValueError("bad crop")
+        except ValueError:
+            pass
+        finally:
+            configure_tracing(None)
+
+        (entry,) = load_spans(trace_path)
+        assert entry["status"] == {"code": "ERROR", "message": "bad crop"}
+        assert entry["events"][0]["attributes"]["exception.type"] == "ValueError"
+        print("✅ Failed spans exported with ERROR status")
+
+
+def test_disabled_tracing():
+    """With tracing off, spans are the shared no-op and nothing is written"""
+    configure_tracing(None)
+    with span("pipeline_job", kind="job") as job_span:
+        job_span.set_attribute("ignored", True)
+        assert job_span is NOOP_SPAN
+        assert current_span() is NOOP_SPAN
+    print("✅ Disabled tracing yields no-op spans")
+
+
+def main():
+    print("🧪 Pipeline Tracing Test")
+    print("=" * 40)
+    test_nested_spans()
+    test_error_status()
+    test_disabled_tracing()
+
+
+if __name__ == "__main__":
+    main()
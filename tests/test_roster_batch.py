@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test Roster Batch Driver
+Checks roster parsing, --resume filtering and the per-character results
+written as candidates leave the shared pipeline.
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from roster_batch import load_roster, completed_characters, RosterTracker
+
+
+def test_load_roster():
+    """Valid lines become entries, bad lines error entries, blank lines are skipped"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        roster_path = os.path.join(work_dir, "roster.jsonl")
+        with open(roster_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"character_name": "Alice", "max_sprites": 2}) + "\n\n")
+            f.write("{not json\n")
+            f.write(json.dumps({"num_images": 3}) + "\n")
+
+        alice, broken, unnamed = load_roster(roster_path)
+        assert alice == {"character_name": "Alice", "max_sprites": 2, "line": 1}
+        assert broken["line"] == 3 and broken["error"].startswith("Invalid roster line")
+        assert unnamed["error"] == "Invalid roster line: missing character_name"
+        print("✅ Roster lines parsed")
+
+
+def test_completed_characters():
+    with tempfile.TemporaryDirectory() as work_dir:
+        results_path = os.path.join(work_dir, "results.jsonl")
+        with open(results_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"character_name": "Alice", "status": "completed"}) + "\n")
+            f.write(json.dumps({"character_name": "Bob", "status": "interrupted"}) + "\n")
+        assert completed_characters(results_path) == {"Alice"}
+        assert completed_characters(os.path.join(work_dir, "missing.jsonl")) == set()
+        print("✅ --resume skips only completed characters")
+
+
+def test_tracker_results():
+    """A character's line is written once its last candidate is done"""
+    results = io.StringIO()
+    tracker = RosterTracker(results)
+    tracker.start(1, {"character_name": "Alice", "line": 1}, 2, search_time=0.5, output_dir="sprites/alice")
+    tracker.start(2, {"character_name": "Bob", "line": 2}, 0, search_time=0.1)
+    tracker.start(3, {"character_name": "Carol", "line": 3}, 1, search_time=0.1)
+
+    tracker.candidate_done({'group': 1, 'status': 'rejected', 'rejected_stage': 'detect'})
+    assert len(results.getvalue().splitlines()) == 1  # only Bob so far
+    tracker.candidate_done({'group': 1, 'status': 'completed',
+                            'sprite': {'path': 'sprites/alice/sprite_01.jpg', 'input': 'a.jpg', 'score': 80}})
+    tracker.interrupt_unfinished()
+
+    lines = {line["character_name"]: line for line in map(json.loads, results.getvalue().splitlines())}
+    assert lines["Bob"]["status"] == "no_candidates"
+    assert lines["Carol"]["status"] == "interrupted"
+    alice = lines["Alice"]
+    assert alice["status"] == "completed" and alice["sprite_count"] == 1
+    assert alice["rejections"] == {"detect": 1}
+    assert alice["time_to_first_sprite"] >= 0.5 and alice["total_time"] >= alice["time_to_first_sprite"]
+    assert tracker.counts == {"no_candidates": 1, "completed": 1, "interrupted": 1}
+    print("✅ Per-character results written as characters finish")
+
+
+def main():
+    print("🧪 Roster Batch Test")
+    print("=" * 40)
+    test_load_roster()
+    test_completed_characters()
+    test_tracker_results()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test Run Manifest
+Checks that checkpoints survive a reload, that changed or deleted outputs
+invalidate their checkpoint, that final rejections are remembered and that
+checkpoints are appended to a log rather than rewriting the manifest.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from run_manifest import RunManifest
+
+
+def write(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_checkpoints_survive_reload():
+    """A reloaded manifest returns the recorded stages, inputs and params"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        runs_dir = os.path.join(work_dir, "runs")
+        sprite = write(os.path.join(work_dir, "sprite_01.jpg"), b"sprite bytes")
+
+        manifest = RunManifest.create("run-1", params={"character_name": "Alice"}, runs_dir=runs_dir)
+        manifest.set_inputs([{"key": "a.jpg", "path": "a.jpg"}])
+        manifest.record_stage("a.jpg", "crop", output=sprite, data={"score": 80})
+
+        reloaded = RunManifest.load("run-1", runs_dir)
+        assert reloaded.params == {"character_name": "Alice"}
+        assert reloaded.inputs == [{"key": "a.jpg", "path": "a.jpg"}]
+        entry = reloaded.stage_result("a.jpg", "crop")
+        assert entry["output"] == sprite and entry["data"] == {"score": 80}
+        assert reloaded.stage_result("a.jpg", "outpaint") is None
+        assert reloaded.completed_stages() == {"crop": 1}
+        assert os.listdir(runs_dir) == ["run-1.json"]
+        print("✅ Checkpoints survive a reload")
+
+
+def test_changed_outputs_invalidate_checkpoint():
+    """Overwritten or deleted output files must be redone on resume"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        outpainted = write(os.path.join(work_dir, "outpainted.png"), b"first")
+        sprite = write(os.path.join(work_dir, "sprite.jpg"), b"sprite")
+
+        manifest = RunManifest.create("run-2", runs_dir=work_dir)
+        manifest.record_stage("a.jpg", "outpaint", output=outpainted)
+        manifest.record_stage("a.jpg", "crop", output=sprite)
+
+        write(outpainted, b"second")
+        os.remove(sprite)
+        assert manifest.stage_result("a.jpg", "outpaint") is None
+        assert manifest.stage_result("a.jpg", "crop") is None
+        print("✅ Changed or deleted outputs invalidate their checkpoints")
+
+
+def test_rejections_and_open():
+    """open() resumes an existing run; rejections are kept across attempts"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manifest = RunManifest.open("run-3", params={"max_candidates": 5}, runs_dir=work_dir)
+        manifest.record_rejection("b.jpg", "detect", "No faces detected")
+        manifest.set_status("failed")
+
+        resumed = RunManifest.open("run-3", params={"ignored": True}, runs_dir=work_dir)
+        assert resumed.params == {"max_candidates": 5}
+        assert resumed.status == "failed"
+        assert resumed.rejection("b.jpg") == {"stage": "detect", "reason": "No faces detected"}
+        assert resumed.rejection("c.jpg") is None
+
+        try:
+            RunManifest.load("missing", work_dir)
+        except FileNotFoundError:
+            pass
+        else:
+            raise AssertionError("loading an unknown run should fail")
+        print("✅ Rejections persist and open() resumes existing runs")
+
+
+def test_checkpoints_are_appended():
+    """Checkpoints only append to the log, which a reload folds into the manifest"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        manifest = RunManifest.create("run-4", runs_dir=work_dir)
+        manifest.set_inputs([{"key": f"{i}.jpg"} for i in range(20)])
+        with open(manifest.path, encoding="utf-8") as f:
+            snapshot = f.read()
+
+        for i in range(20):
+            manifest.record_stage(f"{i}.jpg", "detect", data={"person_count": 1})
+        manifest.record_rejection("3.jpg", "detect", "No faces detected")
+        with open(manifest.path, encoding="utf-8") as f:
+            assert f.read() == snapshot
+        with open(manifest.log_path, "a", encoding="utf-8") as f:
+            f.write('{"key": "4.jpg", "rejec')  # cut off by a crash
+
+        reloaded = RunManifest.load("run-4", work_dir)
+        assert reloaded.completed_stages() == {"detect": 20}
+        assert reloaded.rejection("3.jpg")["reason"] == "No faces detected"
+        assert reloaded.rejection("4.jpg") is None
+        assert os.listdir(work_dir) == ["run-4.json"]  # folded in on load
+
+        reloaded.record_rejection("4.jpg", "detect", "Multiple faces detected: 2")
+        assert RunManifest.load("run-4", work_dir).rejection("4.jpg")["stage"] == "detect"
+        print("✅ Checkpoints are appended to a log and folded in on reload")
+
+
+def main():
+    print("🧪 Run Manifest Test")
+    print("=" * 40)
+    test_checkpoints_survive_reload()
+    test_changed_outputs_invalidate_checkpoint()
+    test_rejections_and_open()
+    test_checkpoints_are_appended()
+
+
+if __name__ == "__main__":
+    main()
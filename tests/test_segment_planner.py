@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test Segment Planner
+Checks merging, gap awareness, sliver dropping and padding of the cut list
+built from target-speaker utterances.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from voice.main import SegmentPlanner
+
+UTTERANCES = [
+    {"speaker": "A", "start": 0, "end": 2000, "text": "First part"},
+    {"speaker": "A", "start": 2300, "end": 2600, "text": "of a sentence."},
+    {"speaker": "B", "start": 2700, "end": 3000, "text": "Right."},
+    {"speaker": "A", "start": 3100, "end": 3300, "text": "Yes."},
+    {"speaker": "A", "start": 8000, "end": 8400, "text": "Hm."},
+    {"speaker": "A", "start": 10000, "end": 12000, "text": "Another"},
+    {"speaker": "A", "start": 12500, "end": 14000, "text": "thought."},
+]
+
+
+def target(utterances):
+    return [u for u in utterances if u["speaker"] == "A"]
+
+
+def test_gap_aware_merge():
+    cuts = SegmentPlanner(padding_ms=150).plan(target(UTTERANCES), UTTERANCES)
+    assert len(cuts) == 2, cuts
+    assert cuts[0]["text"] == "First part of a sentence."
+    assert cuts[0]["end"] <= 2700, "padding ran into speaker B"
+    assert cuts[1]["start"] == 9850 and cuts[1]["utterances"] == 2
+    print(f"✅ 6 utterances planned into {len(cuts)} cuts")
+
+
+def test_timing_only_merge():
+    cuts = SegmentPlanner(padding_ms=0).plan(target(UTTERANCES))
+    assert [(c["start"], c["end"]) for c in cuts] == [(0, 3300), (10000, 14000)], cuts
+    print("✅ Without the full transcript, close utterances merge across the gap")
+
+
+def test_max_duration():
+    utterances = [{"speaker": "A", "start": i * 1000, "end": i * 1000 + 900, "text": str(i)} for i in range(100)]
+    cuts = SegmentPlanner(max_duration_ms=10000, padding_ms=0).plan(utterances)
+    assert all(c["end"] - c["start"] <= 10000 for c in cuts)
+    assert len(cuts) == 10, len(cuts)
+    print("✅ Merged cuts respect max_duration_ms")
+
+
+def main():
+    print("🧪 Segment Planner Test")
+    print("=" * 40)
+    test_gap_aware_merge()
+    test_timing_only_merge()
+    test_max_duration()
+
+
+if __name__ == "__main__":
+    main()
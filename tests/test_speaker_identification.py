@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test Token-Budgeted Speaker Identification
+Checks that TargetSpeakerIdentifier prompts stay within the token budget
+regardless of transcript length, that results are cached per transcript
+and that map-reduce votes across chunks. Uses a recording stand-in for the
+OpenAI client, so no API key is needed.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from voice.main import TargetSpeakerIdentifier, CHARS_PER_TOKEN
+
+
+class RecordingClient:
+    """Answers every chat completion with a fixed label and records prompts"""
+
+    def __init__(self, answer="B"):
+        self.answer = answer
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages):
+        self.prompts.append(messages[0]["content"])
+        message = SimpleNamespace(content=self.answer)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def make_utterances(count):
+    utterances = []
+    start = 0
+    for i in range(count):
+        text = f"Utterance {i} " + "and then we talked about the project " * (1 + i % 4)
+        utterances.append({"speaker": "AB"[i % 2], "text": text, "start": start, "end": start + 2500})
+        start += 3000
+    return utterances
+
+
+def make_identifier(answer="B", token_budget=1000):
+    identifier = TargetSpeakerIdentifier(token_budget=token_budget, cache_path=None)
+    identifier.client = RecordingClient(answer)
+    return identifier
+
+
+def test_prompt_size_is_bounded():
+    """Prompt size should not grow with transcript length"""
+    sizes = []
+    for count in (50, 5000):
+        identifier = make_identifier()
+        assert identifier.identify_target_speaker(make_utterances(count), "The host") == "B"
+        sizes.append(len(identifier.client.prompts[0]))
+
+    budget_chars = 1000 * CHARS_PER_TOKEN
+    assert max(sizes) < budget_chars + 2000, sizes
+    print(f"✅ Prompt sizes for 50 and 5000 utterances: {sizes}")
+
+
+def test_results_are_cached():
+    identifier = make_identifier()
+    utterances = make_utterances(200)
+    identifier.identify_target_speaker(utterances, "The host")
+    identifier.identify_target_speaker(utterances, "The host")
+    assert len(identifier.client.prompts) == 1
+    print("✅ Second identification served from cache")
+
+
+def test_map_reduce_vote():
+    identifier = make_identifier(answer="Speaker A")
+    result = identifier.identify_target_speaker(make_utterances(400), "The guest", strategy="map_reduce")
+    assert result == "A", result
+    assert 1 < len(identifier.client.prompts) <= 4, len(identifier.client.prompts)
+    print(f"✅ Map-reduce voted 'A' over {len(identifier.client.prompts)} chunks")
+
+
+def main():
+    print("🧪 Speaker Identification Test")
+    print("=" * 40)
+    test_prompt_size_is_bounded()
+    test_results_are_cached()
+    test_map_reduce_vote()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test Sprite Pipeline Engine
+Checks the shared validation rules and the engine's inline path: stage
+subsets, skip_stages bookkeeping, pre-numbered candidates and the output
+settings used by the API server and the Gradio app, and that prepare()
+admits unchanged images of an incremental run with their old numbers.
+"""
+
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from character_image_pipeline import SpritePipeline, validate_detections, ANALYSIS_FIELDS, TARGET_WIDTH, TARGET_HEIGHT
+from image_index import ImageIndex
+from stage_pipeline import StageRejected
+
+
+def detections(*faces):
+    return {
+        'person_count': len(faces),
+        'person_details': list(faces),
+        'faces': list(faces),
+        'body_parts': []
+    }
+
+
+def face(confidence=0.9, size_ratio=0.1):
+    return {'bbox': [10, 10, 60, 60], 'confidence': confidence, 'size_ratio': size_ratio, 'width': 50.0, 'height': 50.0}
+
+
+def test_validate_detections():
+    """One face scores; none, several or a tiny one is rejected"""
+    valid = validate_detections(detections(face()))
+    assert valid['is_valid'] and valid['score'] == 100
+
+    assert validate_detections(detections())['issues'] == ["No people detected"]
+    assert validate_detections(detections(face(), face()))['issues'] == ["Multiple faces detected: 2"]
+    assert validate_detections(detections(face(size_ratio=0.005)))['issues'] == ["Face too small in image"]
+    assert validate_detections(None, False, "Image too blurry")['issues'] == ["Quality: Image too blurry"]
+    print("✅ Shared validation rules")
+
+
+def test_process_stage_subset():
+    """Inline stages reject like the streaming ones and record skip_stages"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        small = os.path.join(work_dir, "small.jpg")
+        cv2.imwrite(small, np.zeros((100, 100, 3), dtype=np.uint8))
+        engine = SpritePipeline()
+        try:
+            engine.process({'index': 0, 'key': small, 'path': small}, stages=("download", "probe"))
+        except StageRejected as e:
+            assert str(e).startswith("Quality: Resolution too low")
+        else:
+            raise AssertionError("a 100px image should be rejected at probe")
+
+        large = os.path.join(work_dir, "large.jpg")
+        cv2.imwrite(large, np.zeros((900, 600, 3), dtype=np.uint8))
+        candidate = engine.process({'index': 1, 'key': large, 'path': large}, stages=("download", "probe"))
+        assert candidate['skip_stages'] == ["download", "probe"]
+        assert (candidate['width'], candidate['height']) == (600, 900)
+        print("✅ Stage subsets run inline")
+
+
+def test_numbered_candidates_and_output_settings():
+    """Pre-numbered candidates keep their number; crop honours the output settings"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = os.path.join(work_dir, "source.jpg")
+        cv2.imwrite(source, np.full((1200, 800, 3), 128, dtype=np.uint8))
+        engine = SpritePipeline(output_dir=work_dir, sprite_name="single_{number:02d}.jpg")
+
+        candidate = {'index': 0, 'key': source, 'path': source, 'processed_input': source, 'sprite_number': 3}
+        candidate = engine.process(candidate, stages=("plan", "crop"))
+        assert candidate['sprite_number'] == 3
+        assert candidate['output'] == os.path.join(work_dir, "single_03.jpg")
+        height, width = cv2.imread(candidate['output']).shape[:2]
+        assert (width, height) == (TARGET_WIDTH, TARGET_HEIGHT)
+        print("✅ Pre-numbered candidates and output settings")
+
+
+def test_prepare_admits_unchanged_images_first():
+    """Unchanged images take their old slots and numbers before new images are analyzed"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = []
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            paths.append(os.path.join(work_dir, name))
+            cv2.imwrite(paths[-1], np.zeros((900, 600, 3), dtype=np.uint8))
+
+        index = ImageIndex.for_directory(work_dir)
+        for path, number in ((paths[1], 2), (paths[2], 1)):
+            index.record(path, "detect", data={field: None for field in ANALYSIS_FIELDS})
+            index.record(path, "plan", data={"sprite_number": number})
+
+        engine = SpritePipeline(max_sprites=2, index=index)
+        pending = engine.prepare([{'index': i, 'key': path, 'path': path} for i, path in enumerate(paths)])
+        admitted = {os.path.basename(candidate['path']): candidate['sprite_number']
+                    for candidate in pending if 'plan' in candidate.get('skip_stages', ())}
+        assert admitted == {"b.jpg": 2, "c.jpg": 1}, admitted
+        new_image = next(candidate for candidate in pending if candidate['path'] == paths[0])
+        assert engine.plan_candidate.is_full(new_image)
+        print("✅ Unchanged images are admitted first and keep their sprite numbers")
+
+
+def main():
+    print("🧪 Sprite Pipeline Test")
+    print("=" * 40)
+    test_validate_detections()
+    test_process_stage_subset()
+    test_numbered_candidates_and_output_settings()
+    test_prepare_admits_unchanged_images_first()
+
+
+if __name__ == "__main__":
+    main()
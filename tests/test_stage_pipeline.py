@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test Streaming Stage Pipeline
+Checks that items stream through the stages independently (first result
+after about one item's latency), rejections are reported, and cancellation
+or an early-exiting consumer stops the workers.
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cancellation import CancellationToken
+from stage_pipeline import Stage, StagePipeline, StageRejected
+
+
+def sleeping_stage(seconds):
+    def run(item):
+        time.sleep(seconds)
+        return item
+    return run
+
+
+def reject_odd(item):
+    if item["index"] % 2:
+        raise StageRejected("odd index")
+    return item
+
+
+def test_time_to_first_result():
+    """The first item should finish long before the whole batch"""
+    stages = [
+        Stage("download", sleeping_stage(0.1), workers=4),
+        Stage("detect", sleeping_stage(0.1), workers=1),
+        Stage("outpaint", sleeping_stage(0.3), workers=3),
+    ]
+    start = time.perf_counter()
+    first = None
+    results = []
+    for item in StagePipeline(stages).run({"index": i} for i in range(8)):
+        if first is None:
+            first = time.perf_counter() - start
+        results.append(item)
+    total = time.perf_counter() - start
+
+    assert len(results) == 8 and all(item["status"] == "completed" for item in results)
+    assert set(results[0]["timings"]) == {"download", "detect", "outpaint"}
+    # One item's latency is 0.5s; phase-by-phase processing would need 0.2 + 0.8 + 0.9
+    assert first < 0.8, first
+    assert total < 1.9, total
+    print(f"✅ First result after {first:.2f}s, all 8 after {total:.2f}s")
+
+
+def test_rejections_reported():
+    """Rejected items leave the pipeline with their stage and reason"""
+    stages = [Stage("probe", reject_odd, workers=2), Stage("crop", sleeping_stage(0.01))]
+    results = list(StagePipeline(stages).run({"index": i} for i in range(6)))
+
+    rejected = [item for item in results if item["status"] == "rejected"]
+    assert len(results) == 6 and len(rejected) == 3
+    assert all(item["rejected_stage"] == "probe" and item["reason"] == "odd index" for item in rejected)
+    print("✅ Rejected items reported with stage and reason")
+
+
+def test_stage_errors_do_not_stop_pipeline():
+    def explode(item):
+        if item["index"] == 2:
+            raise RuntimeError("decoder crashed")
+        return item
+
+    results = list(StagePipeline([Stage("decode", explode, workers=2)]).run({"index": i} for i in range(4)))
+    errors = [item for item in results if item["status"] == "rejected"]
+    assert len(results) == 4 and len(errors) == 1
+    assert errors[0]["reason"] == "RuntimeError: decoder crashed"
+    print("✅ Stage exceptions reject only their item")
+
+
+def test_cancellation():
+    """Cancelling the token stops feeding and rejects in-flight items"""
+    token = CancellationToken()
+    stages = [Stage("outpaint", sleeping_stage(0.2), workers=2), Stage("crop", sleeping_stage(0.01))]
+    threading.Timer(0.3, token.cancel).start()
+
+    start = time.perf_counter()
+    results = list(StagePipeline(stages, cancel_token=token).run({"index": i} for i in range(50)))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 2.0, elapsed
+    assert any(item["status"] == "rejected" and item["reason"] == "cancelled" for item in results)
+    assert len(results) < 50
+    print(f"✅ Cancelled after {elapsed:.2f}s with {len(results)} of 50 items started")
+
+
+def test_consumer_stops_early():
+    """Closing the generator early must not leave workers blocked"""
+    threads_before = threading.active_count()
+    stages = [Stage("download", sleeping_stage(0.01), workers=4), Stage("crop", sleeping_stage(0.01), workers=2)]
+    results = StagePipeline(stages, queue_size=1).run({"index": i} for i in range(100))
+    next(results)
+    results.close()
+
+    deadline = time.time() + 2
+    while threading.active_count() > threads_before and time.time() < deadline:
+        time.sleep(0.05)
+    assert threading.active_count() <= threads_before, threading.active_count()
+    print("✅ Workers exit when the consumer stops early")
+
+
+def main():
+    print("🧪 Streaming Stage Pipeline Test")
+    print("=" * 40)
+    test_time_to_first_result()
+    test_rejections_reported()
+    test_stage_errors_do_not_stop_pipeline()
+    test_cancellation()
+    test_consumer_stops_early()
+
+
+if __name__ == "__main__":
+    main()
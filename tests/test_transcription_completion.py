@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test Transcription Completion (polling backoff, webhook mode, transcript cache)
+Runs AssemblyAITranscriber against the local fake AssemblyAI server.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fake_assemblyai_server import FakeAssemblyAIServer
+from voice.main import AssemblyAITranscriber, TranscriptionWebhookReceiver, TranscriptCache
+
+
+def test_polling_backoff():
+    """Polling should complete with only a handful of requests"""
+    server = FakeAssemblyAIServer(processing_time=5.0).start()
+    try:
+        transcriber = AssemblyAITranscriber("test-key", base_url=server.base_url)
+        transcript_id = transcriber.start_transcription("http://example.com/audio.ogg")
+
+        start = time.time()
+        result = transcriber.poll_transcription(transcript_id, max_wait_time=30, audio_duration=20)
+        elapsed = time.time() - start
+
+        assert result["status"] == "completed"
+        assert len(result["utterances"]) == 4
+        assert server.request_counts["poll"] <= 3, server.request_counts
+        print(f"✅ Polling completed in {elapsed:.1f}s with {server.request_counts['poll']} polls")
+    finally:
+        server.stop()
+
+
+def test_webhook_completion():
+    """Webhook mode should fetch the transcript exactly once"""
+    server = FakeAssemblyAIServer(processing_time=1.0).start()
+    receiver = TranscriptionWebhookReceiver(host="127.0.0.1", port=0).start()
+    try:
+        transcriber = AssemblyAITranscriber("test-key", base_url=server.base_url, webhook_receiver=receiver)
+        result = transcriber.transcribe_url("http://example.com/audio.ogg", max_wait_time=10)
+
+        assert result["status"] == "completed"
+        assert server.request_counts["poll"] == 1, server.request_counts
+        print(f"✅ Webhook completion with {server.request_counts['poll']} transcript fetch")
+    finally:
+        receiver.stop()
+        server.stop()
+
+
+def test_transcript_cache():
+    """A second transcription of the same media should not reach the API"""
+    server = FakeAssemblyAIServer(processing_time=0.5).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            media_path = os.path.join(work_dir, "clip.bin")
+            with open(media_path, "wb") as f:
+                f.write(os.urandom(4096))
+
+            cache = TranscriptCache(os.path.join(work_dir, "cache"))
+            transcriber = AssemblyAITranscriber("test-key", base_url=server.base_url, transcript_cache=cache)
+            first = transcriber.transcribe_file(media_path, max_wait_time=10, audio_only=False)
+            second = transcriber.transcribe_file(media_path, max_wait_time=10, audio_only=False)
+
+            assert second["utterances"] == first["utterances"]
+            assert server.request_counts["submit"] == 1, server.request_counts
+
+            # A different speech model is a different cache entry
+            transcriber.transcribe_file(media_path, speech_model="best", max_wait_time=10, audio_only=False)
+            assert server.request_counts["submit"] == 2, server.request_counts
+            print("✅ Cached transcript reused for identical media and options")
+    finally:
+        server.stop()
+
+
+def main():
+    print("🧪 Transcription Completion Test")
+    print("=" * 40)
+    test_polling_backoff()
+    test_webhook_completion()
+    test_transcript_cache()
+
+
+if __name__ == "__main__":
+    main()
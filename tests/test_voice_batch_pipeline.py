@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test Voice Batch Pipeline
+Runs several synthetic videos through VoiceBatchPipeline against the local
+fake AssemblyAI server and checks that stages overlap across videos.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fake_assemblyai_server import FakeAssemblyAIServer
+from voice.main import AssemblyAITranscriber, VideoSegmentExtractor, VoiceBatchPipeline
+
+
+class KeywordSpeakerIdentifier:
+    """Offline stand-in for TargetSpeakerIdentifier: always picks speaker A"""
+
+    def identify_target_speaker(self, utterances, target_speaker_description):
+        return "A"
+
+    def filter_target_speaker_segments(self, utterances, target_speaker):
+        return [u for u in utterances if u.get("speaker") == target_speaker]
+
+
+def make_video(path, duration=12):
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate=15:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", path
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def test_batch_pipeline(video_count=4):
+    """All videos should complete, faster than running them one by one"""
+    processing_time = 2.0
+    server = FakeAssemblyAIServer(processing_time=processing_time).start()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            sources = []
+            for i in range(video_count):
+                path = os.path.join(work_dir, f"video_{i}.mp4")
+                make_video(path)
+                sources.append(path)
+
+            events = []
+            pipeline = VoiceBatchPipeline(
+                AssemblyAITranscriber("test-key", base_url=server.base_url),
+                KeywordSpeakerIdentifier(),
+                VideoSegmentExtractor(),
+                progress_callback=lambda source, stage, status, details: events.append((source, stage, status)),
+                combined_speed="fast",
+                output_dir=os.path.join(work_dir, "out"),
+            )
+
+            start = time.time()
+            results = pipeline.run(sources, "Speaker A")
+            elapsed = time.time() - start
+
+            for result in results:
+                assert result["status"] == "completed", result
+                assert os.path.exists(result["output"]), result
+            assert [r["source"] for r in results] == sources
+            assert elapsed < video_count * processing_time, f"{elapsed:.1f}s is not pipelined"
+            assert {stage for _, stage, _ in events} >= set(VoiceBatchPipeline.STAGES)
+            print(f"✅ {video_count} videos processed in {elapsed:.1f}s with {len(events)} progress events")
+    finally:
+        server.stop()
+
+
+def main():
+    print("🧪 Voice Batch Pipeline Test")
+    print("=" * 40)
+    test_batch_pipeline()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test Voice Dataset Export
+Exports clips from a synthetic stereo video and checks the WAV format,
+clip durations and manifest.jsonl rows. Needs FFmpeg.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import wave
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from voice.main import VideoSegmentExtractor
+
+
+def make_video(path, duration=20):
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate=15:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=300:duration={duration},volume=0.1",
+        "-ac", "2", "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", path
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def test_dataset_export(sample_rate=16000):
+    with tempfile.TemporaryDirectory() as work_dir:
+        video_path = os.path.join(work_dir, "source.mp4")
+        make_video(video_path)
+        segments = [
+            {"speaker": "A", "start": i * 1500, "end": i * 1500 + 1200, "text": f"line {i}"}
+            for i in range(10)
+        ]
+
+        output_dir = os.path.join(work_dir, "dataset")
+        manifest = VideoSegmentExtractor().export_voice_dataset(
+            segments, video_path, output_dir, sample_rate=sample_rate
+        )
+        assert len(manifest) == len(segments)
+
+        with open(os.path.join(output_dir, "manifest.jsonl"), encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert rows == manifest
+        assert rows[3]["text"] == "line 3" and rows[3]["start"] == 4.5
+
+        for row in rows:
+            with wave.open(os.path.join(output_dir, row["audio_filepath"])) as clip:
+                assert clip.getnchannels() == 1
+                assert clip.getframerate() == sample_rate
+                clip_seconds = clip.getnframes() / sample_rate
+                assert abs(clip_seconds - row["duration"]) < 0.05, (clip_seconds, row)
+        print(f"✅ Exported {len(rows)} mono {sample_rate} Hz clips with manifest")
+
+
+def main():
+    print("🧪 Voice Dataset Export Test")
+    print("=" * 40)
+    test_dataset_export()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test Voice Segment Extraction
+Cuts individual segments from a synthetic video: batches of segments are
+written by one multi-output FFmpeg process each, and batches whose FFmpeg
+call fails are retried one segment per process. Needs FFmpeg.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import voice.main as voice_main
+from voice.main import VideoSegmentExtractor
+
+
+def make_video(path, duration=12):
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=320x240:rate=15:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=300:duration={duration},volume=0.1",
+        "-g", "15", "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", path
+    ]
+    subprocess.run(cmd, check=True)
+
+
+class CountingRun:
+    """Wraps subprocess.run to count FFmpeg calls, optionally failing multi-input ones"""
+
+    def __init__(self, fail_batches=False):
+        self.fail_batches = fail_batches
+        self.calls = []
+        self._run = subprocess.run
+
+    def __call__(self, cmd, *args, **kwargs):
+        inputs = cmd.count("-i")
+        if inputs:  # not the ffmpeg -version availability check
+            self.calls.append(inputs)
+        if self.fail_batches and inputs > 1:
+            raise subprocess.CalledProcessError(1, cmd, stderr="simulated batch failure")
+        return self._run(cmd, *args, **kwargs)
+
+
+def extract(work_dir, video_path, segments, runner, segments_per_pass):
+    output_dir = os.path.join(work_dir, "segments")
+    saved = voice_main.subprocess.run
+    voice_main.subprocess.run = runner
+    try:
+        assert VideoSegmentExtractor().extract_individual_segments(
+            segments, video_path, output_dir, segments_per_pass=segments_per_pass, max_workers=2
+        )
+    finally:
+        voice_main.subprocess.run = saved
+    return sorted(os.listdir(output_dir)), output_dir
+
+
+def test_multi_output_batches():
+    """10 segments with 4 per pass need 3 FFmpeg processes"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        video_path = os.path.join(work_dir, "source.mp4")
+        make_video(video_path)
+        segments = [{"speaker": "A", "start": i * 1000, "end": i * 1000 + 800} for i in range(10)]
+
+        runner = CountingRun()
+        files, output_dir = extract(work_dir, video_path, segments, runner, segments_per_pass=4)
+        assert runner.calls == [4, 4, 2], runner.calls
+        assert len(files) == 10 and files[0].startswith("segment_001_")
+        assert all(os.path.getsize(os.path.join(output_dir, name)) > 0 for name in files)
+        print("✅ Segments written in batches by one FFmpeg process each")
+
+
+def test_failed_batches_fall_back_per_segment():
+    with tempfile.TemporaryDirectory() as work_dir:
+        video_path = os.path.join(work_dir, "source.mp4")
+        make_video(video_path)
+        segments = [{"speaker": "A", "start": i * 1000, "end": i * 1000 + 800} for i in range(5)]
+
+        runner = CountingRun(fail_batches=True)
+        files, output_dir = extract(work_dir, video_path, segments, runner, segments_per_pass=64)
+        assert runner.calls == [5] + [1] * 5, runner.calls
+        assert len(files) == 5
+        assert all(os.path.getsize(os.path.join(output_dir, name)) > 0 for name in files)
+        print("✅ A failed batch is retried one segment per process")
+
+
+def main():
+    print("🧪 Voice Segment Extraction Test")
+    print("=" * 40)
+    test_multi_output_batches()
+    test_failed_batches_fall_back_per_segment()
+
+
+if __name__ == "__main__":
+    main()
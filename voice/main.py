@@ -11,8 +11,18 @@ import time
 import os
 import sys
 import subprocess
+import shutil
+import tempfile
 import json
+import bisect
+import hashlib
+import importlib.util
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
 
@@ -20,13 +30,215 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-class AssemblyAITranscriber:
-    def __init__(self, api_key):
-        """Initialize the transcriber with API key."""
-        self.base_url = "https://api.assemblyai.com"
+# ffmpeg output options for the audio-only upload stream
+AUDIO_UPLOAD_FORMATS = {
+    "opus": ['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip', '-f', 'ogg'],
+    "flac": ['-c:a', 'flac', '-f', 'flac'],
+}
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# Transcript polling: first poll is scheduled from the audio duration, then
+# the interval grows by POLL_BACKOFF_FACTOR up to POLL_MAX_INTERVAL
+POLL_MIN_INTERVAL = 3
+POLL_MAX_INTERVAL = 30
+POLL_BACKOFF_FACTOR = 1.5
+EXPECTED_PROCESSING_RATIO = 0.15  # processing time / audio duration
+
+# Completed transcripts are stored here, keyed by audio content + options
+TRANSCRIPT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcript_cache")
+
+# Speaker identification prompt size (estimated at CHARS_PER_TOKEN) and cache
+SPEAKER_ID_TOKEN_BUDGET = 2000
+SPEAKER_ID_MAX_LINE_CHARS = 300
+SPEAKER_ID_MAX_CHUNKS = 4
+CHARS_PER_TOKEN = 4
+SPEAKER_ID_CACHE_PATH = os.path.join(TRANSCRIPT_CACHE_DIR, "speaker_identification.json")
+
+# SegmentPlanner defaults (milliseconds)
+SEGMENT_MAX_GAP_MS = 700          # merge target utterances closer than this
+SEGMENT_MIN_DURATION_MS = 1000    # drop cuts shorter than this after merging
+SEGMENT_PADDING_MS = 150          # context added on both sides of every cut
+SEGMENT_MAX_DURATION_MS = 30000   # never merge beyond this length
+
+# Voice dataset export: audio codec per clip format and EBU R128 loudness target
+DATASET_AUDIO_CODECS = {
+    "wav": ['-c:a', 'pcm_s16le'],
+    "flac": ['-c:a', 'flac'],
+}
+DATASET_SAMPLE_RATES = (16000, 24000)
+DATASET_LOUDNORM = "loudnorm=I=-23:LRA=7:TP=-2"
+
+# Local (offline) transcription: faster-whisper on CPU plus a spectral diarizer
+LOCAL_WHISPER_MODEL = "small"
+LOCAL_SAMPLE_RATE = 16000
+LOCAL_MAX_DURATION_SECONDS = 600  # "auto" backend transcribes shorter media locally
+DIARIZATION_MAX_SPEAKERS = 4
+DIARIZATION_MIN_SILHOUETTE = 0.15  # below this, everything is one speaker
+DIARIZATION_MIN_SEPARATION = 0.5   # min mean log-mel gap (~2 dB) between speaker centroids
+
+# Concurrency limits per stage of VoiceBatchPipeline
+BATCH_STAGE_LIMITS = {
+    "upload": 3,       # bandwidth bound
+    "transcribe": 16,  # mostly waiting on AssemblyAI
+    "identify": 4,     # LLM requests
+    "extract": 2,      # FFmpeg, CPU bound
+}
+
+
+class TranscriptionWebhookReceiver:
+    """Local HTTP endpoint for AssemblyAI completion webhooks.
+    
+    AssemblyAI POSTs {"transcript_id": ..., "status": ...} to the
+    webhook_url given at submission. Each callback resolves the Future
+    returned by expect(transcript_id), so waiting transcriptions cost no
+    polling requests at all. public_url must be reachable by AssemblyAI
+    (e.g. a tunnel in front of host:port).
+    """
+    
+    def __init__(self, host="0.0.0.0", port=8765, public_url=None, path="/assemblyai/webhook"):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.public_url = public_url
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+    
+    @property
+    def webhook_url(self):
+        if self.public_url:
+            return self.public_url
+        host = "127.0.0.1" if self.host in ("0.0.0.0", "") else self.host
+        return f"http://{host}:{self.port}{self.path}"
+    
+    def start(self):
+        """Start serving callbacks on a background thread."""
+        receiver = self
+        
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split('?')[0] != receiver.path:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self.send_response(400)
+                    self.end_headers()
+                    return
+                
+                transcript_id = payload.get('transcript_id')
+                if transcript_id:
+                    receiver._resolve(transcript_id, payload)
+                
+                self.send_response(200)
+                self.end_headers()
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer((self.host, self.port), WebhookHandler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"Webhook receiver listening on {self.webhook_url}")
+        return self
+    
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+    
+    def _future_for(self, transcript_id):
+        with self._lock:
+            if transcript_id not in self._futures:
+                self._futures[transcript_id] = Future()
+            return self._futures[transcript_id]
+    
+    def _resolve(self, transcript_id, payload):
+        future = self._future_for(transcript_id)
+        with self._lock:
+            if not future.done():
+                future.set_result(payload)
+    
+    def expect(self, transcript_id):
+        """Future resolved with the callback payload for transcript_id."""
+        return self._future_for(transcript_id)
+    
+    def forget(self, transcript_id):
+        with self._lock:
+            self._futures.pop(transcript_id, None)
+
+
+class TranscriptionBackend(ABC):
+    """Interface shared by the transcription backends.
+    
+    Every backend returns an AssemblyAI-shaped result: "status", "text",
+    "audio_duration" and "utterances" (speaker, text, start/end in ms,
+    confidence). Pipelines call lookup_cached -> upload_media ->
+    transcribe_uploaded so upload and transcription can be scheduled as
+    separate stages; transcribe_file and transcribe_url do it in one call.
+    """
+    
+    transcript_cache = None
+    
+    def cache_model_name(self, speech_model):
+        """Model identifier used in transcript cache keys."""
+        return speech_model
+    
+    def lookup_cached(self, file_path, speech_model="universal"):
+        """Return (cache_key, cached_result); both None without a cache."""
+        if self.transcript_cache is None:
+            return None, None
+        cache_key = self.transcript_cache.key_for(file_path, self.cache_model_name(speech_model), speaker_labels=True)
+        return cache_key, self.transcript_cache.get(cache_key)
+    
+    @abstractmethod
+    def upload_media(self, file_path, audio_only=True, audio_format="opus"):
+        """Make file_path available to the backend and return its URL."""
+    
+    @abstractmethod
+    def transcribe_uploaded(self, audio_url, file_path, speech_model="universal", max_wait_time=300,
+                            cache_key=None):
+        """Transcribe media returned by upload_media, storing it under cache_key."""
+    
+    @abstractmethod
+    def transcribe_file(self, file_path, speech_model="universal", max_wait_time=300, audio_only=True,
+                        audio_format="opus"):
+        """Transcribe a local file, using the transcript cache if set."""
+    
+    @abstractmethod
+    def transcribe_url(self, audio_url, speech_model="universal", max_wait_time=300):
+        """Transcribe media the backend can fetch from audio_url."""
+
+
+class AssemblyAITranscriber(TranscriptionBackend):
+    def __init__(self, api_key, base_url="https://api.assemblyai.com", webhook_receiver=None,
+                 transcript_cache=None):
+        """Initialize the transcriber with API key.
+        
+        All requests share one pooled requests.Session. With a started
+        TranscriptionWebhookReceiver, completion is signalled by webhook
+        instead of polling. With a TranscriptCache, transcribe_file returns
+        stored results for media it has already transcribed.
+        """
+        self.base_url = base_url
         self.headers = {
-            "authorization": "70702281c18e427f8093e5f5385a3195"
+            "authorization": api_key
         }
+        self.webhook_receiver = webhook_receiver
+        self.transcript_cache = transcript_cache
+        
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
     
     def upload_file(self, file_path):
         """Upload a local file to AssemblyAI and return the upload URL."""
@@ -36,9 +248,8 @@ class AssemblyAITranscriber:
             raise FileNotFoundError(f"File not found: {file_path}")
         
         with open(file_path, "rb") as f:
-            response = requests.post(
+            response = self.session.post(
                 self.base_url + "/v2/upload",
-                headers=self.headers,
                 data=f
             )
         
@@ -49,7 +260,62 @@ class AssemblyAITranscriber:
         print(f"File uploaded successfully. URL: {upload_url}")
         return upload_url
     
-    def start_transcription(self, audio_url, speech_model="universal", speaker_labels=True):
+    def upload_audio_stream(self, file_path, audio_format="opus", sample_rate=16000):
+        """Transcode only the audio track to compact mono audio and stream it to AssemblyAI.
+        
+        FFmpeg writes to a pipe that is uploaded in chunks as it is produced,
+        so the (much larger) video is never uploaded and nothing is written
+        to disk.
+        """
+        if audio_format not in AUDIO_UPLOAD_FORMATS:
+            raise ValueError(f"Unknown audio format: {audio_format} (expected one of {list(AUDIO_UPLOAD_FORMATS)})")
+        
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        print(f"Uploading {audio_format} audio track of: {file_path}")
+        
+        cmd = [
+            'ffmpeg', '-v', 'error', '-i', file_path,
+            '-vn', '-ac', '1', '-ar', str(sample_rate),
+        ] + AUDIO_UPLOAD_FORMATS[audio_format] + ['pipe:1']
+        
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        uploaded_bytes = 0
+        
+        def audio_chunks():
+            nonlocal uploaded_bytes
+            while True:
+                chunk = process.stdout.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                uploaded_bytes += len(chunk)
+                yield chunk
+        
+        try:
+            response = self.session.post(
+                self.base_url + "/v2/upload",
+                data=audio_chunks()
+            )
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read().decode('utf-8', errors='replace')
+            return_code = process.wait()
+        
+        if return_code != 0:
+            raise RuntimeError(f"Audio extraction failed: {stderr.strip()}")
+        
+        if response.status_code != 200:
+            raise RuntimeError(f"Upload failed: {response.status_code} - {response.text}")
+        
+        original_mb = os.path.getsize(file_path) / (1024 * 1024)
+        print(f"Audio uploaded: {uploaded_bytes / (1024 * 1024):.1f} MB (source file: {original_mb:.1f} MB)")
+        
+        upload_url = response.json()["upload_url"]
+        print(f"File uploaded successfully. URL: {upload_url}")
+        return upload_url
+    
+    def start_transcription(self, audio_url, speech_model="universal", speaker_labels=True, webhook_url=None):
         """Start transcription job and return transcript ID."""
         print("Starting transcription...")
         
@@ -58,9 +324,11 @@ class AssemblyAITranscriber:
             "speech_model": speech_model,
             "speaker_labels": speaker_labels
         }
+        if webhook_url:
+            data["webhook_url"] = webhook_url
         
         url = self.base_url + "/v2/transcript"
-        response = requests.post(url, json=data, headers=self.headers)
+        response = self.session.post(url, json=data)
         
         if response.status_code != 200:
             raise RuntimeError(f"Transcription request failed: {response.status_code} - {response.text}")
@@ -69,52 +337,137 @@ class AssemblyAITranscriber:
         print(f"Transcription started. ID: {transcript_id}")
         return transcript_id
     
-    def poll_transcription(self, transcript_id, max_wait_time=300):
-        """Poll for transcription completion and return the result."""
-        polling_endpoint = self.base_url + "/v2/transcript/" + transcript_id
+    def get_transcription(self, transcript_id):
+        """Fetch the current transcript state once."""
+        response = self.session.get(self.base_url + "/v2/transcript/" + transcript_id)
+        
+        if response.status_code != 200:
+            raise RuntimeError(f"Polling failed: {response.status_code} - {response.text}")
+        
+        return response.json()
+    
+    def _check_finished(self, transcription_result):
+        """Return the result if completed, raise on error, None while processing."""
+        status = transcription_result['status']
+        print(f"Status: {status}")
+        
+        if status == 'completed':
+            print("Transcription completed!")
+            return transcription_result
+        
+        elif status == 'error':
+            error_msg = transcription_result.get('error', 'Unknown error')
+            raise RuntimeError(f"Transcription failed: {error_msg}")
+        
+        return None
+    
+    def poll_transcription(self, transcript_id, max_wait_time=300, audio_duration=None):
+        """Poll for transcription completion and return the result.
+        
+        When audio_duration (seconds) is known the first poll is delayed by
+        the expected processing time; after that the interval backs off from
+        POLL_MIN_INTERVAL to POLL_MAX_INTERVAL.
+        """
         start_time = time.time()
         
+        if audio_duration:
+            delay = min(max(audio_duration * EXPECTED_PROCESSING_RATIO, POLL_MIN_INTERVAL), POLL_MAX_INTERVAL * 2)
+        else:
+            delay = POLL_MIN_INTERVAL
+        interval = POLL_MIN_INTERVAL
+        
         print("Polling for transcription completion...")
         
         while True:
-            if time.time() - start_time > max_wait_time:
+            remaining = max_wait_time - (time.time() - start_time)
+            if remaining <= 0:
                 raise RuntimeError("Transcription timeout exceeded")
             
-            response = requests.get(polling_endpoint, headers=self.headers)
-            
-            if response.status_code != 200:
-                raise RuntimeError(f"Polling failed: {response.status_code} - {response.text}")
-            
-            transcription_result = response.json()
-            status = transcription_result['status']
+            print(f"Still processing... waiting {min(delay, remaining):.0f} seconds")
+            time.sleep(min(delay, remaining))
             
-            print(f"Status: {status}")
-            
-            if status == 'completed':
-                print("Transcription completed!")
+            transcription_result = self._check_finished(self.get_transcription(transcript_id))
+            if transcription_result is not None:
                 return transcription_result
             
-            elif status == 'error':
-                error_msg = transcription_result.get('error', 'Unknown error')
-                raise RuntimeError(f"Transcription failed: {error_msg}")
-            
-            else:
-                print("Still processing... waiting 3 seconds")
-                time.sleep(3)
+            delay = interval
+            interval = min(interval * POLL_BACKOFF_FACTOR, POLL_MAX_INTERVAL)
     
-    def transcribe_file(self, file_path, speech_model="universal", max_wait_time=300):
-        """Complete transcription workflow for a local file."""
+    def wait_for_webhook(self, transcript_id, max_wait_time=300):
+        """Wait for the completion webhook, then fetch the transcript once."""
+        print("Waiting for transcription webhook...")
+        future = self.webhook_receiver.expect(transcript_id)
+        
         try:
-            # Upload file
-            audio_url = self.upload_file(file_path)
-            
-            # Start transcription
-            transcript_id = self.start_transcription(audio_url, speech_model)
+            future.result(timeout=max_wait_time)
+        except FutureTimeoutError:
+            # The callback may have been lost; check once before giving up
+            transcription_result = self._check_finished(self.get_transcription(transcript_id))
+            if transcription_result is None:
+                raise RuntimeError("Transcription timeout exceeded")
+            return transcription_result
+        finally:
+            self.webhook_receiver.forget(transcript_id)
+        
+        transcription_result = self._check_finished(self.get_transcription(transcript_id))
+        if transcription_result is None:
+            raise RuntimeError("Webhook received but transcript is not completed")
+        return transcription_result
+    
+    def wait_for_transcription(self, transcript_id, max_wait_time=300, audio_duration=None):
+        """Wait via webhook if a receiver is configured, otherwise poll."""
+        if self.webhook_receiver is not None:
+            return self.wait_for_webhook(transcript_id, max_wait_time)
+        return self.poll_transcription(transcript_id, max_wait_time, audio_duration)
+    
+    def _submit(self, audio_url, speech_model):
+        webhook_url = self.webhook_receiver.webhook_url if self.webhook_receiver is not None else None
+        return self.start_transcription(audio_url, speech_model, webhook_url=webhook_url)
+    
+    def upload_media(self, file_path, audio_only=True, audio_format="opus"):
+        """Upload a local file (audio-only stream if possible) and return the URL."""
+        if audio_only and shutil.which('ffmpeg'):
+            try:
+                return self.upload_audio_stream(file_path, audio_format)
+            except (RuntimeError, requests.RequestException) as e:
+                print(f"Audio-only upload failed ({e}), uploading original file instead")
+        
+        return self.upload_file(file_path)
+    
+    def transcribe_uploaded(self, audio_url, file_path, speech_model="universal", max_wait_time=300,
+                            cache_key=None):
+        """Submit an uploaded file, wait for completion and store the result."""
+        transcript_id = self._submit(audio_url, speech_model)
+        
+        transcription_result = self.wait_for_transcription(
+            transcript_id, max_wait_time, probe_media_duration(file_path)
+        )
+        
+        if cache_key is not None:
+            self.transcript_cache.put(cache_key, transcription_result, source=file_path)
+        
+        return transcription_result
+    
+    def transcribe_file(self, file_path, speech_model="universal", max_wait_time=300, audio_only=True,
+                        audio_format="opus"):
+        """Complete transcription workflow for a local file.
+        
+        With audio_only (default) only a mono audio_format stream is uploaded
+        instead of the whole video; falls back to uploading the original file
+        if FFmpeg is missing or the audio extraction fails.
+        """
+        try:
+            # Reuse a stored transcript of the same audio and options
+            cache_key, cached_result = self.lookup_cached(file_path, speech_model)
+            if cached_result is not None:
+                print(f"Using cached transcript for {file_path} ({cache_key[:12]})")
+                return cached_result
             
-            # Poll for completion
-            transcription_result = self.poll_transcription(transcript_id, max_wait_time)
+            # Upload file
+            audio_url = self.upload_media(file_path, audio_only, audio_format)
             
-            return transcription_result
+            # Start transcription and wait for completion
+            return self.transcribe_uploaded(audio_url, file_path, speech_model, max_wait_time, cache_key)
             
         except Exception as e:
             print(f"Error during transcription: {str(e)}")
@@ -124,10 +477,10 @@ class AssemblyAITranscriber:
         """Complete transcription workflow for a URL."""
         try:
             # Start transcription
-            transcript_id = self.start_transcription(audio_url, speech_model)
+            transcript_id = self._submit(audio_url, speech_model)
             
-            # Poll for completion
-            transcription_result = self.poll_transcription(transcript_id, max_wait_time)
+            # Wait for completion
+            transcription_result = self.wait_for_transcription(transcript_id, max_wait_time)
             
             return transcription_result
             
@@ -136,31 +489,552 @@ class AssemblyAITranscriber:
             raise
 
 
+def probe_media_duration(file_path):
+    """Media duration in seconds via ffprobe, or None if unavailable."""
+    if not shutil.which('ffprobe'):
+        return None
+    
+    cmd = [
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', file_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def media_content_hash(file_path):
+    """SHA-256 of the first audio stream's packets, or of the whole file.
+    
+    The audio packets are hashed with a stream copy (no decoding), so a
+    re-muxed or re-tagged copy of the same recording gets the same hash.
+    Falls back to hashing the file bytes without FFmpeg or audio.
+    """
+    if shutil.which('ffmpeg'):
+        cmd = [
+            'ffmpeg', '-v', 'error', '-i', file_path,
+            '-map', '0:a:0', '-c', 'copy', '-f', 'hash', '-hash', 'sha256', '-'
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode == 0 and result.stdout.startswith('SHA256='):
+            return "audio-" + result.stdout.strip().split('=', 1)[1]
+    
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return "file-" + sha256.hexdigest()
+
+
+class TranscriptCache:
+    """On-disk store of completed transcripts.
+    
+    Entries are keyed by the media content hash plus the speech model and
+    diarization options, and hold the full AssemblyAI result (including
+    utterances) so speaker identification and extraction can be re-run
+    without transcribing again.
+    """
+    
+    def __init__(self, cache_dir=TRANSCRIPT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hashes = {}  # (path, size, mtime) -> content hash
+    
+    def content_hash(self, file_path):
+        stat = os.stat(file_path)
+        signature = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+        if signature not in self._hashes:
+            self._hashes[signature] = media_content_hash(file_path)
+        return self._hashes[signature]
+    
+    def key_for(self, file_path, speech_model="universal", speaker_labels=True):
+        """Cache key for transcribing file_path with the given options."""
+        options = {
+            "content_hash": self.content_hash(file_path),
+            "speech_model": speech_model,
+            "speaker_labels": speaker_labels,
+        }
+        return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def get(self, key):
+        """Stored transcription result for key, or None."""
+        entry_path = self._entry_path(key)
+        if not os.path.exists(entry_path):
+            return None
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                return json.load(f)["result"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable transcript cache entry {entry_path}: {e}")
+            return None
+    
+    def put(self, key, transcription_result, source=None):
+        """Store a completed transcription result under key."""
+        entry = {
+            "key": key,
+            "source": source,
+            "created": time.time(),
+            "result": transcription_result,
+        }
+        entry_path = self._entry_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".part")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, entry_path)
+        return entry_path
+
+
+def load_audio_samples(source, sample_rate=LOCAL_SAMPLE_RATE):
+    """Decode the first audio stream of a file or URL to mono float32 samples."""
+    cmd = [
+        'ffmpeg', '-v', 'error', '-i', source,
+        '-map', '0:a:0', '-ac', '1', '-ar', str(sample_rate), '-f', 'f32le', '-'
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Audio decoding failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+class SpectralDiarizer:
+    """Small CPU diarizer: log-mel statistics per segment + k-means.
+    
+    Each transcript segment is embedded as the mean and standard deviation
+    of its log-mel spectrum over voiced (high-energy) frames. Embeddings
+    are clustered with k-means, choosing the speaker count by silhouette
+    score unless num_speakers is given. Good enough to separate distinct
+    voices in interviews; it does not handle overlapping speech.
+    """
+    
+    def __init__(self, sample_rate=LOCAL_SAMPLE_RATE, n_mels=40, max_speakers=DIARIZATION_MAX_SPEAKERS,
+                 min_silhouette=DIARIZATION_MIN_SILHOUETTE, min_separation=DIARIZATION_MIN_SEPARATION):
+        self.sample_rate = sample_rate
+        self.n_fft = 512
+        self.hop = sample_rate // 100  # 10 ms
+        self.n_mels = n_mels
+        self.max_speakers = max_speakers
+        self.min_silhouette = min_silhouette
+        self.min_separation = min_separation
+        self.window = np.hamming(self.n_fft).astype(np.float32)
+        self.mel_filters = self._mel_filterbank(n_mels)
+    
+    def _mel_filterbank(self, n_mels):
+        def hz_to_mel(hz):
+            return 2595 * np.log10(1 + hz / 700)
+        
+        def mel_to_hz(mel):
+            return 700 * (10 ** (mel / 2595) - 1)
+        
+        mel_points = np.linspace(hz_to_mel(20), hz_to_mel(self.sample_rate / 2), n_mels + 2)
+        bins = np.floor((self.n_fft + 1) * mel_to_hz(mel_points) / self.sample_rate).astype(int)
+        filters = np.zeros((n_mels, self.n_fft // 2 + 1), dtype=np.float32)
+        for m in range(1, n_mels + 1):
+            left, center, right = bins[m - 1], bins[m], bins[m + 1]
+            if center > left:
+                filters[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+            if right > center:
+                filters[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+        return filters
+    
+    def embed(self, samples):
+        """Embedding of one audio span, or None if it is too short."""
+        if len(samples) < self.n_fft:
+            return None
+        frame_count = 1 + (len(samples) - self.n_fft) // self.hop
+        indices = np.arange(self.n_fft)[None, :] + self.hop * np.arange(frame_count)[:, None]
+        power = np.abs(np.fft.rfft(samples[indices] * self.window, axis=1)) ** 2
+        log_mel = np.log(power @ self.mel_filters.T + 1e-10)
+        
+        # Keep voiced frames (drop the quietest 30%), then remove each
+        # frame's level so only the spectral shape is compared
+        energy = log_mel.mean(axis=1)
+        voiced = log_mel[energy >= np.percentile(energy, 30)]
+        voiced = voiced - voiced.mean(axis=1, keepdims=True)
+        return np.concatenate([voiced.mean(axis=0), voiced.std(axis=0)])
+    
+    def _kmeans(self, x, k, restarts=5):
+        """Best of several k-means++ runs by within-cluster distance."""
+        best_labels, best_inertia = None, None
+        for seed in range(restarts):
+            labels = self._kmeans_run(x, k, seed=seed)
+            inertia = sum(((x[labels == j] - x[labels == j].mean(axis=0)) ** 2).sum() for j in set(labels))
+            if best_inertia is None or inertia < best_inertia:
+                best_labels, best_inertia = labels, inertia
+        return best_labels
+    
+    def _kmeans_run(self, x, k, iterations=50, seed=0):
+        rng = np.random.default_rng(seed)
+        centers = [x[rng.integers(len(x))]]
+        for _ in range(1, k):
+            distances = np.min([((x - c) ** 2).sum(axis=1) for c in centers], axis=0)
+            total = distances.sum()
+            probabilities = distances / total if total > 0 else None
+            centers.append(x[rng.choice(len(x), p=probabilities)])
+        centers = np.array(centers)
+        
+        for _ in range(iterations):
+            labels = ((x[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+            new_centers = np.array([
+                x[labels == j].mean(axis=0) if np.any(labels == j) else centers[j] for j in range(k)
+            ])
+            if np.allclose(new_centers, centers):
+                break
+            centers = new_centers
+        return labels
+    
+    def _silhouette(self, x, labels):
+        distances = np.sqrt(((x[:, None, :] - x[None, :, :]) ** 2).sum(axis=2))
+        scores = []
+        for i in range(len(x)):
+            same = labels == labels[i]
+            if same.sum() <= 1:
+                scores.append(0.0)
+                continue
+            a = distances[i, same].sum() / (same.sum() - 1)
+            b = min(distances[i, labels == j].mean() for j in set(labels) if j != labels[i])
+            scores.append((b - a) / max(a, b) if max(a, b) > 0 else 0.0)
+        return float(np.mean(scores))
+    
+    def _separation(self, embeddings, labels):
+        """Smallest mean log-mel difference between two cluster centroids."""
+        centroids = [embeddings[labels == j, :self.n_mels].mean(axis=0) for j in set(labels)]
+        return min(
+            np.abs(centroids[i] - centroids[j]).mean()
+            for i in range(len(centroids)) for j in range(i + 1, len(centroids))
+        )
+    
+    def cluster(self, embeddings, num_speakers=None):
+        """Cluster labels (0..k-1) for a list of embeddings."""
+        embeddings = np.array(embeddings, dtype=np.float64)
+        if len(embeddings) < 2:
+            return np.zeros(len(embeddings), dtype=int)
+        
+        # Center on the recording average, then compare directions (cosine-like)
+        x = embeddings - embeddings.mean(axis=0)
+        x /= np.linalg.norm(x, axis=1, keepdims=True) + 1e-8
+        
+        if num_speakers:
+            return self._kmeans(x, min(num_speakers, len(x)))
+        
+        # More than one speaker only if clusters are both well separated in
+        # spectral shape and internally consistent
+        best_labels, best_score = np.zeros(len(x), dtype=int), self.min_silhouette
+        for k in range(2, min(self.max_speakers, len(x) - 1) + 1):
+            labels = self._kmeans(x, k)
+            if len(set(labels)) < 2 or self._separation(embeddings, labels) < self.min_separation:
+                continue
+            score = self._silhouette(x, labels)
+            if score > best_score:
+                best_labels, best_score = labels, score
+        return best_labels
+    
+    def assign_speakers(self, samples, segments, num_speakers=None):
+        """Speaker letters (A, B, ...) for (start_s, end_s) segments, in first-appearance order."""
+        embeddings, embedded = [], []
+        for i, (start, end) in enumerate(segments):
+            embedding = self.embed(samples[int(start * self.sample_rate):int(end * self.sample_rate)])
+            if embedding is not None:
+                embeddings.append(embedding)
+                embedded.append(i)
+        
+        cluster_labels = self.cluster(embeddings, num_speakers) if embeddings else []
+        labels = [None] * len(segments)
+        letters = {}
+        for i, cluster in zip(embedded, cluster_labels):
+            labels[i] = letters.setdefault(int(cluster), chr(ord('A') + len(letters)))
+        
+        # Segments too short to embed inherit the previous speaker
+        previous = next((label for label in labels if label is not None), "A")
+        for i, label in enumerate(labels):
+            labels[i] = previous = label or previous
+        return labels
+
+
+class LocalWhisperTranscriber(TranscriptionBackend):
+    """Offline backend: faster-whisper (CPU, int8) plus SpectralDiarizer.
+    
+    Nothing is uploaded; media is decoded locally with FFmpeg. The model is
+    loaded lazily on first use (pip install faster-whisper); pass model=
+    to reuse an already loaded WhisperModel.
+    """
+    
+    def __init__(self, model_size=LOCAL_WHISPER_MODEL, device="cpu", compute_type="int8",
+                 diarizer=None, num_speakers=None, transcript_cache=None, model=None):
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.diarizer = diarizer or SpectralDiarizer()
+        self.num_speakers = num_speakers
+        self.transcript_cache = transcript_cache
+        self._model = model
+        self._model_lock = threading.Lock()
+    
+    def cache_model_name(self, speech_model):
+        return f"faster-whisper-{self.model_size}"
+    
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                from faster_whisper import WhisperModel
+                print(f"Loading faster-whisper '{self.model_size}' ({self.device}, {self.compute_type})...")
+                self._model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+            return self._model
+    
+    def transcribe_source(self, source):
+        """Transcribe and diarize a local file or URL."""
+        samples = load_audio_samples(source)
+        audio_duration = len(samples) / LOCAL_SAMPLE_RATE
+        print(f"Transcribing {audio_duration:.0f}s of audio locally...")
+        
+        segments, _ = self.model.transcribe(samples, vad_filter=True)
+        segments = [segment for segment in segments if segment.text.strip()]
+        speakers = self.diarizer.assign_speakers(
+            samples, [(segment.start, segment.end) for segment in segments], self.num_speakers
+        )
+        
+        # Consecutive segments of one speaker form an utterance, as in AssemblyAI
+        utterances = []
+        for segment, speaker in zip(segments, speakers):
+            confidence = float(np.exp(segment.avg_logprob))
+            if utterances and utterances[-1]['speaker'] == speaker:
+                utterance = utterances[-1]
+                utterance['text'] += " " + segment.text.strip()
+                utterance['end'] = int(segment.end * 1000)
+                utterance['confidence'] = min(utterance['confidence'], confidence)
+            else:
+                utterances.append({
+                    'speaker': speaker,
+                    'text': segment.text.strip(),
+                    'start': int(segment.start * 1000),
+                    'end': int(segment.end * 1000),
+                    'confidence': confidence,
+                })
+        
+        print(f"Local transcription completed: {len(utterances)} utterances, "
+              f"{len(set(speakers))} speakers")
+        return {
+            'status': 'completed',
+            'speech_model': self.cache_model_name(None),
+            'audio_duration': audio_duration,
+            'text': " ".join(u['text'] for u in utterances),
+            'utterances': utterances,
+        }
+    
+    def upload_media(self, file_path, audio_only=True, audio_format="opus"):
+        """Nothing to upload; the local path is the "URL"."""
+        return file_path
+    
+    def transcribe_uploaded(self, audio_url, file_path, speech_model="universal", max_wait_time=300,
+                            cache_key=None):
+        transcription_result = self.transcribe_source(file_path)
+        if cache_key is not None:
+            self.transcript_cache.put(cache_key, transcription_result, source=file_path)
+        return transcription_result
+    
+    def transcribe_file(self, file_path, speech_model="universal", max_wait_time=300, audio_only=True,
+                        audio_format="opus"):
+        cache_key, cached_result = self.lookup_cached(file_path, speech_model)
+        if cached_result is not None:
+            print(f"Using cached transcript for {file_path} ({cache_key[:12]})")
+            return cached_result
+        return self.transcribe_uploaded(file_path, file_path, speech_model, max_wait_time, cache_key)
+    
+    def transcribe_url(self, audio_url, speech_model="universal", max_wait_time=300):
+        return self.transcribe_source(audio_url)
+
+
+class AutoTranscriber(TranscriptionBackend):
+    """Routes short media to the local backend and the rest to the cloud.
+    
+    Media up to max_local_duration seconds (by ffprobe) is transcribed
+    locally with no upload; longer media, URLs and media of unknown
+    length go to the cloud backend. Each file is probed once; later
+    calls for the same path reuse the decision.
+    """
+    
+    def __init__(self, local_backend, cloud_backend, max_local_duration=LOCAL_MAX_DURATION_SECONDS):
+        self.local_backend = local_backend
+        self.cloud_backend = cloud_backend
+        self.max_local_duration = max_local_duration
+        self._backends = {}
+        self._backends_lock = threading.Lock()
+    
+    def backend_for(self, file_path):
+        with self._backends_lock:
+            backend = self._backends.get(file_path)
+        if backend is not None:
+            return backend
+        
+        duration = probe_media_duration(file_path)
+        if duration is not None and duration <= self.max_local_duration:
+            backend = self.local_backend
+        else:
+            backend = self.cloud_backend
+        with self._backends_lock:
+            return self._backends.setdefault(file_path, backend)
+    
+    def lookup_cached(self, file_path, speech_model="universal"):
+        return self.backend_for(file_path).lookup_cached(file_path, speech_model)
+    
+    def upload_media(self, file_path, audio_only=True, audio_format="opus"):
+        return self.backend_for(file_path).upload_media(file_path, audio_only, audio_format)
+    
+    def transcribe_uploaded(self, audio_url, file_path, speech_model="universal", max_wait_time=300,
+                            cache_key=None):
+        return self.backend_for(file_path).transcribe_uploaded(
+            audio_url, file_path, speech_model, max_wait_time, cache_key
+        )
+    
+    def transcribe_file(self, file_path, speech_model="universal", max_wait_time=300, audio_only=True,
+                        audio_format="opus"):
+        return self.backend_for(file_path).transcribe_file(
+            file_path, speech_model, max_wait_time, audio_only, audio_format
+        )
+    
+    def transcribe_url(self, audio_url, speech_model="universal", max_wait_time=300):
+        return self.cloud_backend.transcribe_url(audio_url, speech_model, max_wait_time)
+
+
+def create_transcriber(backend=None, api_key=None, transcript_cache=None,
+                       local_model=LOCAL_WHISPER_MODEL, max_local_duration=LOCAL_MAX_DURATION_SECONDS):
+    """Build a transcription backend: "assemblyai", "local" or "auto".
+    
+    backend defaults to the VOICE_TRANSCRIPTION_BACKEND environment
+    variable, falling back to "assemblyai"; api_key defaults to
+    ASSEMBLYAI_API_KEY. "auto" uses the local backend for short media
+    only if faster-whisper is installed.
+    """
+    backend = backend or os.getenv("VOICE_TRANSCRIPTION_BACKEND", "assemblyai")
+    api_key = api_key or os.getenv("ASSEMBLYAI_API_KEY")
+    
+    if backend in ("assemblyai", "auto") and not api_key:
+        raise ValueError(f"The {backend} transcription backend needs ASSEMBLYAI_API_KEY to be set")
+    
+    if backend == "assemblyai":
+        return AssemblyAITranscriber(api_key, transcript_cache=transcript_cache)
+    if backend == "local":
+        return LocalWhisperTranscriber(local_model, transcript_cache=transcript_cache)
+    if backend == "auto":
+        cloud_backend = AssemblyAITranscriber(api_key, transcript_cache=transcript_cache)
+        if importlib.util.find_spec("faster_whisper") is None:
+            print("faster-whisper not installed, using AssemblyAI for all media")
+            return cloud_backend
+        local_backend = LocalWhisperTranscriber(local_model, transcript_cache=transcript_cache)
+        return AutoTranscriber(local_backend, cloud_backend, max_local_duration)
+    
+    raise ValueError(f"Unknown transcription backend: {backend} (expected 'assemblyai', 'local' or 'auto')")
+
+
 class TargetSpeakerIdentifier:
-    def __init__(self):
-        """Initialize the LLM client for speaker identification."""
+    def __init__(self, token_budget=SPEAKER_ID_TOKEN_BUDGET, cache_path=SPEAKER_ID_CACHE_PATH):
+        """Initialize the LLM client for speaker identification.
+        
+        Prompts are built from a per-speaker summary capped at token_budget
+        (estimated) tokens, so cost stays flat as videos get longer. Results
+        are cached per transcript in cache_path (None keeps them in memory).
+        """
         self.client = OpenAI(
             api_key=os.getenv("OPENAI_API_KEY", "your_openai_api_key_here"),
             base_url="https://yunwu.ai/v1",
         )
+        self.token_budget = token_budget
+        self.cache_path = cache_path
+        self._cache_lock = threading.Lock()
+        self._cache = self._load_cache()
     
-    def identify_target_speaker(self, utterances, target_speaker_description):
-        """Use LLM to identify which speaker segments belong to the target speaker."""
-        print(f"Using LLM to identify target speaker: {target_speaker_description}")
+    def _load_cache(self):
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable speaker cache {self.cache_path}: {e}")
+        return {}
+    
+    def _cache_key(self, utterances, target_speaker_description, strategy):
+        """Hash of the diarized transcript plus the request."""
+        sha256 = hashlib.sha256()
+        for utterance in utterances:
+            sha256.update(f"{utterance.get('speaker')}|{utterance.get('start')}|{utterance.get('text')}\n".encode('utf-8'))
+        sha256.update(f"{target_speaker_description}|{strategy}|{self.token_budget}".encode('utf-8'))
+        return sha256.hexdigest()
+    
+    def _store_result(self, key, identified_speaker):
+        with self._cache_lock:
+            self._cache[key] = identified_speaker
+            if not self.cache_path:
+                return
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_path), suffix=".part")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._cache, f)
+            os.replace(tmp_path, self.cache_path)
+    
+    def build_speaker_summary(self, utterances, token_budget=None):
+        """Compact per-speaker view of a transcript within token_budget.
         
-        # Prepare the conversation data for the LLM
-        conversation_text = ""
+        For every speaker: utterance count, talk time, word count, the first
+        and last lines, and as many evenly spaced sample utterances as fit
+        in that speaker's share of the budget.
+        """
+        token_budget = token_budget or self.token_budget
+        by_speaker = {}
         for utterance in utterances:
-            speaker = utterance.get('speaker', 'Unknown')
-            text = utterance.get('text', '')
-            conversation_text += f"Speaker {speaker}: {text}\n"
+            by_speaker.setdefault(utterance.get('speaker', 'Unknown'), []).append(utterance)
+        if not by_speaker:
+            return ""
+        
+        total_talk_ms = sum(max(u.get('end', 0) - u.get('start', 0), 0) for u in utterances) or 1
+        char_budget = token_budget * CHARS_PER_TOKEN // len(by_speaker)
         
-        # Create the prompt for the LLM
+        sections = []
+        for speaker, speaker_utterances in sorted(by_speaker.items()):
+            talk_ms = sum(max(u.get('end', 0) - u.get('start', 0), 0) for u in speaker_utterances)
+            words = sum(len(u.get('text', '').split()) for u in speaker_utterances)
+            lines = [
+                f"Speaker {speaker}: {len(speaker_utterances)} utterances, "
+                f"{talk_ms / 1000:.0f}s talk time ({100 * talk_ms / total_talk_ms:.0f}%), {words} words"
+            ]
+            used = len(lines[0])
+            
+            # First and last lines plus as many evenly spaced samples as fit
+            count = len(speaker_utterances)
+            average_line = sum(
+                min(len(u.get('text', '')), SPEAKER_ID_MAX_LINE_CHARS) + 12 for u in speaker_utterances
+            ) / count
+            sample_count = max(int((char_budget - used) // average_line), 2)
+            if sample_count >= count:
+                picks = range(count)
+            else:
+                picks = sorted({round(i * (count - 1) / (sample_count - 1)) for i in range(sample_count)})
+            
+            for index in picks:
+                text = speaker_utterances[index].get('text', '')
+                if len(text) > SPEAKER_ID_MAX_LINE_CHARS:
+                    text = text[:SPEAKER_ID_MAX_LINE_CHARS] + "..."
+                line = f"  [{speaker_utterances[index].get('start', 0) / 1000:.0f}s] {text}"
+                if used + len(line) > char_budget and index != count - 1:
+                    continue
+                lines.append(line)
+                used += len(line)
+            
+            sections.append("\n".join(lines))
+        
+        return "\n\n".join(sections)
+    
+    def _ask_llm(self, speaker_summary, target_speaker_description, speakers):
+        """Ask the LLM which speaker label matches; returns a label or UNKNOWN."""
         prompt = f"""
-        I have a conversation transcript with multiple speakers. I need you to identify which speaker (A, B, C, etc.) matches my target speaker description.
+        I have a summary of a conversation transcript with multiple speakers: talk-time statistics plus the first, last and sampled lines of each speaker. I need you to identify which speaker (A, B, C, etc.) matches my target speaker description.
 
-        CONVERSATION:
-        {conversation_text}
+        SPEAKER SUMMARY:
+        {speaker_summary}
 
         TARGET SPEAKER DESCRIPTION: {target_speaker_description}
 
@@ -169,16 +1043,76 @@ class TargetSpeakerIdentifier:
         If you cannot determine which speaker matches, respond with "UNKNOWN".
         """
         
+        completion = self.client.chat.completions.create(
+            model="gemini-2.5-flash-nothinking",
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        
+        answer = completion.choices[0].message.content.strip().strip('"\'.')
+        if answer.lower().startswith("speaker "):
+            answer = answer[len("speaker "):]
+        return answer if answer in speakers else "UNKNOWN"
+    
+    def _identify_map_reduce(self, utterances, target_speaker_description, speakers):
+        """Identify the speaker per chunk of the transcript and take a majority vote.
+        
+        At most SPEAKER_ID_MAX_CHUNKS evenly spaced chunks are asked, so the
+        number of LLM calls stays bounded for very long videos.
+        """
+        chunk_count = min(SPEAKER_ID_MAX_CHUNKS, len(utterances))
+        chunk_size = -(-len(utterances) // chunk_count)
+        chunks = [utterances[i:i + chunk_size] for i in range(0, len(utterances), chunk_size)]
+        
+        def vote(chunk):
+            return self._ask_llm(self.build_speaker_summary(chunk), target_speaker_description, speakers)
+        
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            votes = list(executor.map(vote, chunks))
+        
+        print(f"Chunk votes: {votes}")
+        counts = {}
+        for vote in votes:
+            if vote != "UNKNOWN":
+                counts[vote] = counts.get(vote, 0) + 1
+        if not counts:
+            return "UNKNOWN"
+        return max(counts, key=counts.get)
+    
+    def identify_target_speaker(self, utterances, target_speaker_description, strategy="auto"):
+        """Use LLM to identify which speaker segments belong to the target speaker.
+        
+        strategy "summary" sends one budgeted per-speaker summary,
+        "map_reduce" votes over transcript chunks, and "auto" (default)
+        starts with the summary and falls back to map-reduce if it is
+        inconclusive on a transcript larger than the budget.
+        """
+        print(f"Using LLM to identify target speaker: {target_speaker_description}")
+        
+        speakers = {utterance.get('speaker', 'Unknown') for utterance in utterances}
+        cache_key = self._cache_key(utterances, target_speaker_description, strategy)
+        if cache_key in self._cache:
+            identified_speaker = self._cache[cache_key]
+            print(f"Cached target speaker: {identified_speaker}")
+            return identified_speaker
+        
         try:
-            completion = self.client.chat.completions.create(
-                model="gemini-2.5-flash-nothinking",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            if strategy == "map_reduce":
+                identified_speaker = self._identify_map_reduce(utterances, target_speaker_description, speakers)
+            else:
+                identified_speaker = self._ask_llm(
+                    self.build_speaker_summary(utterances), target_speaker_description, speakers
+                )
+                transcript_chars = sum(len(u.get('text', '')) for u in utterances)
+                if (strategy == "auto" and identified_speaker == "UNKNOWN"
+                        and transcript_chars > self.token_budget * CHARS_PER_TOKEN):
+                    print("Summary was inconclusive, voting over transcript chunks")
+                    identified_speaker = self._identify_map_reduce(utterances, target_speaker_description, speakers)
             
-            identified_speaker = completion.choices[0].message.content.strip()
             print(f"LLM identified target speaker as: {identified_speaker}")
+            if identified_speaker != "UNKNOWN":
+                self._store_result(cache_key, identified_speaker)
             return identified_speaker
             
         except Exception as e:
@@ -197,6 +1131,102 @@ class TargetSpeakerIdentifier:
         return target_segments
 
 
+class SegmentPlanner:
+    """Turns target-speaker utterances into an optimized cut list.
+    
+    Adjacent utterances closer than max_gap_ms are merged unless another
+    speaker talks in the gap, cuts shorter than min_duration_ms are
+    dropped, and each cut is padded by padding_ms without running into
+    another speaker's utterance. Planned cuts keep the utterance shape
+    (speaker, start, end, text) so they can be passed to
+    VideoSegmentExtractor unchanged.
+    """
+    
+    def __init__(self, max_gap_ms=SEGMENT_MAX_GAP_MS, min_duration_ms=SEGMENT_MIN_DURATION_MS,
+                 padding_ms=SEGMENT_PADDING_MS, max_duration_ms=SEGMENT_MAX_DURATION_MS):
+        self.max_gap_ms = max_gap_ms
+        self.min_duration_ms = min_duration_ms
+        self.padding_ms = padding_ms
+        self.max_duration_ms = max_duration_ms
+    
+    def plan(self, target_segments, all_utterances=None, media_duration_ms=None):
+        """Return the merged, filtered and padded cut list.
+        
+        all_utterances (the full diarized transcript) makes merging and
+        padding gap-aware; without it only timing is considered.
+        """
+        segments = sorted(
+            (s for s in target_segments if s.get('end', 0) > s.get('start', 0)),
+            key=lambda s: s['start']
+        )
+        if not segments:
+            return []
+        
+        target_speaker = segments[0].get('speaker')
+        others = sorted(
+            (u['start'], u['end']) for u in (all_utterances or [])
+            if u.get('speaker') != target_speaker and u.get('end', 0) > u.get('start', 0)
+        )
+        other_starts = [start for start, _ in others]
+        # Running max of other speakers' end times, indexed like other_starts
+        other_max_ends = []
+        for _, end in others:
+            other_max_ends.append(max(end, other_max_ends[-1]) if other_max_ends else end)
+        
+        def other_speech_between(start, end):
+            count = bisect.bisect_left(other_starts, end)
+            return count > 0 and other_max_ends[count - 1] > start
+        
+        # 1. Merge close utterances with no other speaker in between
+        merged = [self._new_cut(segments[0])]
+        for segment in segments[1:]:
+            cut = merged[-1]
+            gap = segment['start'] - cut['end']
+            if (gap <= self.max_gap_ms
+                    and segment['end'] - cut['start'] <= self.max_duration_ms
+                    and not other_speech_between(cut['end'], segment['start'])):
+                cut['end'] = max(cut['end'], segment['end'])
+                cut['text'] = f"{cut['text']} {segment.get('text', '')}".strip()
+                cut['utterances'] += 1
+            else:
+                merged.append(self._new_cut(segment))
+        
+        # 2. Drop slivers
+        planned = [cut for cut in merged if cut['end'] - cut['start'] >= self.min_duration_ms]
+        
+        # 3. Pad without overlapping other speakers or the previous cut
+        previous_end = 0
+        for cut in planned:
+            start = cut['start'] - self.padding_ms
+            count = bisect.bisect_left(other_starts, cut['start'])
+            if count > 0:
+                start = max(start, min(other_max_ends[count - 1], cut['start']))
+            cut['start'] = max(start, previous_end, 0)
+            
+            end = cut['end'] + self.padding_ms
+            next_other = bisect.bisect_left(other_starts, cut['end'])
+            if next_other < len(other_starts):
+                end = min(end, max(other_starts[next_other], cut['end']))
+            if media_duration_ms is not None:
+                end = min(end, media_duration_ms)
+            cut['end'] = end
+            previous_end = end
+        
+        total_ms = sum(cut['end'] - cut['start'] for cut in planned)
+        print(f"Planned {len(planned)} cuts ({total_ms / 1000:.1f}s) from {len(segments)} utterances "
+              f"({len(merged) - len(planned)} short cuts dropped)")
+        return planned
+    
+    def _new_cut(self, segment):
+        return {
+            'speaker': segment.get('speaker'),
+            'start': segment['start'],
+            'end': segment['end'],
+            'text': segment.get('text', ''),
+            'utterances': 1,
+        }
+
+
 class VideoSegmentExtractor:
     def __init__(self):
         """Initialize the video segment extractor."""
@@ -221,8 +1251,15 @@ class VideoSegmentExtractor:
         secs = seconds % 60
         return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
     
-    def extract_target_speaker_segments(self, target_segments, input_video_path, output_path="target_speaker_segments.mp4"):
-        """Extract video segments where the target speaker is speaking."""
+    def extract_target_speaker_segments(self, target_segments, input_video_path, output_path="target_speaker_segments.mp4",
+                                        mode="exact"):
+        """Extract video segments where the target speaker is speaking.
+        
+        mode="exact" trims every segment frame-accurately in one filter graph
+        and re-encodes (libx264/aac). mode="fast" stream-copies each segment
+        (cuts snap to keyframes) and joins them with the concat demuxer,
+        which avoids re-encoding entirely.
+        """
         if not self.ffmpeg_available:
             print("Cannot extract video segments: FFmpeg not available")
             return False
@@ -231,6 +1268,11 @@ class VideoSegmentExtractor:
             print("No target speaker segments to extract")
             return False
         
+        if mode == "fast":
+            return self._extract_combined_stream_copy(target_segments, input_video_path, output_path)
+        elif mode != "exact":
+            raise ValueError(f"Unknown extraction mode: {mode} (expected 'exact' or 'fast')")
+        
         print(f"Extracting {len(target_segments)} target speaker segments...")
         
         # Create filter complex for FFmpeg
@@ -272,8 +1314,58 @@ class VideoSegmentExtractor:
             print(f"FFmpeg stderr: {e.stderr}")
             return False
     
-    def extract_individual_segments(self, target_segments, input_video_path, output_dir="target_speaker_segments"):
-        """Extract each target speaker segment as a separate file."""
+    def _extract_combined_stream_copy(self, target_segments, input_video_path, output_path):
+        """Cut segments with stream copy and join them via the concat demuxer."""
+        print(f"Extracting {len(target_segments)} target speaker segments (fast, stream copy)...")
+        
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        with tempfile.TemporaryDirectory(dir=output_dir, prefix=".segments_") as temp_dir:
+            segment_files = self._cut_segments(target_segments, input_video_path, temp_dir)
+            segment_files = [path for path in segment_files if os.path.exists(path)]
+            if not segment_files:
+                print("No segments could be cut")
+                return False
+            
+            # Concat demuxer list; single quotes in paths are escaped as '\''
+            list_path = os.path.join(temp_dir, "segments.txt")
+            with open(list_path, 'w', encoding='utf-8') as f:
+                for segment_file in segment_files:
+                    escaped = os.path.abspath(segment_file).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+            
+            cmd = [
+                'ffmpeg', '-f', 'concat', '-safe', '0', '-i', list_path,
+                '-c', 'copy',
+                '-y',  # Overwrite output file
+                output_path
+            ]
+            
+            try:
+                print(f"Joining {len(segment_files)} segments with the concat demuxer...")
+                subprocess.run(cmd, capture_output=True, text=True, check=True)
+                print(f"Successfully extracted target speaker segments to: {output_path}")
+                return True
+            except subprocess.CalledProcessError as e:
+                print(f"FFmpeg error: {e}")
+                print(f"FFmpeg stderr: {e.stderr}")
+                return False
+    
+    def _segment_window(self, segment):
+        """Return (start_seconds, duration_seconds) for an utterance."""
+        start_time = segment.get('start', 0)
+        end_time = segment.get('end', start_time + 1000)
+        return start_time / 1000, max(end_time - start_time, 0) / 1000
+    
+    def extract_individual_segments(self, target_segments, input_video_path, output_dir="target_speaker_segments",
+                                    segments_per_pass=64, max_workers=4):
+        """Extract each target speaker segment as a separate file.
+        
+        Segments are cut with input-side seeking (-ss before -i), so FFmpeg
+        jumps straight to each segment instead of decoding the video from the
+        start. Up to segments_per_pass segments are written by a single FFmpeg
+        process (one seeked input and one output per segment); any batch that
+        fails is retried one segment per process on a worker pool.
+        """
         if not self.ffmpeg_available:
             print("Cannot extract video segments: FFmpeg not available")
             return False
@@ -287,35 +1379,359 @@ class VideoSegmentExtractor:
         
         print(f"Extracting {len(target_segments)} individual segments...")
         
+        self._cut_segments(target_segments, input_video_path, output_dir, segments_per_pass, max_workers)
+        
+        print(f"Individual segments saved to: {output_dir}")
+        return True
+    
+    def _cut_segments(self, target_segments, input_video_path, output_dir, segments_per_pass=64, max_workers=4):
+        """Cut every segment to its own file in output_dir; returns the paths in order."""
+        segment_jobs = []
         for i, segment in enumerate(target_segments):
-            start_time = segment.get('start', 0)
-            end_time = segment.get('end', start_time + 1000)
+            start_formatted = self._format_timestamp(segment.get('start', 0))
+            output_file = os.path.join(output_dir, f"segment_{i+1:03d}_{start_formatted.replace(':', '-')}.mp4")
+            segment_jobs.append((i, segment, output_file))
+        
+        failed_jobs = []
+        for batch_start in range(0, len(segment_jobs), segments_per_pass):
+            batch = segment_jobs[batch_start:batch_start + segments_per_pass]
+            if not self._extract_segments_single_pass(batch, input_video_path, len(target_segments)):
+                failed_jobs.extend(batch)
+        
+        if failed_jobs:
+            print(f"Falling back to per-segment extraction for {len(failed_jobs)} segments...")
+            self._extract_segments_parallel(failed_jobs, input_video_path, len(target_segments), max_workers)
+        
+        return [output_file for _, _, output_file in segment_jobs]
+    
+    def _extract_segments_single_pass(self, segment_jobs, input_video_path, total_segments):
+        """Write a batch of segments with one FFmpeg process."""
+        cmd = ['ffmpeg', '-y']
+        for _, segment, _ in segment_jobs:
+            start_seconds, duration = self._segment_window(segment)
+            cmd += ['-ss', f"{start_seconds:.3f}", '-t', f"{duration:.3f}", '-i', input_video_path]
+        
+        for input_index, (i, segment, output_file) in enumerate(segment_jobs):
+            cmd += [
+                '-map', f'{input_index}:v:0?', '-map', f'{input_index}:a:0?',
+                '-c', 'copy',  # Copy without re-encoding for speed
+                '-avoid_negative_ts', 'make_zero',
+                output_file
+            ]
+        
+        first, last = segment_jobs[0][0] + 1, segment_jobs[-1][0] + 1
+        try:
+            print(f"Extracting segments {first}-{last}/{total_segments} in one FFmpeg pass")
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
+            for _, _, output_file in segment_jobs:
+                print(f"  -> {output_file}")
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"Error extracting segments {first}-{last}: {e}")
+            return False
+    
+    def export_voice_dataset(self, target_segments, input_video_path, output_dir="voice_dataset",
+                             sample_rate=24000, audio_format="wav", normalize=True,
+                             manifest_formats=("jsonl",), segments_per_pass=64, max_workers=4):
+        """Export segments as mono audio clips plus a training manifest.
+        
+        Each clip is decoded from a seeked input, downmixed to mono,
+        loudness-normalized (DATASET_LOUDNORM) and resampled to sample_rate;
+        up to segments_per_pass clips are written by one FFmpeg process with
+        no video decoding or encoding. manifest_formats may contain "jsonl"
+        and "parquet" (needs pandas + pyarrow). Returns the manifest rows.
+        """
+        if not self.ffmpeg_available:
+            print("Cannot export voice dataset: FFmpeg not available")
+            return []
+        
+        if audio_format not in DATASET_AUDIO_CODECS:
+            raise ValueError(f"Unknown audio format: {audio_format} (expected one of {list(DATASET_AUDIO_CODECS)})")
+        if sample_rate not in DATASET_SAMPLE_RATES:
+            raise ValueError(f"Unsupported sample rate: {sample_rate} (expected one of {DATASET_SAMPLE_RATES})")
+        
+        if not target_segments:
+            print("No target speaker segments to export")
+            return []
+        
+        os.makedirs(output_dir, exist_ok=True)
+        print(f"Exporting {len(target_segments)} clips as {sample_rate // 1000} kHz mono {audio_format}...")
+        
+        clip_jobs = [
+            (i, segment, os.path.join(output_dir, f"clip_{i+1:04d}.{audio_format}"))
+            for i, segment in enumerate(target_segments)
+        ]
+        
+        failed_jobs = []
+        for batch_start in range(0, len(clip_jobs), segments_per_pass):
+            batch = clip_jobs[batch_start:batch_start + segments_per_pass]
+            if not self._export_clips_single_pass(batch, input_video_path, sample_rate, audio_format, normalize):
+                failed_jobs.extend(batch)
+        
+        if failed_jobs:
+            print(f"Falling back to per-clip export for {len(failed_jobs)} clips...")
             
-            start_formatted = self._format_timestamp(start_time)
-            end_formatted = self._format_timestamp(end_time)
+            def export_one(clip_job):
+                return self._export_clips_single_pass([clip_job], input_video_path, sample_rate, audio_format, normalize)
             
-            output_file = os.path.join(output_dir, f"segment_{i+1:03d}_{start_formatted.replace(':', '-')}.mp4")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(export_one, failed_jobs))
+        
+        manifest = []
+        for _, segment, output_file in clip_jobs:
+            if not os.path.exists(output_file):
+                continue
+            start_seconds, duration = self._segment_window(segment)
+            manifest.append({
+                "audio_filepath": os.path.basename(output_file),
+                "text": segment.get('text', ''),
+                "start": round(start_seconds, 3),
+                "end": round(start_seconds + duration, 3),
+                "duration": round(duration, 3),
+                "speaker": segment.get('speaker'),
+                "source": os.path.basename(input_video_path),
+                "sample_rate": sample_rate,
+            })
+        
+        self._write_manifest(manifest, output_dir, manifest_formats)
+        print(f"Exported {len(manifest)}/{len(clip_jobs)} clips to: {output_dir}")
+        return manifest
+    
+    def _export_clips_single_pass(self, clip_jobs, input_video_path, sample_rate, audio_format, normalize):
+        """Write a batch of audio clips with one FFmpeg process."""
+        cmd = ['ffmpeg', '-y', '-v', 'error']
+        for _, segment, _ in clip_jobs:
+            start_seconds, duration = self._segment_window(segment)
+            cmd += ['-ss', f"{start_seconds:.3f}", '-t', f"{duration:.3f}", '-i', input_video_path]
+        
+        filters = []
+        for input_index in range(len(clip_jobs)):
+            chain = "aformat=channel_layouts=mono"
+            if normalize:
+                chain += "," + DATASET_LOUDNORM
+            filters.append(f"[{input_index}:a:0]{chain},aresample={sample_rate}[clip{input_index}]")
+        cmd += ['-filter_complex', ";".join(filters)]
+        
+        for input_index, (_, _, output_file) in enumerate(clip_jobs):
+            cmd += ['-map', f'[clip{input_index}]', '-ar', str(sample_rate)]
+            cmd += DATASET_AUDIO_CODECS[audio_format]
+            cmd.append(output_file)
+        
+        first, last = clip_jobs[0][0] + 1, clip_jobs[-1][0] + 1
+        try:
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
+            print(f"  -> clips {first}-{last}")
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"Error exporting clips {first}-{last}: {e.stderr.strip()[-500:]}")
+            return False
+    
+    def _write_manifest(self, manifest, output_dir, manifest_formats):
+        if "jsonl" in manifest_formats:
+            manifest_path = os.path.join(output_dir, "manifest.jsonl")
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                for row in manifest:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            print(f"Manifest saved to: {manifest_path}")
+        
+        if "parquet" in manifest_formats:
+            try:
+                import pandas as pd
+                manifest_path = os.path.join(output_dir, "manifest.parquet")
+                pd.DataFrame(manifest).to_parquet(manifest_path, index=False)
+                print(f"Manifest saved to: {manifest_path}")
+            except ImportError as e:
+                print(f"Skipping Parquet manifest ({e}); install pandas and pyarrow")
+    
+    def _extract_segments_parallel(self, segment_jobs, input_video_path, total_segments, max_workers=4):
+        """Extract segments one FFmpeg process each, running max_workers at a time."""
+        def extract_one(segment_job):
+            i, segment, output_file = segment_job
+            start_seconds, duration = self._segment_window(segment)
             
-            # FFmpeg command for individual segment
+            # FFmpeg command for individual segment (input-side seek)
             cmd = [
-                'ffmpeg', '-i', input_video_path,
-                '-ss', start_formatted,
-                '-to', end_formatted,
+                'ffmpeg', '-ss', f"{start_seconds:.3f}", '-t', f"{duration:.3f}",
+                '-i', input_video_path,
                 '-c', 'copy',  # Copy without re-encoding for speed
+                '-avoid_negative_ts', 'make_zero',
                 '-y',  # Overwrite output file
                 output_file
             ]
             
             try:
-                print(f"Extracting segment {i+1}/{len(target_segments)}: {start_formatted} - {end_formatted}")
+                print(f"Extracting segment {i+1}/{total_segments}")
                 subprocess.run(cmd, capture_output=True, text=True, check=True)
                 print(f"  -> {output_file}")
+                return True
             except subprocess.CalledProcessError as e:
                 print(f"Error extracting segment {i+1}: {e}")
-                continue
+                return False
         
-        print(f"Individual segments saved to: {output_dir}")
-        return True
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(extract_one, segment_jobs))
+
+
+class VoiceBatchPipeline:
+    """Runs the voice flow for many videos with pipelined, bounded stages.
+    
+    Each video moves through upload -> transcribe -> identify -> extract on
+    its own worker thread; a semaphore per stage caps how many videos are
+    in that stage at once (BATCH_STAGE_LIMITS), so one video can be
+    extracting while others upload or wait on AssemblyAI.
+    
+    progress_callback(source, stage, status, details) is called from the
+    worker threads on every stage transition.
+    """
+    
+    STAGES = ("upload", "transcribe", "identify", "extract")
+    
+    def __init__(self, transcriber, speaker_identifier, video_extractor=None, stage_limits=None,
+                 progress_callback=None, speech_model="universal", max_wait_time=300,
+                 extraction_mode="combined", combined_speed="exact", output_dir="batch_output",
+                 segment_planner=None):
+        limits = dict(BATCH_STAGE_LIMITS)
+        limits.update(stage_limits or {})
+        
+        self.transcriber = transcriber
+        self.speaker_identifier = speaker_identifier
+        self.video_extractor = video_extractor
+        self.progress_callback = progress_callback
+        self.speech_model = speech_model
+        self.max_wait_time = max_wait_time
+        self.extraction_mode = extraction_mode
+        self.combined_speed = combined_speed
+        self.output_dir = output_dir
+        self.segment_planner = segment_planner
+        self.stage_limits = limits
+        self._stage_slots = {stage: threading.BoundedSemaphore(limits[stage]) for stage in self.STAGES}
+    
+    def _report(self, source, stage, status, **details):
+        if self.progress_callback is not None:
+            self.progress_callback(source, stage, status, details)
+        else:
+            print(f"[{os.path.basename(source)}] {stage}: {status}")
+    
+    def _run_stage(self, result, stage, func, *args, **kwargs):
+        """Run func inside the stage's concurrency slot and time it."""
+        source = result["source"]
+        self._report(source, stage, "waiting")
+        with self._stage_slots[stage]:
+            self._report(source, stage, "running")
+            start = time.time()
+            value = func(*args, **kwargs)
+            result["timings"][stage] = round(time.time() - start, 2)
+        self._report(source, stage, "done", seconds=result["timings"][stage])
+        return value
+    
+    def _output_path(self, index, source):
+        stem = f"{index:03d}_{Path(source).stem}"
+        if self.extraction_mode in ("individual", "dataset"):
+            return os.path.join(self.output_dir, stem)
+        return os.path.join(self.output_dir, f"{stem}_target_speaker.mp4")
+    
+    def process_video(self, index, source, target_speaker_description, result):
+        """Run one video through all stages, filling in its result dict."""
+        is_url = source.startswith(('http://', 'https://'))
+        
+        # Upload + transcribe (a cached transcript skips both)
+        cache_key = cached_result = None
+        if not is_url:
+            cache_key, cached_result = self.transcriber.lookup_cached(source, self.speech_model)
+        
+        if cached_result is not None:
+            self._report(source, "transcribe", "cached")
+            transcription_result = cached_result
+        elif is_url:
+            transcription_result = self._run_stage(
+                result, "transcribe", self.transcriber.transcribe_url,
+                source, self.speech_model, self.max_wait_time
+            )
+        else:
+            audio_url = self._run_stage(result, "upload", self.transcriber.upload_media, source)
+            transcription_result = self._run_stage(
+                result, "transcribe", self.transcriber.transcribe_uploaded,
+                audio_url, source, self.speech_model, self.max_wait_time, cache_key
+            )
+        
+        utterances = transcription_result.get('utterances', [])
+        if not utterances:
+            result["status"] = "no_utterances"
+            return result
+        
+        # Speaker identification
+        identified_speaker = self._run_stage(
+            result, "identify", self.speaker_identifier.identify_target_speaker,
+            utterances, target_speaker_description
+        )
+        if identified_speaker == "UNKNOWN":
+            result["status"] = "speaker_not_found"
+            return result
+        
+        target_segments = self.speaker_identifier.filter_target_speaker_segments(utterances, identified_speaker)
+        if self.segment_planner is not None:
+            target_segments = self.segment_planner.plan(target_segments, utterances)
+        result["identified_speaker"] = identified_speaker
+        result["segments"] = len(target_segments)
+        
+        # Extraction needs a local file and FFmpeg
+        if not target_segments or is_url or self.video_extractor is None:
+            result["status"] = "transcribed"
+            return result
+        
+        output_path = self._output_path(index, source)
+        if self.extraction_mode == "dataset":
+            manifest = self._run_stage(
+                result, "extract", self.video_extractor.export_voice_dataset,
+                target_segments, source, output_path
+            )
+            success = bool(manifest)
+        elif self.extraction_mode == "individual":
+            success = self._run_stage(
+                result, "extract", self.video_extractor.extract_individual_segments,
+                target_segments, source, output_path
+            )
+        else:
+            success = self._run_stage(
+                result, "extract", self.video_extractor.extract_target_speaker_segments,
+                target_segments, source, output_path, mode=self.combined_speed
+            )
+        
+        result["status"] = "completed" if success else "extraction_failed"
+        result["output"] = output_path if success else None
+        return result
+    
+    def _process_safely(self, index, source, target_speaker_description):
+        result = {
+            "source": source,
+            "status": "failed",
+            "identified_speaker": None,
+            "segments": 0,
+            "output": None,
+            "timings": {},
+            "error": None,
+        }
+        try:
+            self.process_video(index, source, target_speaker_description, result)
+        except Exception as e:
+            result["status"] = "failed"
+            result["error"] = str(e)
+        self._report(source, "finished", result["status"], error=result["error"])
+        return result
+    
+    def run(self, sources, target_speaker_description, max_videos_in_flight=None):
+        """Process all sources; returns results in input order."""
+        if self.video_extractor is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+        
+        # Enough workers to keep every stage busy
+        max_workers = max_videos_in_flight or sum(self.stage_limits[stage] for stage in self.STAGES)
+        with ThreadPoolExecutor(max_workers=min(max_workers, max(len(sources), 1))) as executor:
+            futures = [
+                executor.submit(self._process_safely, index, source, target_speaker_description)
+                for index, source in enumerate(sources)
+            ]
+            return [future.result() for future in futures]
 
 
 def main():
@@ -327,6 +1743,8 @@ def main():
     SAVE_TO_FILE = True               # Set to True to save transcript to file
     OUTPUT_FILE = "transcript.txt"    # Output file name
     MAX_WAIT_TIME = 300              # Maximum wait time in seconds
+    USE_TRANSCRIPT_CACHE = True      # Reuse stored transcripts of the same audio (transcript_cache/)
+    TRANSCRIPTION_BACKEND = "assemblyai"  # Options: "assemblyai" (cloud), "local" (faster-whisper, offline) or "auto" (local for short media)
     
     # TARGET SPEAKER CONFIGURATION
     TARGET_SPEAKER_DESCRIPTION = "Donald Trump"  # Describe your target speaker
@@ -334,13 +1752,54 @@ def main():
     
     # VIDEO EXTRACTION CONFIGURATION
     EXTRACT_VIDEO_SEGMENTS = True    # Set to True to extract video segments
-    EXTRACTION_MODE = "combined"     # Options: "combined" (single file) or "individual" (separate files)
+    EXTRACTION_MODE = "combined"     # Options: "combined" (single file), "individual" (separate files) or "dataset" (audio clips + manifest)
+    COMBINED_EXTRACTION_SPEED = "exact"  # Options: "exact" (frame-accurate re-encode) or "fast" (keyframe-aligned stream copy)
     OUTPUT_VIDEO_FILE = "target_speaker_segments.mp4"  # Output file for combined segments
     OUTPUT_VIDEO_DIR = "target_speaker_segments"      # Directory for individual segments
+    PLAN_SEGMENTS = True             # Merge close utterances, drop slivers and pad before cutting
+    
+    # VOICE DATASET CONFIGURATION (EXTRACTION_MODE = "dataset")
+    DATASET_DIR = "voice_dataset"    # Clips plus manifest.jsonl
+    DATASET_SAMPLE_RATE = 24000      # Options: 16000 or 24000 (mono)
+    DATASET_AUDIO_FORMAT = "wav"     # Options: "wav" or "flac"
+    DATASET_MANIFESTS = ("jsonl",)   # Add "parquet" to also write manifest.parquet (needs pandas + pyarrow)
+    
+    # BATCH CONFIGURATION
+    BATCH_VIDEOS = []                # List of files in mp4_files/ or URLs; non-empty runs the batch pipeline
+    BATCH_OUTPUT_DIR = "batch_output"  # Extracted segments for batch runs
     # ================================================
     
     # Initialize transcriber
-    transcriber = AssemblyAITranscriber("70702281c18e427f8093e5f5385a3195")
+    transcript_cache = TranscriptCache() if USE_TRANSCRIPT_CACHE else None
+    transcriber = create_transcriber(TRANSCRIPTION_BACKEND, transcript_cache=transcript_cache)
+    
+    if BATCH_VIDEOS:
+        sources = [
+            video if video.startswith(('http://', 'https://')) else os.path.join("mp4_files", video)
+            for video in BATCH_VIDEOS
+        ]
+        video_extractor = VideoSegmentExtractor() if EXTRACT_VIDEO_SEGMENTS else None
+        if video_extractor is not None and not video_extractor.ffmpeg_available:
+            video_extractor = None
+        
+        pipeline = VoiceBatchPipeline(
+            transcriber, TargetSpeakerIdentifier(), video_extractor,
+            speech_model=SPEECH_MODEL, max_wait_time=MAX_WAIT_TIME,
+            extraction_mode=EXTRACTION_MODE, combined_speed=COMBINED_EXTRACTION_SPEED,
+            output_dir=BATCH_OUTPUT_DIR,
+            segment_planner=SegmentPlanner() if PLAN_SEGMENTS else None
+        )
+        results = pipeline.run(sources, TARGET_SPEAKER_DESCRIPTION)
+        
+        print("\n" + "="*50)
+        print("BATCH RESULTS:")
+        print("="*50)
+        for result in results:
+            print(f"{result['source']}: {result['status']} "
+                  f"(speaker {result['identified_speaker']}, {result['segments']} segments) {result['timings']}")
+            if result['error']:
+                print(f"  Error: {result['error']}")
+        return
     
     try:
         # Check if it's a URL or local file
@@ -436,11 +1895,17 @@ def main():
                                 print("Run: python extract_segments_manual.py")
                                 print("This will create FFmpeg commands for manual extraction.")
                             else:
+                                # Cut list: merged, sliver-free and padded utterances
+                                cut_segments = target_segments
+                                if PLAN_SEGMENTS:
+                                    cut_segments = SegmentPlanner().plan(target_segments, utterances)
+                                
                                 if EXTRACTION_MODE == "combined":
                                     # Extract all segments into one file
                                     input_video_path = os.path.join("mp4_files", MP4_FILE_NAME)
                                     success = video_extractor.extract_target_speaker_segments(
-                                        target_segments, input_video_path, OUTPUT_VIDEO_FILE
+                                        cut_segments, input_video_path, OUTPUT_VIDEO_FILE,
+                                        mode=COMBINED_EXTRACTION_SPEED
                                     )
                                     if success:
                                         print(f"Combined video segments saved to: {OUTPUT_VIDEO_FILE}")
@@ -449,10 +1914,21 @@ def main():
                                     # Extract each segment as separate file
                                     input_video_path = os.path.join("mp4_files", MP4_FILE_NAME)
                                     success = video_extractor.extract_individual_segments(
-                                        target_segments, input_video_path, OUTPUT_VIDEO_DIR
+                                        cut_segments, input_video_path, OUTPUT_VIDEO_DIR
                                     )
                                     if success:
                                         print(f"Individual video segments saved to: {OUTPUT_VIDEO_DIR}/")
+                                
+                                elif EXTRACTION_MODE == "dataset":
+                                    # Export normalized mono audio clips and a manifest
+                                    input_video_path = os.path.join("mp4_files", MP4_FILE_NAME)
+                                    manifest = video_extractor.export_voice_dataset(
+                                        cut_segments, input_video_path, DATASET_DIR,
+                                        sample_rate=DATASET_SAMPLE_RATE, audio_format=DATASET_AUDIO_FORMAT,
+                                        manifest_formats=DATASET_MANIFESTS
+                                    )
+                                    if manifest:
+                                        print(f"Voice dataset ({len(manifest)} clips) saved to: {DATASET_DIR}/")
                     else:
                         print("No segments found for the identified target speaker")
                 else: